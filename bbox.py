@@ -1,7 +1,20 @@
-from PyQt6.QtCore import Qt, QRect, QLine, QPoint
-from PyQt6.QtGui import QBrush, QPen
+from PyQt6.QtCore import Qt, QRect, QRectF, QLine, QPoint, QPointF
+from PyQt6.QtGui import QBrush, QPen, QTransform
 from math import sqrt
 
+from hit_test import EDGE_TOP, EDGE_BOTTOM, EDGE_LEFT, EDGE_RIGHT
+
+# one QPen per (color, line type), shared by all boxes and box lines
+style_pens = {}
+
+def style_pen(color, line_type):
+    pen = style_pens.get((color, line_type))
+    if pen is None:
+        pen = QPen(QBrush(color), 1, line_type)
+        style_pens[(color, line_type)] = pen
+    return pen
+
+
 class BBox_Line:
     def __init__(self, qp1, qp2):
         self.line = QLine(qp1,qp2)
@@ -21,31 +34,23 @@ class BBox_Line:
     # perpendicular distance of point to line
     def calc_distance(self, pt):
 
-        aligned = False
+        x_diff = self.line.p2().x() - self.line.p1().x()
+        y_diff = self.line.p2().y() - self.line.p1().y()
 
-        # check x alignment
-        if self.line.p1().x() < self.line.p2().x():
-            if self.line.p1().x() <= pt.x() <= self.line.p2().x():
-                aligned = True
-        else:
-            if self.line.p2().x() <= pt.x() <= self.line.p1().x():
-                aligned  = True
+        # zero length line (box without width or height): distance to the point itself
+        length_sq = x_diff ** 2 + y_diff ** 2
+        if length_sq == 0:
+            return sqrt((pt.x() - self.line.p1().x()) ** 2 + (pt.y() - self.line.p1().y()) ** 2)
 
-        # check y alignment
-        if self.line.p1().y() < self.line.p2().y():
-            if self.line.p1().y() <= pt.y() <= self.line.p2().y():
-                aligned = True
-        else:
-            if self.line.p2().y() <= pt.y() <= self.line.p1().y():
-                aligned = True
+        # check alignment: the point's perpendicular foot must fall on the line segment
+        # (so a point merely level with a far away edge is not "on" it)
+        t = ((pt.x() - self.line.p1().x())*x_diff + (pt.y() - self.line.p1().y())*y_diff) / length_sq
 
         # if point is not at all aligned with line, just return very large number
         very_large_number = 100000
-        if aligned == False:
+        if t < 0 or t > 1:
             return very_large_number
 
-        x_diff = self.line.p2().x() - self.line.p1().x()
-        y_diff = self.line.p2().y() - self.line.p1().y()
         cross1 = self.line.p2().x() * self.line.p1().y()
         cross2 = self.line.p1().x() * self.line.p2().y()
 
@@ -61,10 +66,12 @@ class BBox_Line:
             return False
 
     def draw(self, qpainter):
-        qpainter.setPen(QPen(QBrush(self.color), 1, self.line_type))
+        qpainter.setPen(style_pen(self.color, self.line_type))
         qpainter.drawLine(self.line)
 
 
+# cx, cy, w, h (native image coords, float) are the box - ul/lr/ur/ll and the edge lines are its display
+# geometry, derived from them (update_ul_lr) and only rebuilt when the box or the img/disp dims change
 class BBox:
     def __init__(self):
         self.class_name = "unassigned"
@@ -91,6 +98,9 @@ class BBox:
         self.color = Qt.GlobalColor.green
         self.line_type = Qt.PenStyle.DashLine
 
+        # False when the display geometry doesn't match cx, cy, w, h and the dims any more
+        self.display_valid = False
+
         self.move_mode = False
         self.resize_mode = False
 
@@ -103,10 +113,12 @@ class BBox:
         self.anchor_point = QPoint()
 
     def contains(self, point):
+        self.update_display()
         myRect = QRect(self.ul,self.lr)
         return myRect.contains(point)
 
     def center_from_point(self, point):
+        self.update_display()
         center_x = (self.ul.x() + self.lr.x())/2
         center_y = (self.ul.y() + self.lr.y())/2
         dist_x_sq = (point.x() - center_x) ** 2
@@ -114,6 +126,7 @@ class BBox:
         return sqrt(dist_x_sq + dist_y_sq)
 
     def shortest_proximity(self,point):
+        self.update_display()
         line_prox = []
         line_prox.append(self.top_line.calc_distance(point))
         line_prox.append(self.bottom_line.calc_distance(point))
@@ -131,15 +144,10 @@ class BBox:
         delta_x = point.x() - self.anchor_point.x()
         delta_y = point.y() - self.anchor_point.y()
 
-        top_left_x = self.ul.x() + delta_x
-        top_left_y = self.ul.y() + delta_y
-        bottom_right_x = self.lr.x() + delta_x
-        bottom_right_y = self.lr.y() + delta_y
-
-        # update bbox points
-        self.ul = QPoint(top_left_x,top_left_y)
-        self.lr = QPoint(bottom_right_x,bottom_right_y)
-        self.align_ll_ur()
+        # move the native box by the display movement, its size stays exact
+        self.cx += delta_x * (self.img_width/self.disp_width)
+        self.cy += delta_y * (self.img_height/self.disp_height)
+        self.display_valid = False
 
         # update anchor point
         self.anchor_point = point
@@ -151,43 +159,28 @@ class BBox:
         delta_x = point.x() - self.anchor_point.x()
         delta_y = point.y() - self.anchor_point.y()
 
-        if self.top_move == True:
-            top_left_x = self.ul.x()
-            top_left_y = self.ul.y() + delta_y
-            top_right_x = self.ur.x()
-            top_right_y = self.ur.y() + delta_y
-
-            self.ul = QPoint(top_left_x,top_left_y)
-            self.ur = QPoint(top_right_x,top_right_y)
+        # native box edges, only the one being dragged moves
+        # (w/h go negative while an edge is dragged across the opposite one, see finish_change)
+        left = self.cx - (self.w/2)
+        right = self.cx + (self.w/2)
+        top = self.cy - (self.h/2)
+        bottom = self.cy + (self.h/2)
 
+        if self.top_move == True:
+            top += delta_y * (self.img_height/self.disp_height)
         elif self.bottom_move == True:
-            bottom_left_x = self.ll.x()
-            bottom_left_y = self.ll.y() + delta_y
-            bottom_right_x = self.lr.x()
-            bottom_right_y = self.lr.y() + delta_y
-
-            self.ll = QPoint(bottom_left_x,bottom_left_y)
-            self.lr = QPoint(bottom_right_x,bottom_right_y)
-
+            bottom += delta_y * (self.img_height/self.disp_height)
         elif self.left_move == True:
-            top_left_x = self.ul.x() + delta_x
-            top_left_y = self.ul.y()
-            bottom_left_x = self.ll.x() + delta_x
-            bottom_left_y = self.ll.y()
-
-            self.ul = QPoint(top_left_x,top_left_y)
-            self.ll = QPoint(bottom_left_x,bottom_left_y)
-
+            left += delta_x * (self.img_width/self.disp_width)
         elif self.right_move == True:
-            top_right_x = self.ur.x() + delta_x
-            top_right_y = self.ur.y()
-            bottom_right_x = self.lr.x() + delta_x
-            bottom_right_y = self.lr.y()
+            right += delta_x * (self.img_width/self.disp_width)
 
-            self.ur = QPoint(top_right_x,top_right_y)
-            self.lr = QPoint(bottom_right_x,bottom_right_y)
+        self.cx = (left + right)/2
+        self.cy = (top + bottom)/2
+        self.w = right - left
+        self.h = bottom - top
 
-        self.setLines()
+        self.update_ul_lr()
         self.setStyle(Qt.GlobalColor.yellow, Qt.PenStyle.DashLine)
 
         if self.top_move == True:
@@ -203,6 +196,12 @@ class BBox:
         self.anchor_point = point
 
     def finish_change(self):
+        # an edge dragged across the opposite one leaves an inverted box
+        if self.w < 0 or self.h < 0:
+            self.w = abs(self.w)
+            self.h = abs(self.h)
+            self.display_valid = False
+
         self.setStyle(Qt.GlobalColor.green, Qt.PenStyle.SolidLine)
 
         self.top_move = False
@@ -213,34 +212,40 @@ class BBox:
         self.move_mode = False
         self.resize_mode = False
 
+    # start resizing from one edge (EDGE_* as returned by hit_test)
+    def start_resize(self, edge):
+        self.update_display()
+        self.setStyle(Qt.GlobalColor.yellow, Qt.PenStyle.DashLine)
+
+        self.top_move = edge == EDGE_TOP
+        self.bottom_move = edge == EDGE_BOTTOM
+        self.left_move = edge == EDGE_LEFT
+        self.right_move = edge == EDGE_RIGHT
+
+        edge_line = [self.top_line, self.bottom_line, self.left_line, self.right_line][edge]
+        edge_line.setStyle(Qt.GlobalColor.red,Qt.PenStyle.DashLine)
+
+        self.resize_mode = True
+        self.move_mode = False
+
+    def start_move(self):
+        self.move_mode = True
+        self.resize_mode = False
+        self.setStyle(Qt.GlobalColor.red, Qt.PenStyle.DashLine)
+
     def check_proximity(self,point):
+        self.update_display()
         if self.top_line.is_near(point):
-            self.setStyle(Qt.GlobalColor.yellow, Qt.PenStyle.DashLine)
-            self.top_line.setStyle(Qt.GlobalColor.red,Qt.PenStyle.DashLine)
-            self.top_move = True
-            self.resize_mode = True
-            self.move_mode = False
+            self.start_resize(EDGE_TOP)
             return True
         elif self.bottom_line.is_near(point):
-            self.setStyle(Qt.GlobalColor.yellow, Qt.PenStyle.DashLine)
-            self.bottom_line.setStyle(Qt.GlobalColor.red,Qt.PenStyle.DashLine)
-            self.bottom_move = True
-            self.resize_mode = True
-            self.move_mode = False
+            self.start_resize(EDGE_BOTTOM)
             return True
         elif self.left_line.is_near(point):
-            self.setStyle(Qt.GlobalColor.yellow, Qt.PenStyle.DashLine)
-            self.left_line.setStyle(Qt.GlobalColor.red,Qt.PenStyle.DashLine)
-            self.left_move = True
-            self.resize_mode = True
-            self.move_mode = False
+            self.start_resize(EDGE_LEFT)
             return True
         elif self.right_line.is_near(point):
-            self.setStyle(Qt.GlobalColor.yellow, Qt.PenStyle.DashLine)
-            self.right_line.setStyle(Qt.GlobalColor.red,Qt.PenStyle.DashLine)
-            self.right_move = True
-            self.resize_mode = True
-            self.move_mode = False
+            self.start_resize(EDGE_RIGHT)
             return True
 
         if self.move_mode == True:
@@ -252,13 +257,16 @@ class BBox:
 
         return False
 
+    # corners in display coords (box being drawn with the mouse) - img/disp dims must be set first
     def setTopLeft(self, topLeft):
         self.ul = topLeft
         self.align_ll_ur()
+        self.update_cx_cy_w_h()
 
     def setBottomRight(self, bottomRight):
         self.lr = bottomRight
         self.align_ll_ur()
+        self.update_cx_cy_w_h()
 
     def setLines(self):
         self.top_line = BBox_Line(self.ul,self.ur)
@@ -288,23 +296,45 @@ class BBox:
         lr_y = self.cy + (self.h/2)
 
         # inbound scale adjustment
-        ul_x = int(ul_x * x_scale)
-        ul_y = int(ul_y * y_scale)
-        lr_x = int(lr_x * x_scale)
-        lr_y = int(lr_y * y_scale)
+        ul_x = int(round(ul_x * x_scale))
+        ul_y = int(round(ul_y * y_scale))
+        lr_x = int(round(lr_x * x_scale))
+        lr_y = int(round(lr_y * y_scale))
 
         self.ul = QPoint(ul_x, ul_y)
         self.lr = QPoint(lr_x, lr_y)
         self.align_ll_ur()
+        self.display_valid = True
+
+    # rebuild the display geometry if the box or the dims changed since it was last built
+    def update_display(self):
+        if self.display_valid == False:
+            self.update_ul_lr()
 
     # method to store native image dimensions for scaling of bbox dimensions
     def set_img_dims(self, img_width, img_height):
-        self.img_width = img_width
-        self.img_height = img_height
+        if img_width != self.img_width or img_height != self.img_height:
+            self.img_width = img_width
+            self.img_height = img_height
+            self.display_valid = False
 
     def set_disp_dims(self, disp_width, disp_height):
-        self.disp_width = disp_width
-        self.disp_height = disp_height
+        if disp_width != self.disp_width or disp_height != self.disp_height:
+            self.disp_width = disp_width
+            self.disp_height = disp_height
+            self.display_valid = False
+
+    # express the box in other native image dims (e.g. the fixed dims a tracker works in)
+    def rescale_img_dims(self, img_width, img_height):
+        x_scale = img_width/self.img_width
+        y_scale = img_height/self.img_height
+
+        self.cx = self.cx * x_scale
+        self.cy = self.cy * y_scale
+        self.w = self.w * x_scale
+        self.h = self.h * y_scale
+        self.set_img_dims(img_width, img_height)
+        self.display_valid = False
 
     # method to convert to outbound scales (usually prior to saving GT data to file)
     def update_cx_cy_w_h(self, normalize=False):
@@ -327,6 +357,9 @@ class BBox:
         self.w = width * x_scale
         self.h = height * y_scale
 
+        # the display corners given are the display geometry
+        self.display_valid = normalize == False
+
     def align_ll_ur(self):
         self.ll = QPoint(self.ul.x(),self.lr.y())
         self.ur = QPoint(self.lr.x(),self.ul.y())
@@ -355,24 +388,32 @@ class BBox:
             self.ll = ul
             self.lr = ur
 
-    def draw(self, qpainter):
-        qpainter.setPen(QPen(QBrush(self.color), 1, self.line_type))
+    # transform: native -> display mapping (GT.draw() passes one for all its boxes)
+    def draw(self, qpainter, transform=None):
+        if transform is None:
+            transform = QTransform.fromScale(self.disp_width/self.img_width, self.disp_height/self.img_height)
 
-        # draw class for object
-        x = self.ul.x()
-        y = self.ul.y() - 10
-        textPos = QPoint(x, y)
-        qpainter.drawText(textPos, self.class_name)
+        # display rect straight from the native box
+        rect = transform.mapRect(QRectF(self.cx - (self.w/2), self.cy - (self.h/2), self.w, self.h))
+
+        qpainter.setPen(style_pen(self.color, self.line_type))
 
-        # draw bounding box
-        self.top_line.draw(qpainter)
-        self.bottom_line.draw(qpainter)
-        self.left_line.draw(qpainter)
-        self.right_line.draw(qpainter)
+        # draw class for object
+        qpainter.drawText(QPointF(rect.left(), rect.top() - 10), self.class_name)
+
+        # draw bounding box (edges styled on their own while resizing)
+        if self.resize_mode == True:
+            self.update_display()
+            self.top_line.draw(qpainter)
+            self.bottom_line.draw(qpainter)
+            self.left_line.draw(qpainter)
+            self.right_line.draw(qpainter)
+            qpainter.setPen(style_pen(self.color, self.line_type))
+        else:
+            qpainter.drawRect(rect)
 
         # draw center point
-        cx = int((self.ul.x() + self.lr.x())/2)
-        cy = int((self.ul.y() + self.lr.y())/2)
-        qpainter.drawRect(cx-1,cy-1,2,2)
+        center = rect.center()
+        qpainter.drawRect(QRectF(center.x() - 1, center.y() - 1, 2, 2))
 
-        return True
\ No newline at end of file
+        return True
@@ -0,0 +1,450 @@
+import argparse
+import mmap
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import box_store
+import gt_binary
+import gt_csv
+
+# Performance benchmarks for DL Annotator internals
+# usage: python benchmark.py <benchmark> [options]
+
+
+def make_synthetic_gt_lines(num_rows, boxes_per_row=4):
+    class_names = ["car", "truck", "person", "bus"]
+    lines = []
+    for i in range(0, num_rows):
+        fields = ["frame" + str(i).zfill(7) + ".jpg", str(boxes_per_row)]
+        for n in range(0, boxes_per_row):
+            fields += [str(random.randint(0, 1920)), str(random.randint(0, 1080)), str(random.randint(8, 300)), str(random.randint(8, 300)), random.choice(class_names)]
+        lines.append(",".join(fields) + "\n")
+    return lines
+
+# hash index from base filename to position in the image list (loader before the frame registry)
+def build_filename_index(base_filenames):
+    filename_index = {}
+    for i, base_filename in enumerate(base_filenames):
+        filename_index[base_filename] = i
+    return filename_index
+
+def report(label, num_rows, elapsed):
+    print("  " + label.ljust(40) + "{:8.3f} sec  {:12,.0f} rows/sec".format(elapsed, num_rows/max(elapsed, 1e-9)))
+
+def bench_gt_load(args):
+    # parse + place every CSV row against an image folder holding the same number of frames
+    from frame_registry import FrameRegistry
+
+    for num_rows in args.rows:
+        lines = make_synthetic_gt_lines(num_rows)
+        base_filenames = [l.split(",", 1)[0] for l in lines]
+        random.shuffle(lines)
+
+        print("GT CSV load, " + "{:,}".format(num_rows) + " rows x 4 boxes:")
+
+        # original loader: linear list.index() lookup per row
+        if num_rows <= args.max_linear_rows:
+            start_time = time.time()
+            for record in gt_csv.parse_gt_lines(lines):
+                base_filenames.index(record[0])
+            report("serial parse + list.index()", num_rows, time.time() - start_time)
+        else:
+            print("  serial parse + list.index()               skipped (quadratic, > " + "{:,}".format(args.max_linear_rows) + " rows)")
+
+        gt_fd, gt_file_path = tempfile.mkstemp(suffix=".csv")
+        with os.fdopen(gt_fd, "w") as gt_filestream:
+            gt_filestream.writelines(lines)
+
+        # previous loader: stream the memory-mapped file in blocks, hash lookup per row
+        start_time = time.time()
+        filename_index = build_filename_index(base_filenames)
+        with open(gt_file_path, "rb") as gt_filestream:
+            mm = mmap.mmap(gt_filestream.fileno(), 0, access=mmap.ACCESS_READ)
+            for end_offset, records in gt_csv.parse_gt_stream(gt_csv.iter_gt_blocks(mm, 1024*1024), 1):
+                for record in records:
+                    filename_index.get(record[0])
+            mm.close()
+        report("1 worker(s) stream + hash index", num_rows, time.time() - start_time)
+
+        # current loader: stream the memory-mapped file in blocks, frame registry lookup per block (GT_Load_Process)
+        frame_registry = FrameRegistry(["/data/" + base_filename for base_filename in sorted(base_filenames)], box_store.BoxStore(num_rows))
+        for num_workers in [1, args.workers]:
+            start_time = time.time()
+            with open(gt_file_path, "rb") as gt_filestream:
+                mm = mmap.mmap(gt_filestream.fileno(), 0, access=mmap.ACCESS_READ)
+                for end_offset, records in gt_csv.parse_gt_stream(gt_csv.iter_gt_blocks(mm, 1024*1024), num_workers):
+                    frame_registry.lookup([record[0] for record in records])
+                mm.close()
+            report(str(num_workers) + " worker(s) stream + registry lookup", num_rows, time.time() - start_time)
+
+        os.remove(gt_file_path)
+
+def bench_gt_storage(args):
+    # save and reopen the same GT as CSV text and as the binary columnar format
+    for num_rows in args.rows:
+        records = gt_csv.parse_gt_lines(make_synthetic_gt_lines(num_rows))
+        lookup_names = [random.choice(records)[0] for i in range(0, 1000)]
+
+        print("GT storage, " + "{:,}".format(num_rows) + " rows x 4 boxes:")
+
+        csv_fd, csv_path = tempfile.mkstemp(suffix=".csv")
+        start_time = time.time()
+        with os.fdopen(csv_fd, "w") as csv_filestream:
+            for img_filename, boxes in records:
+                csv_filestream.write(gt_csv.format_gt_row(img_filename, boxes) + "\n")
+        report("CSV save", num_rows, time.time() - start_time)
+
+        start_time = time.time()
+        with open(csv_path, "rb") as csv_filestream:
+            mm = mmap.mmap(csv_filestream.fileno(), 0, access=mmap.ACCESS_READ)
+            for end_offset, block_records in gt_csv.parse_gt_stream(gt_csv.iter_gt_blocks(mm, 1024*1024), 1):
+                pass
+            mm.close()
+        report("CSV load (parse all rows)", num_rows, time.time() - start_time)
+
+        gtb_fd, gtb_path = tempfile.mkstemp(suffix=".gtb")
+        start_time = time.time()
+        with os.fdopen(gtb_fd, "wb") as gtb_filestream:
+            gt_binary.write_gt_binary(gtb_filestream, records)
+        report("binary save", num_rows, time.time() - start_time)
+
+        start_time = time.time()
+        with open(gtb_path, "rb") as gtb_filestream:
+            mm = mmap.mmap(gtb_filestream.fileno(), 0, access=mmap.ACCESS_READ)
+            gtb = gt_binary.GT_Binary(mm)
+            report("binary open (mmap + row index)", num_rows, time.time() - start_time)
+
+            start_time = time.time()
+            for img_filename in lookup_names:
+                for row in gtb.image_rows(img_filename):
+                    gtb.row_boxes(row)
+            elapsed = time.time() - start_time
+            print("  " + "binary random access, 1000 images".ljust(40) + "{:8.3f} sec".format(elapsed))
+
+            del gtb
+            mm.close()
+
+        print("  file size: CSV " + "{:,}".format(os.path.getsize(csv_path)) + " bytes, binary " + "{:,}".format(os.path.getsize(gtb_path)) + " bytes")
+
+        os.remove(csv_path)
+        os.remove(gtb_path)
+
+def bench_gt_memory(args):
+    # memory and a dataset-wide pass: per-box BBox objects vs the columnar box store
+    from gt import make_gt_bboxes
+
+    for num_rows in args.rows:
+        records = gt_csv.parse_gt_lines(make_synthetic_gt_lines(num_rows))
+        num_boxes = sum([len(boxes) for img_filename, boxes in records])
+
+        print("GT in memory, " + "{:,}".format(num_rows) + " frames, " + "{:,}".format(num_boxes) + " boxes:")
+
+        tracemalloc.start()
+        start_time = time.time()
+        bbox_lists = [make_gt_bboxes(boxes, 1920, 1080, 1280, 720) for img_filename, boxes in records]
+        build_time = time.time() - start_time
+        bbox_bytes = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+
+        start_time = time.time()
+        class_counts = {}
+        for bbox_list in bbox_lists:
+            for bb in bbox_list:
+                class_counts[bb.class_name] = class_counts.get(bb.class_name, 0) + 1
+        pass_time = time.time() - start_time
+        del bbox_lists
+
+        print("  " + "BBox objects".ljust(40) + "{:10.1f} MB   build {:7.3f} sec   class count pass {:7.3f} sec".format(bbox_bytes/(1024*1024), build_time, pass_time))
+
+        tracemalloc.start()
+        start_time = time.time()
+        store = box_store.BoxStore(num_rows)
+        store.append_frames([(frame_id, boxes) for frame_id, (img_filename, boxes) in enumerate(records)])
+        store.compact()
+        build_time = time.time() - start_time
+        store_bytes = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+
+        start_time = time.time()
+        store.class_counts()
+        pass_time = time.time() - start_time
+
+        print("  " + "box store".ljust(40) + "{:10.1f} MB   build {:7.3f} sec   class count pass {:7.3f} sec".format(store_bytes/(1024*1024), build_time, pass_time))
+
+def bench_gt_redraw(args):
+    # mouse-move redraw of a frame's boxes: cached display geometry vs rebuilding it on every redraw (previous behavior)
+    from PyQt6.QtGui import QGuiApplication, QImage, QPainter
+    from gt import GT
+
+    app = QGuiApplication.instance() or QGuiApplication(["benchmark"])
+    records = gt_csv.parse_gt_lines(make_synthetic_gt_lines(1, max(args.boxes)))[0][1]
+
+    for num_boxes in args.boxes:
+        gt = GT()
+        gt.set_img_dims(1920, 1080)
+        gt.set_disp_dims(1280, 720)
+        gt.add_loaded_boxes(records[0:num_boxes])
+
+        overlay = QImage(1280, 720, QImage.Format.Format_ARGB32_Premultiplied)
+        print("GT redraw, " + "{:,}".format(num_boxes) + " boxes, " + str(args.redraws) + " redraws:")
+
+        for label, rebuild in [("display geometry rebuilt per redraw", True), ("cached display geometry", False)]:
+            start_time = time.time()
+            for n in range(0, args.redraws):
+                overlay.fill(0)
+                qp = QPainter(overlay)
+                gt.set_disp_dims(1280, 720)
+                if rebuild == True:
+                    for bb in gt.bbox_list:
+                        bb.update_ul_lr()
+                gt.draw(qp)
+                qp.end()
+            elapsed = time.time() - start_time
+            print("  " + label.ljust(40) + "{:8.3f} ms/redraw  {:8.1f} redraws/sec".format(elapsed*1000/args.redraws, args.redraws/max(elapsed, 1e-9)))
+
+def bench_box_paint(args):
+    # paint time of a frame's GT boxes: BBox.draw() per box vs batched, style grouped drawing (box_painter)
+    from PyQt6.QtGui import QGuiApplication, QImage, QPainter, QTransform
+    from box_painter import draw_bboxes
+    from gt import GT
+    from pane_renderer import label_font
+
+    app = QGuiApplication.instance() or QGuiApplication(["benchmark"])
+    records = gt_csv.parse_gt_lines(make_synthetic_gt_lines(1, max(args.boxes)))[0][1]
+
+    for num_boxes in args.boxes:
+        gt = GT()
+        gt.set_img_dims(1920, 1080)
+        gt.set_disp_dims(1280, 720)
+        gt.add_loaded_boxes(records[0:num_boxes])
+        bbox_list = gt.bbox_list
+        transform = QTransform.fromScale(1280/1920, 720/1080)
+
+        def per_box(qp):
+            for bb in bbox_list:
+                bb.draw(qp, transform)
+
+        def batched(qp):
+            draw_bboxes(qp, bbox_list, transform)
+
+        overlay = QImage(1280, 720, QImage.Format.Format_ARGB32_Premultiplied)
+        print("box paint, " + "{:,}".format(num_boxes) + " boxes, " + str(args.paints) + " paints:")
+
+        for label, paint in [("BBox.draw per box", per_box), ("batched (box_painter)", batched)]:
+            start_time = time.time()
+            for n in range(0, args.paints):
+                overlay.fill(0)
+                qp = QPainter(overlay)
+                qp.setFont(label_font())
+                paint(qp)
+                qp.end()
+            elapsed = time.time() - start_time
+            print("  " + label.ljust(40) + "{:8.3f} ms/paint".format(elapsed*1000/args.paints))
+
+def bench_hit_test(args):
+    # mouse press hit test: per-object BBox/BBox_Line path (closest edge, proximity check, containing box) vs
+    # the vectorized hit_test kernel over all boxes vs GT.hit_test (spatial grid candidates + kernel)
+    import numpy as np
+    from PyQt6.QtCore import QPoint
+    from gt import GT
+    from hit_test import display_rects, hit_test
+
+    records = gt_csv.parse_gt_lines(make_synthetic_gt_lines(1, max(args.boxes)))[0][1]
+    points = [QPoint(random.randint(0, 1280), random.randint(0, 720)) for n in range(0, args.queries)]
+
+    for num_boxes in args.boxes:
+        gt = GT()
+        gt.set_img_dims(1920, 1080)
+        gt.set_disp_dims(1280, 720)
+        gt.add_loaded_boxes(records[0:num_boxes])
+        bbox_list = gt.bbox_list
+
+        def per_object(point):
+            prox_list = [bb.shortest_proximity(point) for bb in bbox_list]
+            bbox = bbox_list[prox_list.index(min(prox_list))]
+            if bbox.shortest_proximity(point) < bbox.top_line.proximity_thresh:
+                return bbox
+            contain_list = [bb for bb in bbox_list if bb.contains(point)]
+            if len(contain_list) == 0:
+                return None
+            center_list = [bb.center_from_point(point) for bb in contain_list]
+            return contain_list[center_list.index(min(center_list))]
+
+        def kernel(point):
+            rects = display_rects(np.array([bb.cx for bb in bbox_list]), np.array([bb.cy for bb in bbox_list]),
+                                  np.array([bb.w for bb in bbox_list]), np.array([bb.h for bb in bbox_list]), 1280/1920, 720/1080)
+            index, edge = hit_test(point.x(), point.y(), *rects)
+            return bbox_list[index] if index >= 0 else None
+
+        def grid_kernel(point):
+            return gt.hit_test(point)[0]
+
+        print("hit test, " + "{:,}".format(num_boxes) + " boxes, " + str(args.queries) + " queries:")
+        for label, query in [("per-object BBox path", per_object), ("vectorized kernel, all boxes", kernel), ("GT.hit_test (grid + kernel)", grid_kernel)]:
+            start_time = time.time()
+            for point in points:
+                query(point)
+            elapsed = time.time() - start_time
+            print("  " + label.ljust(40) + "{:8.3f} ms/query".format(elapsed*1000/args.queries))
+
+# peak resident set size of this process in MB, None where the resource module is missing (Windows)
+def peak_rss_mb():
+    try:
+        import resource
+    except ImportError:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss/1024
+
+def bench_frame_registry(args):
+    # image list startup: GT_Image per file vs the compact frame registry, each in a fresh process for peak RSS
+    if args.variant is None:
+        for num_files in args.files:
+            print("image list startup, " + "{:,}".format(num_files) + " synthetic files (no glob/header probe):")
+            for variant in ["gt_image_list", "frame_registry"]:
+                subprocess.run([sys.executable, os.path.abspath(__file__), "frame_registry", "--files", str(num_files), "--variant", variant], check=True)
+        return
+
+    from gt import GT_Image
+    from frame_registry import FrameRegistry
+
+    num_files = args.files[0]
+    full_paths = ["/data/sequences/seq" + str(i//10000).zfill(4) + "/frame" + str(i).zfill(7) + ".jpg" for i in range(0, num_files)]
+    dims_list = [(1920, 1080)] * num_files
+    base_rss = peak_rss_mb()
+
+    start_time = time.time()
+    store = box_store.BoxStore(num_files)
+    if args.variant == "gt_image_list":
+        gt_image_list = []
+        for full_path in full_paths:
+            gt_img = GT_Image(store, len(gt_image_list))
+            gt_img.full_path = full_path
+            gt_img.base_filename = os.path.basename(full_path)
+            gt_image_list.append(gt_img)
+        filename_index = build_filename_index([gt_img.base_filename for gt_img in gt_image_list])
+        for gt_img, (img_width, img_height) in zip(gt_image_list, dims_list):
+            gt_img.set_img_dims(img_width, img_height)
+    else:
+        frame_registry = FrameRegistry(full_paths, store)
+        frame_registry.set_dims_list(dims_list)
+        # first visits create their GT_Images
+        for frame_id in range(0, min(num_files, 100)):
+            frame_registry[frame_id].gt.bbox_list
+    elapsed = time.time() - start_time
+
+    if base_rss is None:
+        rss_text = "peak RSS n/a"
+    else:
+        rss_text = "peak RSS +{:8.1f} MB".format(peak_rss_mb() - base_rss)
+    print("  " + args.variant.ljust(40) + "{:8.3f} sec   ".format(elapsed) + rss_text)
+
+def bench_predict(args):
+    # box prediction on a sequence with reference GT (default sample/traffic_imgs, sample/test_traffic.csv): each
+    # frame's reference boxes are predicted into the next frame, per method the time per frame and the mean IoU
+    # with the next frame's reference boxes.  --copies repeats every reference box (shifted copies) to time dense frames.
+    # ("motion" extrapolates from the frame before, the first step has none)
+    from PyQt6.QtGui import QGuiApplication
+    from frame_cache import decode_image_file
+    from gt import GT
+    from motion_tracker import MotionTracker
+
+    app = QGuiApplication.instance() or QGuiApplication(["benchmark"])
+    with open(args.gt) as f:
+        rows = gt_csv.parse_gt_lines(f.readlines())
+    frames = [(decode_image_file(os.path.join(args.images, filename)), records) for filename, records in rows]
+
+    def make_gt(image, records):
+        gt = GT()
+        gt.set_img_dims(image.width(), image.height())
+        gt.set_disp_dims(image.width(), image.height())
+        gt.add_loaded_boxes(records)
+        return gt
+
+    def box_iou(a, b):
+        x1 = max(a.cx - a.w/2, b[0] - b[2]/2)
+        y1 = max(a.cy - a.h/2, b[1] - b[3]/2)
+        x2 = min(a.cx + a.w/2, b[0] + b[2]/2)
+        y2 = min(a.cy + a.h/2, b[1] + b[3]/2)
+        inter = max(0, x2 - x1) * max(0, y2 - y1)
+        return inter/(a.w*a.h + b[2]*b[3] - inter)
+
+    for copies in args.copies:
+        print("prediction, " + str(len(frames) - 1) + " frame steps, " + str(len(frames[0][1]) * copies) + " boxes per frame:")
+
+        for method in args.methods:
+            elapsed = 0.0
+            ious = []
+            for n in range(0, len(frames) - 1):
+                prev_image, prev_records = frames[n]
+                next_image, next_records = frames[n + 1]
+                def copied(records):
+                    return [(cx + (c % 5) * 4, cy + (c // 5) * 4, w, h, name) for c in range(0, copies) for cx, cy, w, h, name in records]
+                src_gt = make_gt(prev_image, copied(prev_records))
+                dst_gt = make_gt(next_image, [])
+                older_gt = make_gt(frames[n - 1][0], copied(frames[n - 1][1])) if n > 0 else None
+
+                start_time = time.time()
+                if method == "motion":
+                    dst_gt.predict_motion_annotation(src_gt, older_gt, 1, 1, MotionTracker())
+                else:
+                    dst_gt.predict_annotation(src_gt, prev_image, next_image, method)
+                elapsed += time.time() - start_time
+
+                if copies == 1:
+                    ious += [box_iou(bb, ref) for bb, ref in zip(dst_gt.bbox_list, next_records)]
+
+            iou_text = "   mean IoU {:.3f}".format(sum(ious)/len(ious)) if len(ious) > 0 else ""
+            print("  " + method.ljust(40) + "{:8.2f} ms/frame".format(elapsed*1000/(len(frames) - 1)) + iou_text)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="DL Annotator benchmarks")
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    gt_load_parser = subparsers.add_parser("gt_load", help="GT CSV parse and filename indexing rate")
+    gt_load_parser.add_argument("--rows", type=int, nargs="+", default=[10000, 100000, 1000000])
+    gt_load_parser.add_argument("--workers", type=int, default=gt_csv.default_num_workers())
+    gt_load_parser.add_argument("--max-linear-rows", type=int, default=100000)
+    gt_load_parser.set_defaults(func=bench_gt_load)
+
+    gt_storage_parser = subparsers.add_parser("gt_storage", help="GT save/load time, CSV vs binary format")
+    gt_storage_parser.add_argument("--rows", type=int, nargs="+", default=[10000, 100000, 1000000])
+    gt_storage_parser.set_defaults(func=bench_gt_storage)
+
+    gt_memory_parser = subparsers.add_parser("gt_memory", help="GT box memory, BBox objects vs columnar box store")
+    gt_memory_parser.add_argument("--rows", type=int, nargs="+", default=[10000, 100000])
+    gt_memory_parser.set_defaults(func=bench_gt_memory)
+
+    gt_redraw_parser = subparsers.add_parser("gt_redraw", help="redraw time of a frame's GT boxes")
+    gt_redraw_parser.add_argument("--boxes", type=int, nargs="+", default=[100, 500, 2000])
+    gt_redraw_parser.add_argument("--redraws", type=int, default=100)
+    gt_redraw_parser.set_defaults(func=bench_gt_redraw)
+
+    box_paint_parser = subparsers.add_parser("box_paint", help="paint time of a frame's GT boxes, per box vs batched")
+    box_paint_parser.add_argument("--boxes", type=int, nargs="+", default=[100, 1000])
+    box_paint_parser.add_argument("--paints", type=int, default=50)
+    box_paint_parser.set_defaults(func=bench_box_paint)
+
+    hit_test_parser = subparsers.add_parser("hit_test", help="mouse press hit test, per-object path vs vectorized kernel")
+    hit_test_parser.add_argument("--boxes", type=int, nargs="+", default=[10, 100, 1000])
+    hit_test_parser.add_argument("--queries", type=int, default=1000)
+    hit_test_parser.set_defaults(func=bench_hit_test)
+
+    frame_registry_parser = subparsers.add_parser("frame_registry", help="image list startup time and RSS, GT_Image per file vs frame registry")
+    frame_registry_parser.add_argument("--files", type=int, nargs="+", default=[100000, 1000000])
+    frame_registry_parser.add_argument("--variant", choices=["gt_image_list", "frame_registry"], default=None)
+    frame_registry_parser.set_defaults(func=bench_frame_registry)
+
+    predict_parser = subparsers.add_parser("predict", help="box prediction time and accuracy per method (copy, track, flow, motion)")
+    predict_parser.add_argument("--images", default="sample/traffic_imgs")
+    predict_parser.add_argument("--gt", default="sample/test_traffic.csv")
+    predict_parser.add_argument("--methods", nargs="+", default=["copy", "track", "flow", "motion"])
+    predict_parser.add_argument("--copies", type=int, nargs="+", default=[1, 25])
+    predict_parser.set_defaults(func=bench_predict)
+
+    args = parser.parse_args()
+    args.func(args)
@@ -0,0 +1,85 @@
+import math
+
+# Uniform grid over the boxes of one frame, in native image coords, for hit-testing dense frames.
+# Each box is listed in every cell its extent touches; cells outside the image are clamped into a
+# border ring, so boxes hanging off the image (or absurdly large ones) cost a bounded number of cells.
+# Entries carry an insertion sequence number, so results come back in bbox_list order.
+
+GRID_CELLS = 32       # cells along the longer image side
+GRID_MIN_CELL = 16    # native pixels
+
+
+class BoxGrid:
+    def __init__(self, img_width, img_height):
+        self.cell_size = max(GRID_MIN_CELL, max(img_width, img_height)/GRID_CELLS)
+        self.max_cell_x = int(math.ceil(img_width/self.cell_size))
+        self.max_cell_y = int(math.ceil(img_height/self.cell_size))
+
+        # (cell x, cell y) -> {seq: bbox}
+        self.cells = {}
+        # id(bbox) -> (seq, bbox, cell range)
+        self.entries = {}
+        self.next_seq = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def cell_x(self, x):
+        return min(max(int(math.floor(x/self.cell_size)), -1), self.max_cell_x)
+
+    def cell_y(self, y):
+        return min(max(int(math.floor(y/self.cell_size)), -1), self.max_cell_y)
+
+    def cell_range(self, x1, y1, x2, y2):
+        return self.cell_x(min(x1, x2)), self.cell_y(min(y1, y2)), self.cell_x(max(x1, x2)), self.cell_y(max(y1, y2))
+
+    def insert(self, bbox):
+        self.remove(bbox)
+
+        w = abs(bbox.w)
+        h = abs(bbox.h)
+        cell_range = self.cell_range(bbox.cx - w/2, bbox.cy - h/2, bbox.cx + w/2, bbox.cy + h/2)
+        seq = self.next_seq
+        self.next_seq += 1
+
+        cx1, cy1, cx2, cy2 = cell_range
+        for cy in range(cy1, cy2 + 1):
+            for cx in range(cx1, cx2 + 1):
+                cell = self.cells.get((cx, cy))
+                if cell is None:
+                    cell = {}
+                    self.cells[(cx, cy)] = cell
+                cell[seq] = bbox
+
+        self.entries[id(bbox)] = (seq, bbox, cell_range)
+
+    def remove(self, bbox):
+        entry = self.entries.pop(id(bbox), None)
+        if entry is None:
+            return
+
+        seq, bbox, (cx1, cy1, cx2, cy2) = entry
+        for cy in range(cy1, cy2 + 1):
+            for cx in range(cx1, cx2 + 1):
+                cell = self.cells[(cx, cy)]
+                del cell[seq]
+                if len(cell) == 0:
+                    del self.cells[(cx, cy)]
+
+    # boxes whose extent may overlap the rect, in insertion order
+    def query(self, x1, y1, x2, y2):
+        cx1, cy1, cx2, cy2 = self.cell_range(x1, y1, x2, y2)
+
+        found = {}
+        for cy in range(cy1, cy2 + 1):
+            for cx in range(cx1, cx2 + 1):
+                cell = self.cells.get((cx, cy))
+                if cell is not None:
+                    found.update(cell)
+
+        return [found[seq] for seq in sorted(found)]
+
+    # True if a query rect covers every cell, i.e. query() returns all boxes
+    def covers(self, x1, y1, x2, y2):
+        cx1, cy1, cx2, cy2 = self.cell_range(x1, y1, x2, y2)
+        return cx1 <= -1 and cy1 <= -1 and cx2 >= self.max_cell_x and cy2 >= self.max_cell_y
@@ -0,0 +1,60 @@
+from PyQt6.QtCore import QPointF, QRectF
+from PyQt6.QtGui import QFontMetricsF, QStaticText
+
+from bbox import style_pen
+
+# Batched drawing of many boxes (a frame's GT): boxes are grouped by style and each group is drawn with one pen,
+# one drawRects() call for the box and center rects and the class labels as cached QStaticText (text layout is
+# done once per class name and font, not on every redraw).  Same output as BBox.draw() per box.
+
+# (class name, font key) -> QStaticText
+label_texts = {}
+
+def label_text(class_name, font):
+    key = (class_name, font.key())
+    static_text = label_texts.get(key)
+    if static_text is None:
+        static_text = QStaticText(class_name)
+        static_text.setPerformanceHint(QStaticText.PerformanceHint.AggressiveCaching)
+        static_text.prepare(font=font)
+        label_texts[key] = static_text
+    return static_text
+
+# transform: native -> display mapping, scale and translation only (as built by GT.draw)
+def draw_bboxes(qpainter, bboxes, transform):
+    x_scale = transform.m11()
+    y_scale = transform.m22()
+    x_offset = transform.dx()
+    y_offset = transform.dy()
+
+    font = qpainter.font()
+    # drawText() places text by its baseline, drawStaticText() by its top left
+    ascent = QFontMetricsF(font).ascent()
+
+    # (color, line type) -> ([box and center rects], [(label position, class name)])
+    style_groups = {}
+    for bb in bboxes:
+        if bb.resize_mode == True:
+            # edges styled on their own
+            bb.draw(qpainter, transform)
+            continue
+
+        group = style_groups.get((bb.color, bb.line_type))
+        if group is None:
+            group = ([], [])
+            style_groups[(bb.color, bb.line_type)] = group
+
+        left = (bb.cx - (bb.w/2)) * x_scale + x_offset
+        top = (bb.cy - (bb.h/2)) * y_scale + y_offset
+        width = bb.w * x_scale
+        height = bb.h * y_scale
+
+        group[0].append(QRectF(left, top, width, height))
+        group[0].append(QRectF(left + width/2 - 1, top + height/2 - 1, 2, 2))
+        group[1].append((QPointF(left, top - 10 - ascent), bb.class_name))
+
+    for (color, line_type), (rects, labels) in style_groups.items():
+        qpainter.setPen(style_pen(color, line_type))
+        qpainter.drawRects(rects)
+        for position, class_name in labels:
+            qpainter.drawStaticText(position, label_text(class_name, font))
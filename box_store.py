@@ -0,0 +1,205 @@
+import threading
+from array import array
+
+import numpy as np
+
+# Columnar store for the GT boxes of a whole image set (one per session), ~22 bytes per box:
+#   base      cx, cy, w, h float32, class_id uint16, frame_id int32 per box, sorted by frame,
+#             with frame_start[f]:frame_start[f+1] the boxes of frame f
+#   appended  boxes added since the base was built (GT loading), same columns in growable arrays, with
+#             frame_id -> [(start, end), ...] ranges of each frame's appended boxes
+#   overlay   frame_id -> tuple of (cx, cy, w, h, class_name) for frames whose boxes were replaced (edits)
+# frame content = overlay if present, else base boxes followed by appended boxes.  compact() folds
+# appended and overlay into a new base.  GT objects read/write through the store and only hold BBox
+# objects while they are materialized (see GT.bbox_list).
+
+
+class BoxStore:
+    def __init__(self, num_frames):
+        self.lock = threading.RLock()
+        self.num_frames = num_frames
+
+        self.class_names = []
+        self.class_ids = {}
+
+        self.cx = np.zeros(0, dtype=np.float32)
+        self.cy = np.zeros(0, dtype=np.float32)
+        self.w = np.zeros(0, dtype=np.float32)
+        self.h = np.zeros(0, dtype=np.float32)
+        self.class_id = np.zeros(0, dtype=np.uint16)
+        self.frame_id = np.zeros(0, dtype=np.int32)
+        self.frame_start = np.zeros(num_frames + 1, dtype=np.int64)
+
+        self.reset_appended()
+        self.overlay = {}
+
+        # frame_id -> GT currently holding BBox objects for that frame
+        self.materialized = {}
+
+    # must be called with lock held
+    def reset_appended(self):
+        self.app_cx = array("f")
+        self.app_cy = array("f")
+        self.app_w = array("f")
+        self.app_h = array("f")
+        self.app_class_id = array("H")
+        self.app_frame_id = array("i")
+        self.app_frame_ranges = {}
+
+    # must be called with lock held
+    def get_class_id(self, class_name):
+        class_id = self.class_ids.get(class_name)
+        if class_id is None:
+            if len(self.class_names) > 65535:
+                raise ValueError("box store supports at most 65536 class names")
+            class_id = len(self.class_names)
+            self.class_ids[class_name] = class_id
+            self.class_names.append(class_name)
+        return class_id
+
+    # add boxes read from a GT file: [(frame_id, [(cx, cy, w, h, class_name), ...]), ...]
+    def append_frames(self, frame_boxes):
+        with self.lock:
+            for frame_id, boxes in frame_boxes:
+                start = len(self.app_cx)
+                for cx, cy, w, h, class_name in boxes:
+                    self.app_cx.append(cx)
+                    self.app_cy.append(cy)
+                    self.app_w.append(w)
+                    self.app_h.append(h)
+                    self.app_class_id.append(self.get_class_id(class_name))
+                    self.app_frame_id.append(frame_id)
+
+                end = len(self.app_cx)
+                if end > start:
+                    ranges = self.app_frame_ranges.get(frame_id)
+                    if ranges is None:
+                        self.app_frame_ranges[frame_id] = [(start, end)]
+                    elif ranges[-1][1] == start:
+                        ranges[-1] = (ranges[-1][0], end)
+                    else:
+                        ranges.append((start, end))
+
+                if frame_id in self.overlay:
+                    self.overlay[frame_id] = self.overlay[frame_id] + tuple(boxes)
+
+                # frame already on screen picks the new boxes up right away
+                gt = self.materialized.get(frame_id)
+                if gt is not None:
+                    gt.extend_bboxes(boxes)
+
+    def append_frame(self, frame_id, boxes):
+        self.append_frames([(frame_id, boxes)])
+
+    # must be called with lock held
+    def read_frame(self, frame_id):
+        boxes = self.overlay.get(frame_id)
+        if boxes is not None:
+            return list(boxes)
+
+        start = int(self.frame_start[frame_id])
+        end = int(self.frame_start[frame_id + 1])
+        class_names = [self.class_names[c] for c in self.class_id[start:end].tolist()]
+        boxes = list(zip(self.cx[start:end].tolist(), self.cy[start:end].tolist(), self.w[start:end].tolist(), self.h[start:end].tolist(), class_names))
+
+        # only this frame's appended boxes, no scan over all of them
+        for start, end in self.app_frame_ranges.get(frame_id, ()):
+            for i in range(start, end):
+                boxes.append((self.app_cx[i], self.app_cy[i], self.app_w[i], self.app_h[i], self.class_names[self.app_class_id[i]]))
+
+        return boxes
+
+    # [(cx, cy, w, h, class_name), ...] of a frame
+    def frame_boxes(self, frame_id):
+        with self.lock:
+            return self.read_frame(frame_id)
+
+    # hand out a frame's boxes to a GT that will hold them as BBox objects until release()
+    def materialize(self, frame_id, gt):
+        with self.lock:
+            self.materialized[frame_id] = gt
+            return self.read_frame(frame_id)
+
+    # write back a materialized frame (if it changed) and let its GT drop the BBox objects
+    def release(self, frame_id):
+        with self.lock:
+            gt = self.materialized.pop(frame_id, None)
+            if gt is None:
+                return
+            if gt.store_stale == True:
+                self.overlay[frame_id] = tuple(gt.bbox_records())
+            gt.drop_bboxes()
+
+    # release every materialized frame but the ones given (e.g. the displayed frame)
+    def release_all(self, keep_frame_ids=()):
+        with self.lock:
+            for frame_id in list(self.materialized):
+                if frame_id not in keep_frame_ids:
+                    self.release(frame_id)
+
+    # fold appended boxes and overlay frames into a new frame-sorted base (vectorized)
+    def compact(self):
+        with self.lock:
+            # materialized frames keep their BBoxes, only their store copy is brought up to date
+            for frame_id, gt in self.materialized.items():
+                if gt.store_stale == True:
+                    self.overlay[frame_id] = tuple(gt.bbox_records())
+                    gt.store_stale = False
+
+            cx = np.concatenate([self.cx, np.frombuffer(self.app_cx, dtype=np.float32)])
+            cy = np.concatenate([self.cy, np.frombuffer(self.app_cy, dtype=np.float32)])
+            w = np.concatenate([self.w, np.frombuffer(self.app_w, dtype=np.float32)])
+            h = np.concatenate([self.h, np.frombuffer(self.app_h, dtype=np.float32)])
+            class_id = np.concatenate([self.class_id, np.frombuffer(self.app_class_id, dtype=np.uint16)])
+            frame_id = np.concatenate([self.frame_id, np.frombuffer(self.app_frame_id, dtype=np.int32)])
+
+            if len(self.overlay) > 0:
+                # replaced frames lose their base/appended boxes and get the overlay boxes instead
+                keep = np.isin(frame_id, np.fromiter(self.overlay.keys(), dtype=np.int32, count=len(self.overlay)), invert=True)
+                overlay_boxes = [(f, box) for f, boxes in self.overlay.items() for box in boxes]
+
+                cx = np.concatenate([cx[keep], np.array([box[0] for f, box in overlay_boxes], dtype=np.float32)])
+                cy = np.concatenate([cy[keep], np.array([box[1] for f, box in overlay_boxes], dtype=np.float32)])
+                w = np.concatenate([w[keep], np.array([box[2] for f, box in overlay_boxes], dtype=np.float32)])
+                h = np.concatenate([h[keep], np.array([box[3] for f, box in overlay_boxes], dtype=np.float32)])
+                class_id = np.concatenate([class_id[keep], np.array([self.get_class_id(box[4]) for f, box in overlay_boxes], dtype=np.uint16)])
+                frame_id = np.concatenate([frame_id[keep], np.array([f for f, box in overlay_boxes], dtype=np.int32)])
+
+            # stable sort keeps file order within each frame
+            order = np.argsort(frame_id, kind="stable")
+            self.cx = cx[order]
+            self.cy = cy[order]
+            self.w = w[order]
+            self.h = h[order]
+            self.class_id = class_id[order]
+            self.frame_id = frame_id[order]
+            self.frame_start = np.searchsorted(self.frame_id, np.arange(0, self.num_frames + 1), side="left").astype(np.int64)
+
+            self.reset_appended()
+            self.overlay = {}
+
+    # number of boxes of every frame
+    def frame_box_counts(self):
+        with self.lock:
+            counts = np.diff(self.frame_start)
+            if len(self.app_frame_id) > 0:
+                counts += np.bincount(np.frombuffer(self.app_frame_id, dtype=np.int32), minlength=self.num_frames)
+            for frame_id, boxes in self.overlay.items():
+                counts[frame_id] = len(boxes)
+            return counts
+
+    def num_boxes(self):
+        return int(self.frame_box_counts().sum())
+
+    # box count per class name over the whole image set
+    def class_counts(self):
+        with self.lock:
+            self.compact()
+            counts = np.bincount(self.class_id, minlength=len(self.class_names)).tolist()
+            return dict(zip(self.class_names, counts))
+
+    # memory held by the box columns (overlay tuples not included)
+    def nbytes(self):
+        with self.lock:
+            base_bytes = self.cx.nbytes*4 + self.class_id.nbytes + self.frame_id.nbytes + self.frame_start.nbytes
+            return base_bytes + len(self.app_cx)*(4*4 + 2 + 4)
@@ -128,7 +128,7 @@ class DNNTracker:
             bbox.cy = y + (h/2)
             bbox.w = w
             bbox.h = h
-            bbox.update_ul_lr()
+            bbox.set_img_dims(self.predict_img_width, self.predict_img_height)
 
             bbox.setStyle(Qt.green, Qt.SolidLine)
 
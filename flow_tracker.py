@@ -0,0 +1,103 @@
+import cv2
+import copy
+import time
+
+import numpy as np
+
+# "flow" prediction: every box of the previous frame is followed by a grid of points, the points of all boxes
+# go through one pyramidal Lucas-Kanade call (and one backward call to check them), and each box is moved and
+# scaled by the median motion of its reliable points - one optical flow pass per frame instead of a tracker per box.
+# Works on the frames of a TrackingContext (obj_tracker.py), in tracking coords.
+
+FLOW_GRID = 10              # points along each box side
+FLOW_WIN_SIZE = (9, 9)
+FLOW_MAX_LEVEL = 3
+FLOW_MIN_POINTS = 4         # fewer reliable points than this and the box is lost (stays where it was)
+
+
+# median of each row ignoring nan (nan for rows without a value) - np.nanmedian goes row by row on small arrays
+def row_medians(values):
+    sorted_values = np.sort(values, axis=1)  # nan sorts last
+    count = np.sum(np.isnan(values) == False, axis=1)
+    rows = np.arange(values.shape[0])
+    low = sorted_values[rows, np.maximum((count - 1)//2, 0)]
+    high = sorted_values[rows, count//2]
+    return np.where(count > 0, (low + high)/2, np.nan)
+
+
+class FlowTracker:
+    def __init__(self):
+        self.lk_params = dict(winSize=FLOW_WIN_SIZE, maxLevel=FLOW_MAX_LEVEL,
+                              criteria=(cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 20, 0.03))
+
+    # boxes of the context's previous frame moved into its next frame (one new bbox per box, in box order,
+    # a copy if lost)
+    def predict_bboxes(self, context, bboxes):
+        start_time = time.time()
+        num_boxes = len(bboxes)
+        context.num_boxes = num_boxes
+        if num_boxes == 0:
+            return []
+
+        # boxes in tracking coords
+        x_scale = np.array([context.predict_img_width/bb.img_width for bb in bboxes], dtype=np.float64)
+        y_scale = np.array([context.predict_img_height/bb.img_height for bb in bboxes], dtype=np.float64)
+        cx = np.array([bb.cx for bb in bboxes], dtype=np.float64) * x_scale
+        cy = np.array([bb.cy for bb in bboxes], dtype=np.float64) * y_scale
+        w = np.abs(np.array([bb.w for bb in bboxes], dtype=np.float64)) * x_scale
+        h = np.abs(np.array([bb.h for bb in bboxes], dtype=np.float64)) * y_scale
+
+        # FLOW_GRID x FLOW_GRID points per box, shape (boxes, points)
+        steps = (np.arange(FLOW_GRID) + 0.5)/FLOW_GRID - 0.5
+        grid_x, grid_y = np.meshgrid(steps, steps)
+        points_x = cx[:, None] + grid_x.ravel()[None, :] * w[:, None]
+        points_y = cy[:, None] + grid_y.ravel()[None, :] * h[:, None]
+        num_points = points_x.shape[1]
+
+        points = np.stack([points_x.ravel(), points_y.ravel()], axis=1).astype(np.float32).reshape(-1, 1, 2)
+        new_points, status, err = cv2.calcOpticalFlowPyrLK(context.prev_mat, context.next_mat, points, None, **self.lk_params)
+        back_points, back_status, err = cv2.calcOpticalFlowPyrLK(context.next_mat, context.prev_mat, new_points, None, **self.lk_params)
+
+        # forward-backward error: distance a point ends up from where it started after flowing there and back
+        fb_error = np.linalg.norm(points.reshape(-1, 2) - back_points.reshape(-1, 2), axis=1).reshape(num_boxes, num_points)
+        found = (status.reshape(num_boxes, num_points) == 1) & (back_status.reshape(num_boxes, num_points) == 1)
+        fb_error = np.where(found, fb_error, np.nan)
+
+        # reliable points: found both ways, forward-backward error at most the box's median
+        reliable = found & (fb_error <= row_medians(fb_error)[:, None])
+        num_reliable = reliable.sum(axis=1)
+
+        new_x = np.where(reliable, new_points[:, 0, 0].reshape(num_boxes, num_points), np.nan)
+        new_y = np.where(reliable, new_points[:, 0, 1].reshape(num_boxes, num_points), np.nan)
+        old_x = np.where(reliable, points_x, np.nan)
+        old_y = np.where(reliable, points_y, np.nan)
+
+        lost = num_reliable < FLOW_MIN_POINTS
+
+        # translation: median point motion
+        dx = row_medians(new_x - old_x)
+        dy = row_medians(new_y - old_y)
+
+        # scale: median ratio of the points' distances to their median point, after vs before
+        new_dist = np.hypot(new_x - row_medians(new_x)[:, None], new_y - row_medians(new_y)[:, None])
+        old_dist = np.hypot(old_x - row_medians(old_x)[:, None], old_y - row_medians(old_y)[:, None])
+        ratios = np.where(old_dist > 1e-6, new_dist/np.where(old_dist > 1e-6, old_dist, 1.0), np.nan)
+        scale = row_medians(ratios)
+        scale = np.where(np.isfinite(scale), scale, 1.0)
+
+        new_bboxes = []
+        for n, bb in enumerate(bboxes):
+            predict_bbox = copy.deepcopy(bb)
+            if lost[n] == False:
+                # store output dims in new bbox (float, rounded only when written to the GT file)
+                predict_bbox.cx = (cx[n] + dx[n])/x_scale[n]
+                predict_bbox.cy = (cy[n] + dy[n])/y_scale[n]
+                predict_bbox.w = bb.w * scale[n]
+                predict_bbox.h = bb.h * scale[n]
+            new_bboxes.append(predict_bbox)
+
+        context.num_tracked = num_boxes
+        context.num_lost = int(lost.sum())
+        context.track_time = time.time() - start_time
+        context.wall_time = context.track_time
+        return new_bboxes
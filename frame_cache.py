@@ -0,0 +1,166 @@
+import threading
+from collections import OrderedDict
+
+from PyQt6.QtCore import QThread, QSize
+from PyQt6.QtGui import QImage, QImageReader
+
+
+# native image dimensions from the file header (no decode)
+def image_native_size(full_path):
+    reader = QImageReader(full_path)
+    size = reader.size()
+    return size.width(), size.height()
+
+# largest JPEG DCT scale denominator (1, 2, 4 or 8) whose decoded image still covers the requested size
+def decode_scale_denom(img_width, img_height, min_width, min_height):
+    scale_denom = 1
+    while scale_denom < 8 and img_width/(scale_denom*2) >= min_width and img_height/(scale_denom*2) >= min_height:
+        scale_denom *= 2
+    return scale_denom
+
+def decode_image_file(full_path, scale_denom=1):
+    reader = QImageReader(full_path)
+
+    if scale_denom > 1:
+        # JPEG reader decodes directly at 1/2, 1/4 or 1/8 size in the DCT domain when asked for that exact size
+        size = reader.size()
+        if size.isValid():
+            reader.setScaledSize(QSize((size.width() + scale_denom - 1)//scale_denom, (size.height() + scale_denom - 1)//scale_denom))
+
+    q_image = reader.read()
+    #q_image = q_image.convertToFormat(QImage.Format_Grayscale8)
+    q_image = q_image.convertToFormat(QImage.Format.Format_RGB888)
+    return q_image
+
+
+class FrameCache:
+    def __init__(self, max_bytes, decoder=decode_image_file):
+
+        # byte budget for all decoded frames held in the cache
+        self.max_bytes = max_bytes
+        self.curr_bytes = 0
+
+        self.decoder = decoder
+
+        # keys are (full_path, scale_denom), least recently used frames are at the front of the dict
+        self.frames = OrderedDict()
+
+        # frames currently being decoded (key -> event set when decode is done)
+        self.pending = {}
+
+        self.lock = threading.Lock()
+
+        self.num_hits = 0
+        self.num_misses = 0
+
+    def set_max_bytes(self, max_bytes):
+        with self.lock:
+            self.max_bytes = max_bytes
+            self.evict()
+
+    def clear(self):
+        with self.lock:
+            self.frames.clear()
+            self.curr_bytes = 0
+            self.num_hits = 0
+            self.num_misses = 0
+
+    def contains(self, key):
+        with self.lock:
+            return key in self.frames or key in self.pending
+
+    def get(self, key):
+        while True:
+            with self.lock:
+                q_image = self.frames.get(key)
+                if q_image is not None:
+                    self.frames.move_to_end(key)
+                    self.num_hits += 1
+                    return q_image
+
+                done_event = self.pending.get(key)
+                if done_event is None:
+                    # nobody is decoding this frame - claim it
+                    done_event = threading.Event()
+                    self.pending[key] = done_event
+                    self.num_misses += 1
+                    break
+
+            # another thread is already decoding this frame, wait for it and retry
+            done_event.wait()
+
+        q_image = None
+        try:
+            q_image = self.decoder(*key)
+        finally:
+            with self.lock:
+                if q_image is not None:
+                    self.insert(key, q_image)
+                del self.pending[key]
+            done_event.set()
+
+        return q_image
+
+    # must be called with lock held
+    def insert(self, key, q_image):
+        old_image = self.frames.pop(key, None)
+        if old_image is not None:
+            self.curr_bytes -= old_image.sizeInBytes()
+
+        self.frames[key] = q_image
+        self.curr_bytes += q_image.sizeInBytes()
+        self.evict()
+
+    # must be called with lock held
+    def evict(self):
+        # drop least recently used frames until under budget (always keep newest frame)
+        while self.curr_bytes > self.max_bytes and len(self.frames) > 1:
+            _, old_image = self.frames.popitem(last=False)
+            self.curr_bytes -= old_image.sizeInBytes()
+
+    def stats_string(self):
+        with self.lock:
+            return "frames = " + str(len(self.frames)) + ", MB = " + "{:.1f}".format(self.curr_bytes/(1024*1024)) + \
+                   ", hits = " + str(self.num_hits) + ", misses = " + str(self.num_misses)
+
+
+class Frame_Prefetch_Process(QThread):
+    def __init__(self, frame_cache):
+        QThread.__init__(self)
+
+        self.frame_cache = frame_cache
+        self.requested_keys = []
+        self.active = False
+        self.lock = threading.Lock()
+
+    def __del__(self):
+        self.wait()
+
+    def request(self, keys):
+        # latest request replaces anything not yet prefetched
+        with self.lock:
+            self.requested_keys = list(keys)
+            if self.active == True:
+                return
+            self.active = True
+
+        # previous run may still be winding down
+        self.wait()
+        self.start()
+
+    def stop(self):
+        with self.lock:
+            self.requested_keys = []
+        self.wait()
+
+    def run(self):
+
+        while True:
+            with self.lock:
+                if len(self.requested_keys) == 0:
+                    self.active = False
+                    return
+                key = self.requested_keys.pop(0)
+
+            if self.frame_cache.contains(key) == False:
+                self.frame_cache.get(key)
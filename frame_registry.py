@@ -0,0 +1,153 @@
+import itertools
+import os
+
+import numpy as np
+
+from gt import GT_Image
+
+# Compact registry of the image files of a folder (one per session), 13 bytes per frame plus the filename:
+#   dir_id        uint32 per frame, index into dir_prefixes (interned directory part of the path)
+#   names         fixed width utf-8 base filenames, in image list (alpha) order
+#   width/height  native dims read from the file headers, valid where status has FRAME_DIMS_KNOWN
+#   status        FRAME_* bits per frame
+# GT_Image objects (with their GT) are only created when a frame is first used, e.g. visited or
+# annotated - frames never touched cost no Python objects.  Indexing the registry like the old
+# GT_Image list creates the frame's GT_Image on demand.
+
+FRAME_DIMS_KNOWN = 1
+FRAME_GT_SOURCE = 2     # frame has rows in the lazily read GT file (gt_source)
+
+REGISTRY_CHUNK_SIZE = 65536
+
+
+class FrameRegistry:
+    def __init__(self, full_paths, box_store):
+        self.box_store = box_store
+        self.num_frames = len(full_paths)
+
+        # directory part of each path interned (an image folder is normally a single prefix), base filenames
+        # as utf-8 bytes - built in chunks so the temporary per-path objects stay small
+        prefix_ids = {}
+        dir_id_chunks = []
+        name_chunks = []
+        for chunk_start in range(0, self.num_frames, REGISTRY_CHUNK_SIZE):
+            chunk = full_paths[chunk_start:chunk_start + REGISTRY_CHUNK_SIZE]
+            base_filenames = [os.path.basename(full_path) for full_path in chunk]
+            dir_id_chunks.append(np.array([prefix_ids.setdefault(full_path[0:len(full_path) - len(base_filename)], len(prefix_ids)) for full_path, base_filename in zip(chunk, base_filenames)], dtype=np.uint32))
+            name_chunks.append(np.array([base_filename.encode("utf-8") for base_filename in base_filenames], dtype=np.bytes_))
+
+        self.dir_prefixes = list(prefix_ids)
+        self.dir_id = np.concatenate(dir_id_chunks) if self.num_frames > 0 else np.zeros(0, dtype=np.uint32)
+        self.names = np.concatenate(name_chunks) if self.num_frames > 0 else np.zeros(0, dtype="S1")
+        del dir_id_chunks, name_chunks
+
+        # filename lookups by binary search (utf-8 byte order is code point order, so a sorted image list needs no copy)
+        if np.all(self.names[1:] >= self.names[:-1]):
+            self.name_order = None
+            self.sorted_names = self.names
+        else:
+            self.name_order = np.argsort(self.names, kind="stable")
+            self.sorted_names = self.names[self.name_order]
+
+        self.width = np.zeros(self.num_frames, dtype=np.int32)
+        self.height = np.zeros(self.num_frames, dtype=np.int32)
+        self.status = np.zeros(self.num_frames, dtype=np.uint8)
+
+        self.gt_source = None
+
+        # frame_id -> GT_Image, for frames in use
+        self.gt_images = {}
+
+    def __len__(self):
+        return self.num_frames
+
+    # GT_Image of a frame, created on first use
+    def __getitem__(self, frame_id):
+        gt_img = self.gt_images.get(frame_id)
+        if gt_img is None:
+            if frame_id < 0 or frame_id >= self.num_frames:
+                raise IndexError("frame index out of range")
+
+            gt_img = GT_Image(self.box_store, frame_id)
+            gt_img.full_path = self.full_path(frame_id)
+            gt_img.base_filename = self.base_filename(frame_id)
+
+            status = int(self.status[frame_id])
+            if status & FRAME_DIMS_KNOWN:
+                gt_img.set_img_dims(int(self.width[frame_id]), int(self.height[frame_id]))
+            if status & FRAME_GT_SOURCE:
+                gt_img.gt_source = self.gt_source
+
+            self.gt_images[frame_id] = gt_img
+        return gt_img
+
+    def base_filename(self, frame_id):
+        return self.names[frame_id].decode("utf-8")
+
+    def full_path(self, frame_id):
+        return self.dir_prefixes[self.dir_id[frame_id]] + self.base_filename(frame_id)
+
+    # native dims from probe_image_dims_list(), (0, 0) where unknown - returns the number of unknown dims
+    def set_dims_list(self, dims_list):
+        if self.num_frames == 0:
+            return 0
+
+        dims = np.fromiter(itertools.chain.from_iterable(dims_list), dtype=np.int64, count=2*self.num_frames).reshape(-1, 2)
+        known = (dims[:, 0] > 0) & (dims[:, 1] > 0)
+        self.width[known] = dims[known, 0]
+        self.height[known] = dims[known, 1]
+        self.status[known] |= FRAME_DIMS_KNOWN
+
+        for frame_id, gt_img in self.gt_images.items():
+            if known[frame_id] == True:
+                gt_img.set_img_dims(int(self.width[frame_id]), int(self.height[frame_id]))
+
+        return int(self.num_frames - np.count_nonzero(known))
+
+    # frame index of a base filename, None if there is no such image
+    def index_of(self, base_filename):
+        if self.num_frames == 0:
+            return None
+
+        key = base_filename.encode("utf-8")
+        pos = int(np.searchsorted(self.sorted_names, key))
+        if pos >= self.num_frames or self.sorted_names[pos] != key:
+            return None
+        if self.name_order is not None:
+            return int(self.name_order[pos])
+        return pos
+
+    # frame indices of many base filenames at once (-1 where there is no such image)
+    def lookup(self, base_filenames):
+        if self.num_frames == 0 or len(base_filenames) == 0:
+            return np.full(len(base_filenames), -1, dtype=np.int64)
+
+        keys = np.array([base_filename.encode("utf-8") for base_filename in base_filenames], dtype=np.bytes_)
+        pos = np.minimum(np.searchsorted(self.sorted_names, keys), self.num_frames - 1)
+        found = self.sorted_names[pos] == keys
+
+        if self.name_order is not None:
+            pos = self.name_order[pos]
+        return np.where(found, pos, -1).astype(np.int64)
+
+    # point frames with rows in a lazily read GT file at it, returns the number of frames found
+    def set_gt_source(self, gt_source, img_filenames):
+        self.gt_source = gt_source
+
+        frame_ids = self.lookup(img_filenames)
+        frame_ids = np.unique(frame_ids[frame_ids >= 0])
+        self.status[frame_ids] |= FRAME_GT_SOURCE
+
+        for frame_id in frame_ids.tolist():
+            gt_img = self.gt_images.get(frame_id)
+            if gt_img is not None:
+                gt_img.gt_source = gt_source
+
+        return len(frame_ids)
+
+    # memory held by the registry arrays (GT_Images of frames in use not included)
+    def nbytes(self):
+        nbytes = self.dir_id.nbytes + self.names.nbytes + self.width.nbytes + self.height.nbytes + self.status.nbytes
+        if self.name_order is not None:
+            nbytes += self.name_order.nbytes + self.sorted_names.nbytes
+        return nbytes
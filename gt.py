@@ -1,10 +1,43 @@
 import copy
 
-from obj_tracker import ObjectTracker
+import numpy as np
+
+from PyQt6.QtCore import Qt
+from PyQt6.QtGui import QTransform
+
+from bbox import BBox
+from box_grid import BoxGrid
+from box_painter import draw_bboxes
+from hit_test import EDGE_NONE, display_rects, hit_test
+from obj_tracker import ObjectTracker, TrackingContext
+from flow_tracker import FlowTracker
 from dnn_tracker import DNNTracker
 
+# display pixels around the cursor searched first by the nearest-box queries (widened until a box is found)
+HIT_SEARCH_RADIUS = 8
+
+# BBox objects for GT boxes: [(cx, cy, w, h, class_name), ...] in native image coords
+def make_gt_bboxes(boxes, img_width, img_height, disp_width, disp_height):
+    new_bboxes = []
+    for cx, cy, w, h, class_name in boxes:
+        # create new BBox
+        new_bbox = BBox()
+        new_bbox.cx = cx
+        new_bbox.cy = cy
+        new_bbox.w = w
+        new_bbox.h = h
+
+        new_bbox.class_name = class_name
+        new_bbox.setStyle(Qt.GlobalColor.green,Qt.PenStyle.SolidLine)
+        new_bbox.set_img_dims(img_width, img_height)
+        new_bbox.set_disp_dims(disp_width, disp_height)
+        new_bboxes.append(new_bbox)
+    return new_bboxes
+
 class GT:
-    def __init__(self):
+    # box_store/frame_id: boxes live in the image set's BoxStore and are only held as BBox objects
+    # while materialized (first use of bbox_list until BoxStore.release())
+    def __init__(self, box_store=None, frame_id=-1):
 
         # trial version flag
         #self.trial_version = True
@@ -19,7 +52,98 @@ class GT:
         self.disp_width = 0
         self.disp_height = 0
 
-        self.bbox_list = []
+        self.box_store = box_store
+        self.frame_id = frame_id
+
+        # None while the boxes are only in the box store
+        self._bbox_list = None if box_store is not None else []
+
+        # True when the BBoxes differ from the store copy (written back on release)
+        self.store_stale = False
+
+        # spatial index of the BBoxes for hit tests, built on first use (see get_box_grid)
+        self.box_grid = None
+
+        # bumped on every change to how the boxes are drawn (edits, loaded boxes, dims) - see PaneRenderer
+        self.draw_version = 0
+
+        # bumped on every change to the boxes, saved_version is the version last written to the GT file
+        self.version = 0
+        self.saved_version = 0
+
+        # immutable copy of records() for snapshot_version, shared with background saves (rebuilt after a change)
+        self.records_snapshot = ()
+        self.snapshot_version = 0
+
+    @property
+    def bbox_list(self):
+        if self._bbox_list is None:
+            # under the store lock, so boxes still being loaded for this frame are not missed
+            with self.box_store.lock:
+                boxes = self.box_store.materialize(self.frame_id, self)
+                self._bbox_list = make_gt_bboxes(boxes, self.image_width, self.image_height, self.disp_width, self.disp_height)
+        return self._bbox_list
+
+    @bbox_list.setter
+    def bbox_list(self, bbox_list):
+        if self._bbox_list is None:
+            with self.box_store.lock:
+                self.box_store.materialize(self.frame_id, self)
+                self._bbox_list = bbox_list
+        else:
+            self._bbox_list = bbox_list
+        self.store_stale = True
+        self.box_grid = None
+
+    def is_materialized(self):
+        return self._bbox_list is not None
+
+    # called by the box store (with its lock held)
+    def extend_bboxes(self, boxes):
+        new_bboxes = make_gt_bboxes(boxes, self.image_width, self.image_height, self.disp_width, self.disp_height)
+        self._bbox_list.extend(new_bboxes)
+        self.draw_version += 1
+        if self.box_grid is not None:
+            for bb in new_bboxes:
+                self.box_grid.insert(bb)
+
+    # called by the box store (with its lock held)
+    def drop_bboxes(self):
+        self._bbox_list = None
+        self.store_stale = False
+        self.box_grid = None
+
+    # add boxes read from a GT file (not an edit)
+    def add_loaded_boxes(self, boxes):
+        if self.box_store is not None:
+            self.box_store.append_frame(self.frame_id, boxes)
+        else:
+            # publish all boxes at once, the frame is usable as soon as this returns
+            self.extend_bboxes(boxes)
+
+    def mark_dirty(self):
+        self.version += 1
+        self.draw_version += 1
+        self.store_stale = True
+
+    def is_dirty(self):
+        return self.version != self.saved_version
+
+    def bbox_records(self):
+        return [(bb.cx, bb.cy, bb.w, bb.h, bb.class_name) for bb in self._bbox_list]
+
+    # (cx, cy, w, h, class_name) per box, native image coords
+    def records(self):
+        if self._bbox_list is None:
+            return self.box_store.frame_boxes(self.frame_id)
+        return self.bbox_records()
+
+    # (version, records tuple) - only copies the boxes when they changed since the last snapshot
+    def snapshot(self):
+        if self.snapshot_version != self.version:
+            self.records_snapshot = tuple(self.records())
+            self.snapshot_version = self.version
+        return self.snapshot_version, self.records_snapshot
 
     def add(self, bbox):
         # limit number of bboxes per image if trial version
@@ -27,55 +151,91 @@ class GT:
             return
 
         self.bbox_list.append(bbox)
+        if self.box_grid is not None:
+            self.box_grid.insert(bbox)
+        self.mark_dirty()
         return True
 
     def remove(self,bbox):
         if bbox != None:
             self.bbox_list.remove(bbox)
+            if self.box_grid is not None:
+                self.box_grid.remove(bbox)
+            self.mark_dirty()
 
     def delete_last(self):
         if len(self.bbox_list) > 0:
-            self.bbox_list.pop()
+            bbox = self.bbox_list.pop()
+            if self.box_grid is not None:
+                self.box_grid.remove(bbox)
+            self.mark_dirty()
 
     def delete_all(self):
-        self.bbox_list.clear()
+        if len(self.bbox_list) > 0:
+            self.bbox_list.clear()
+            self.box_grid = None
+            self.mark_dirty()
 
     def num_annotations(self):
         return len(self.bbox_list)
 
-    # returns bbox whose center is closest to the given point
-    def bbox_closest_center(self,point):
+    # spatial index of the boxes (native coords), kept up to date by add/remove/delete
+    # (moving or resizing a box happens while it is out of the list)
+    def get_box_grid(self):
+        if self.box_grid is None:
+            self.box_grid = BoxGrid(self.image_width, self.image_height)
+            for bb in self.bbox_list:
+                self.box_grid.insert(bb)
+        return self.box_grid
+
+    # native coords rect around a display point, radius in display pixels
+    def native_search_rect(self, point, radius):
+        x_scale = self.image_width/self.disp_width
+        y_scale = self.image_height/self.disp_height
+
+        # one pixel of slack: the display geometry queried is rounded to whole pixels
+        x = point.x() * x_scale
+        y = point.y() * y_scale
+        rx = (radius + 1) * x_scale
+        ry = (radius + 1) * y_scale
+        return x - rx, y - ry, x + rx, y + ry
+
+    # bbox with the smallest display distance dist(bb) to point (first in list on ties)
+    # dist must not be less than the distance from point to some part of the box
+    def bbox_nearest(self, point, dist):
         if len(self.bbox_list) == 0:
             return None
 
-        center_list = []
-        for bb in self.bbox_list:
-            dist = bb.center_from_point(point)
-            center_list.append(dist)
+        box_grid = self.get_box_grid()
 
-        min_pos = center_list.index(min(center_list))
-        bbox = self.bbox_list[min_pos]
-        return bbox
+        # search outward: a box closer than the search radius is always among the candidates
+        radius = HIT_SEARCH_RADIUS
+        while True:
+            search_rect = self.native_search_rect(point, radius)
 
-    # returns bbox whose edge is closest to the given point
-    def bbox_closest_proximity(self,point):
-        if len(self.bbox_list) == 0:
-            return None
+            bbox = None
+            min_dist = 0
+            for bb in box_grid.query(*search_rect):
+                bb_dist = dist(bb)
+                if bbox is None or bb_dist < min_dist:
+                    bbox = bb
+                    min_dist = bb_dist
 
-        prox_list = []
-        for bb in self.bbox_list:
-            dist = bb.shortest_proximity(point)
-            prox_list.append(dist)
+            if (bbox is not None and min_dist <= radius) or box_grid.covers(*search_rect):
+                return bbox
+            radius *= 4
 
-        min_pos = prox_list.index(min(prox_list))
-        bbox = self.bbox_list[min_pos]
-        return bbox
+    # returns bbox whose center is closest to the given point
+    def bbox_closest_center(self,point):
+        return self.bbox_nearest(point, lambda bb: bb.center_from_point(point))
 
     def bbox_contain(self,point):
-        contain_list = []
+        if len(self.bbox_list) == 0:
+            return None
 
         # check if any bounding boxes contain the point
-        for bb in self.bbox_list:
+        contain_list = []
+        for bb in self.get_box_grid().query(*self.native_search_rect(point, 0)):
             if bb.contains(point):
                 contain_list.append(bb)
 
@@ -84,103 +244,214 @@ class GT:
         elif len(contain_list) == 1:
             return contain_list[0]
         else:
-            return self.bbox_closest_center(point)
-
-    def bbox_proximity(self, point):
-        proximity_list = []
-
-        for bb in self.bbox_list:
-            if bb.check_proximity(point):
-                proximity_list.append(bb)
-                #return bb
-        if len(proximity_list) == 0:
-            return None
-        elif len(proximity_list) == 1:
-            return proximity_list[0]
-        else:
-            return self.bbox_closest_proximity(point)
+            # nested/overlapping boxes: the one whose center is closest
+            center_list = [bb.center_from_point(point) for bb in contain_list]
+            return contain_list[center_list.index(min(center_list))]
+
+    # box under the cursor for a mouse press, nothing is changed on the boxes:
+    #   (bbox, EDGE_*)      edge of bbox near enough for a resize
+    #   (bbox, EDGE_NONE)   box containing the point, to move
+    #   (None, EDGE_NONE)   no hit
+    def hit_test(self, point):
+        if len(self.bbox_list) == 0:
+            return None, EDGE_NONE
+
+        # a box with an edge within the search radius (beyond the proximity threshold) or containing
+        # the point is always among the candidates
+        candidates = self.get_box_grid().query(*self.native_search_rect(point, HIT_SEARCH_RADIUS))
+        if len(candidates) == 0:
+            return None, EDGE_NONE
+
+        count = len(candidates)
+        rects = display_rects(np.fromiter((bb.cx for bb in candidates), dtype=np.float64, count=count),
+                              np.fromiter((bb.cy for bb in candidates), dtype=np.float64, count=count),
+                              np.fromiter((bb.w for bb in candidates), dtype=np.float64, count=count),
+                              np.fromiter((bb.h for bb in candidates), dtype=np.float64, count=count),
+                              self.disp_width/self.image_width, self.disp_height/self.image_height)
+
+        index, edge = hit_test(point.x(), point.y(), *rects)
+        if index < 0:
+            return None, EDGE_NONE
+        return candidates[index], edge
 
     def predict_dnn_annotation(self, next_img, dnn_tracker, conf_thresh, label_list):
         self.bbox_list = dnn_tracker.run_prediction(next_img, conf_thresh, label_list)
+        self.mark_dirty()
 
         for bb in self.bbox_list:
-            #update bounding box with current native img dims
-            bb.set_img_dims(self.image_width, self.image_height)
-            bb.update_cx_cy_w_h()
+            #detections are in the tracker's image dims, update bounding box to current native img dims
+            bb.rescale_img_dims(self.image_width, self.image_height)
 
             #update bbox for display
             bb.set_disp_dims(self.disp_width, self.disp_height)
-            bb.update_ul_lr()
 
-    def predict_annotation(self, src_gt, prev_img, next_img, prediction_mode):
-        self.bbox_list = []
+    # constant velocity extrapolation of src_gt's boxes from their matches in older_gt (no images), see MotionTracker
+    # older_gap/next_gap: frames from older_gt to src_gt / from src_gt to this GT
+    def predict_motion_annotation(self, src_gt, older_gt, older_gap, next_gap, motion_tracker):
+        older_bboxes = older_gt.bbox_list if older_gt is not None else []
+        boxes = motion_tracker.predict_boxes(src_gt.bbox_list, older_bboxes, older_gap, next_gap, self.image_width, self.image_height)
+        self.set_predicted_bboxes(make_gt_bboxes(boxes, self.image_width, self.image_height, self.disp_width, self.disp_height))
+
+    # tracking_context: TrackingContext of prev_img -> next_img, made here if not given
+    # tracking_session: TrackingSession the context was made by, to track with the session's ongoing tracks
+    def predict_annotation(self, src_gt, prev_img, next_img, prediction_mode, tracking_context=None, tracking_session=None):
+        new_bbox_list = []
+
+        if prediction_mode == "track" and tracking_session is not None:
+            self.set_predicted_bboxes(tracking_session.track_bboxes(tracking_context, src_gt.bbox_list))
+            return
+
+        if prediction_mode == "flow":
+            # optical flow for all boxes at once
+            if len(src_gt.bbox_list) > 0 and tracking_context is None:
+                tracking_context = TrackingContext(prev_img, next_img)
+            self.set_predicted_bboxes(FlowTracker().predict_bboxes(tracking_context, src_gt.bbox_list))
+            return
+
+        if prediction_mode == "track" and len(src_gt.bbox_list) > 0:
+            # frames are converted once for all boxes of the frame pair
+            if tracking_context is None:
+                tracking_context = TrackingContext(prev_img, next_img)
+            obj_track = ObjectTracker()
 
         for bb in src_gt.bbox_list:
 
             if prediction_mode == "track":
                 # use image tracking to determine new bounding box
-                obj_track = ObjectTracker()
-                new_bb = obj_track.predict_bbox(prev_img, next_img, bb)
+                new_bb = obj_track.predict_bbox_in_context(tracking_context, bb)
             else:
                 # nothing fancy - copy bounding box from src gt
                 new_bb = copy.deepcopy(bb)
 
             # add bounding box to list
-            self.bbox_list.append(new_bb)
+            new_bb.set_img_dims(self.image_width, self.image_height)
+            new_bb.set_disp_dims(self.disp_width, self.disp_height)
+            new_bbox_list.append(new_bb)
+
+        self.bbox_list = new_bbox_list
+        self.mark_dirty()
+
+    # boxes predicted (e.g. tracked in the background) from another frame's GT become this frame's GT
+    def set_predicted_bboxes(self, bboxes):
+        for bb in bboxes:
+            bb.set_img_dims(self.image_width, self.image_height)
+            bb.set_disp_dims(self.disp_width, self.disp_height)
+
+        self.bbox_list = list(bboxes)
+        self.mark_dirty()
 
+    # box display geometry is rebuilt on next use (hit tests), boxes are drawn straight from native coords
     def set_img_dims(self, img_width, img_height):
+        if img_width == self.image_width and img_height == self.image_height:
+            return
         self.image_width = img_width
         self.image_height = img_height
+        self.box_grid = None
+        self.draw_version += 1
 
-        for bb in self.bbox_list:
+        # (boxes still in the box store pick up the dims when they are materialized)
+        if self._bbox_list is None:
+            return
+
+        for bb in self._bbox_list:
             bb.set_img_dims(img_width,img_height)
-            bb.update_ul_lr()
 
+    # called on every redraw - nothing to do unless the pane size changed
     def set_disp_dims(self, disp_width, disp_height):
+        if disp_width == self.disp_width and disp_height == self.disp_height:
+            return
         self.disp_width = disp_width
         self.disp_height = disp_height
+        self.draw_version += 1
 
-        for bb in self.bbox_list:
+        if self._bbox_list is None:
+            return
+
+        for bb in self._bbox_list:
             bb.set_disp_dims(disp_width,disp_height)
-            bb.update_ul_lr()
 
     def draw(self, qpainter):
         #print("bbox_list size = " + str(len(self.bbox_list)))
-        for bb in self.bbox_list:
-            bb.draw(qpainter)
+        # one native -> display mapping for all boxes
+        transform = QTransform.fromScale(self.disp_width/self.image_width, self.disp_height/self.image_height)
+        draw_bboxes(qpainter, self.bbox_list, transform)
 
 
 class GT_Image:
-    def __init__(self):
+    def __init__(self, box_store=None, frame_id=-1):
 
         self.full_path = "unknown"
         self.base_filename = "unknown"
         self.image_width = 800
         self.image_height = 600
 
+        # False until native dims have been read from the image (defaults to 800x600 until then)
+        self.dims_known = False
+
         self.disp_width = 800
         self.disp_height = 600
 
-        self.gt = GT()
+        # GT rows not read yet (lazy loading through the GT index sidecar), see GT_Row_Source
+        self.gt_source = None
+
+        self._gt = GT(box_store, frame_id)
+        self._gt.set_img_dims(self.image_width, self.image_height)
+        self._gt.set_disp_dims(self.disp_width, self.disp_height)
+
+    # GT is read from the GT file on first access when lazily loaded
+    @property
+    def gt(self):
+        if self.gt_source is not None:
+            self.materialize_gt()
+        return self._gt
+
+    @gt.setter
+    def gt(self, gt):
+        self.gt_source = None
+        self._gt = gt
 
     def get_gt(self):
         return self.gt
 
+    # True if the GT in memory matches this image's rows in the GT file it was read from (or last saved to)
+    def is_gt_clean(self):
+        return self.gt_source is not None or self._gt.is_dirty() == False
+
+    # what a save needs from this image: None if its rows can be copied from the GT file,
+    # otherwise (gt, version, records) - must be taken on the GUI thread
+    def save_snapshot(self, copy_clean):
+        if copy_clean == True and self.is_gt_clean():
+            return None
+        version, records = self._gt.snapshot()
+        return self._gt, version, records
+
+    def materialize_gt(self):
+        gt_source = self.gt_source
+        self.gt_source = None
+
+        self.add_gt_boxes(gt_source.read_boxes(self.base_filename))
+
+    # add parsed GT boxes: [(cx, cy, w, h, class_name), ...] in native image coords
+    def add_gt_boxes(self, boxes):
+        self._gt.add_loaded_boxes(boxes)
+
     def refresh_gt_img_dims(self):
         # just strobe img dims to bboxes
-        if self.gt != None:
-            self.gt.set_img_dims(self.image_width, self.image_height)
+        if self._gt != None:
+            self._gt.set_img_dims(self.image_width, self.image_height)
 
     def set_img_dims(self, img_width, img_height):
         self.image_width = img_width
         self.image_height = img_height
+        self.dims_known = True
 
-        if self.gt != None:
-            self.gt.set_img_dims(self.image_width, self.image_height)
+        # (boxes not read yet pick up the dims when they are created)
+        if self._gt != None:
+            self._gt.set_img_dims(self.image_width, self.image_height)
 
     def set_disp_dims(self, disp_width, disp_height):
         self.disp_width = disp_width
         self.disp_height = disp_height
 
-        if self.gt != None:
-            self.gt.set_disp_dims(self.disp_width, self.disp_height)
+        if self._gt != None:
+            self._gt.set_disp_dims(self.disp_width, self.disp_height)
@@ -0,0 +1,196 @@
+import argparse
+import json
+import mmap
+import struct
+import time
+
+import numpy as np
+
+from gt_csv import parse_gt_lines
+
+# Compact columnar binary GT format (.gtb), memory mappable for random access per image:
+#   magic (8 bytes), header length (uint32 LE), JSON header, then 64 byte aligned arrays:
+#     row_box_start  int64[num_rows + 1]   box range [row_box_start[r], row_box_start[r+1]) of GT row r
+#     cx, cy, w, h   float32[num_boxes]    native image coords
+#     class_id       uint16[num_boxes]     index into the class name table
+#     filenames      uint8 blob            newline separated img_filename per GT row
+#     class_names    uint8 blob            newline separated class names
+# rows keep their CSV order, so CSV -> binary -> CSV gives back the same rows (coords are exact for
+# integer pixels, other values come back as the shortest text that round trips through float32)
+
+GTB_MAGIC = b"DLAGTB\x00\x01"
+GTB_VERSION = 1
+GTB_ALIGN = 64
+
+GTB_ARRAY_DTYPES = {"row_box_start": np.int64, "cx": np.float32, "cy": np.float32, "w": np.float32, "h": np.float32,
+                    "class_id": np.uint16, "filenames": np.uint8, "class_names": np.uint8}
+
+
+def is_gt_binary_file(gt_file_path):
+    try:
+        with open(gt_file_path, "rb") as gt_filestream:
+            return gt_filestream.read(len(GTB_MAGIC)) == GTB_MAGIC
+    except OSError:
+        return False
+
+# records: [(img_filename, [(cx, cy, w, h, class_name), ...]), ...] - one per GT row
+def write_gt_binary(gt_filestream, records):
+    row_box_start = np.zeros(len(records) + 1, dtype=np.int64)
+    coords = []
+    class_ids = []
+    class_table = {}
+    for r, (img_filename, boxes) in enumerate(records):
+        row_box_start[r + 1] = row_box_start[r] + len(boxes)
+        for cx, cy, w, h, class_name in boxes:
+            coords.append((cx, cy, w, h))
+            class_ids.append(class_table.setdefault(class_name, len(class_table)))
+
+    coords = np.array(coords, dtype=np.float32).reshape(-1, 4)
+
+    arrays = {
+        "row_box_start": row_box_start,
+        "cx": np.ascontiguousarray(coords[:, 0]),
+        "cy": np.ascontiguousarray(coords[:, 1]),
+        "w": np.ascontiguousarray(coords[:, 2]),
+        "h": np.ascontiguousarray(coords[:, 3]),
+        "class_id": np.array(class_ids, dtype=np.uint16),
+        "filenames": np.frombuffer("\n".join([record[0] for record in records]).encode("utf-8"), dtype=np.uint8),
+        "class_names": np.frombuffer("\n".join(class_table).encode("utf-8"), dtype=np.uint8),
+    }
+    if len(class_table) > 65535:
+        raise ValueError("binary GT supports at most 65535 class names")
+
+    # array offsets depend on the header length, so lay out the arrays after a worst case header
+    layout = {name: [0, len(array)] for name, array in arrays.items()}
+    header = {"version": GTB_VERSION, "num_rows": len(records), "num_boxes": len(class_ids), "arrays": layout}
+    max_header_len = len(json.dumps(header)) + 24 * len(layout)
+
+    offset = len(GTB_MAGIC) + 4 + max_header_len
+    for name, array in arrays.items():
+        offset = (offset + GTB_ALIGN - 1) // GTB_ALIGN * GTB_ALIGN
+        layout[name][0] = offset
+        offset += array.nbytes
+
+    header_bytes = json.dumps(header).encode("utf-8")
+    header_bytes += b" " * (max_header_len - len(header_bytes))
+
+    gt_filestream.write(GTB_MAGIC + struct.pack("<I", len(header_bytes)) + header_bytes)
+    pos = len(GTB_MAGIC) + 4 + len(header_bytes)
+    for name, array in arrays.items():
+        gt_filestream.write(b"\x00" * (layout[name][0] - pos))
+        gt_filestream.write(array.tobytes())
+        pos = layout[name][0] + array.nbytes
+
+
+# read access to a binary GT file held in a buffer (normally an mmap - arrays are views, nothing is copied)
+class GT_Binary:
+    def __init__(self, buffer):
+        if len(buffer) < len(GTB_MAGIC) + 4 or buffer[0:len(GTB_MAGIC)] != GTB_MAGIC:
+            raise ValueError("not a binary GT file")
+
+        header_len = struct.unpack("<I", buffer[len(GTB_MAGIC):len(GTB_MAGIC) + 4])[0]
+        header = json.loads(bytes(buffer[len(GTB_MAGIC) + 4:len(GTB_MAGIC) + 4 + header_len]))
+        if header.get("version") != GTB_VERSION:
+            raise ValueError("unsupported binary GT version " + str(header.get("version")))
+
+        self.num_rows = header["num_rows"]
+        self.num_boxes = header["num_boxes"]
+
+        arrays = {}
+        for name, dtype in GTB_ARRAY_DTYPES.items():
+            offset, count = header["arrays"][name]
+            arrays[name] = np.frombuffer(buffer, dtype=dtype, count=count, offset=offset)
+
+        self.row_box_start = arrays["row_box_start"]
+        self.cx = arrays["cx"]
+        self.cy = arrays["cy"]
+        self.w = arrays["w"]
+        self.h = arrays["h"]
+        self.class_id = arrays["class_id"]
+
+        self.class_names = arrays["class_names"].tobytes().decode("utf-8").split("\n")
+
+        # img_filename -> first row (built in one pass at C speed), plus any further rows of the same image
+        self.row_filenames = arrays["filenames"].tobytes().decode("utf-8").split("\n") if self.num_rows > 0 else []
+        self.row_index = dict(zip(self.row_filenames, range(0, self.num_rows)))
+        self.extra_rows = {}
+        if len(self.row_index) != self.num_rows:
+            self.row_index = {}
+            for r, img_filename in enumerate(self.row_filenames):
+                if img_filename in self.row_index:
+                    self.extra_rows.setdefault(img_filename, []).append(r)
+                else:
+                    self.row_index[img_filename] = r
+
+    def image_rows(self, img_filename):
+        row = self.row_index.get(img_filename)
+        if row is None:
+            return []
+        return [row] + self.extra_rows.get(img_filename, [])
+
+    # [(cx, cy, w, h, class_name), ...] of one GT row
+    def row_boxes(self, row):
+        start = int(self.row_box_start[row])
+        end = int(self.row_box_start[row + 1])
+        class_names = [self.class_names[c] for c in self.class_id[start:end].tolist()]
+        return list(zip(self.cx[start:end].tolist(), self.cy[start:end].tolist(), self.w[start:end].tolist(), self.h[start:end].tolist(), class_names))
+
+
+# shortest text per value that reads back as the same float32 (plain integers for whole pixel coords)
+def format_gt_column(values):
+    if np.all(values == np.round(values)):
+        return [str(v) for v in values.astype(np.int64).tolist()]
+    return [np.format_float_positional(v, unique=True, trim="-") for v in values]
+
+def gt_binary_to_csv_rows(gt_binary):
+    cx = format_gt_column(gt_binary.cx)
+    cy = format_gt_column(gt_binary.cy)
+    w = format_gt_column(gt_binary.w)
+    h = format_gt_column(gt_binary.h)
+    class_ids = gt_binary.class_id.tolist()
+
+    rows = []
+    for r in range(0, gt_binary.num_rows):
+        start = int(gt_binary.row_box_start[r])
+        end = int(gt_binary.row_box_start[r + 1])
+        fields = [gt_binary.row_filenames[r], str(end - start)]
+        for b in range(start, end):
+            fields += [cx[b], cy[b], w[b], h[b], gt_binary.class_names[class_ids[b]]]
+        rows.append(",".join(fields))
+    return rows
+
+def csv_to_gt_binary(csv_path, gtb_path):
+    with open(csv_path, "r", encoding="utf-8") as csv_filestream:
+        records = parse_gt_lines(csv_filestream)
+    with open(gtb_path, "wb") as gtb_filestream:
+        write_gt_binary(gtb_filestream, records)
+    return len(records)
+
+def gt_binary_to_csv(gtb_path, csv_path):
+    with open(gtb_path, "rb") as gtb_filestream:
+        mm = mmap.mmap(gtb_filestream.fileno(), 0, access=mmap.ACCESS_READ)
+        gt_binary = GT_Binary(mm)
+        rows = gt_binary_to_csv_rows(gt_binary)
+        del gt_binary
+        mm.close()
+
+    with open(csv_path, "w", encoding="utf-8") as csv_filestream:
+        for row in rows:
+            csv_filestream.write(row + "\n")
+    return len(rows)
+
+# usage: python gt_binary.py to_binary <gt csv> <gt gtb>
+#        python gt_binary.py to_csv <gt gtb> <gt csv>
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="DL Annotator GT CSV <-> binary GT converter")
+    parser.add_argument("direction", choices=["to_binary", "to_csv"])
+    parser.add_argument("src_path")
+    parser.add_argument("dst_path")
+    args = parser.parse_args()
+
+    start_time = time.time()
+    if args.direction == "to_binary":
+        num_rows = csv_to_gt_binary(args.src_path, args.dst_path)
+    else:
+        num_rows = gt_binary_to_csv(args.src_path, args.dst_path)
+    print("converted " + str(num_rows) + " GT rows in " + "{:.3f}".format(time.time() - start_time) + " sec: " + args.src_path + " -> " + args.dst_path)
@@ -0,0 +1,106 @@
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+# GT CSV row format (one row per image):
+#   img_filename,num_detects,cx,cy,w,h,class_name,cx,cy,w,h,class_name,...
+# box coordinates are in native image pixels
+
+# below this file size, process startup and pickling cost more than parsing in place
+PARALLEL_MIN_BYTES = 16*1024*1024
+
+
+# returns (img_filename, [(cx, cy, w, h, class_name), ...]) or None for blank/malformed rows
+def parse_gt_line(line):
+    curr_list = line.rstrip().split(',')
+    if len(curr_list) < 2:
+        return None
+
+    try:
+        num_detects = int(curr_list[1])
+        boxes = []
+        ctr = 2
+        for n in range(0, num_detects):
+            boxes.append((float(curr_list[ctr]), float(curr_list[ctr+1]), float(curr_list[ctr+2]), float(curr_list[ctr+3]), curr_list[ctr+4]))
+            ctr += 5
+    except (ValueError, IndexError):
+        return None
+
+    return curr_list[0], boxes
+
+# boxes: [(cx, cy, w, h, class_name), ...] -> row string (no newline), None if there are no boxes
+def format_gt_row(img_filename, boxes):
+    if len(boxes) == 0:
+        return None
+
+    fields = [img_filename, str(len(boxes))]
+    for cx, cy, w, h, class_name in boxes:
+        fields.append("{:.0f},{:.0f},{:.0f},{:.0f},{}".format(cx, cy, w, h, class_name))
+    return ",".join(fields)
+
+def parse_gt_lines(lines):
+    records = []
+    for l in lines:
+        record = parse_gt_line(l)
+        if record is not None:
+            records.append(record)
+    return records
+
+def parse_gt_block(block):
+    return parse_gt_lines(block.decode("utf-8", errors="replace").splitlines())
+
+def default_num_workers():
+    return os.cpu_count() or 1
+
+# yields (end_offset, block) with block holding whole lines of roughly chunk_bytes, starting at byte offset start
+def iter_gt_blocks(mm, chunk_bytes, start=0):
+    size = len(mm)
+    pos = start
+    while pos < size:
+        end = mm.find(b"\n", min(pos + chunk_bytes, size) - 1)
+        if end == -1:
+            end = size - 1
+        yield end + 1, mm[pos:end + 1]
+        pos = end + 1
+
+# parse a stream of (tag, block) pairs, in a process pool when asked for more than one worker
+# yields (tag, records) per block, in stream order - only a few blocks are in flight at any time
+def parse_gt_stream(blocks, num_workers):
+    if num_workers <= 1:
+        for tag, block in blocks:
+            yield tag, parse_gt_block(block)
+        return
+
+    max_in_flight = num_workers * 2
+    with ProcessPoolExecutor(max_workers=num_workers) as executor:
+        in_flight = deque()
+        for tag, block in blocks:
+            in_flight.append((tag, executor.submit(parse_gt_block, block)))
+            if len(in_flight) >= max_in_flight:
+                tag, future = in_flight.popleft()
+                yield tag, future.result()
+
+        while len(in_flight) > 0:
+            tag, future = in_flight.popleft()
+            yield tag, future.result()
+
+# byte offsets of all rows for img_filename at or after byte offset start
+def find_gt_rows(mm, img_filename, start=0):
+    key = img_filename.encode("utf-8") + b","
+
+    offsets = []
+    if start == 0 and mm[0:len(key)] == key:
+        offsets.append(0)
+
+    pos = mm.find(b"\n" + key, max(start - 1, 0))
+    while pos != -1:
+        offsets.append(pos + 1)
+        pos = mm.find(b"\n" + key, pos + 1)
+
+    return offsets
+
+def read_gt_row(mm, offset):
+    end = mm.find(b"\n", offset)
+    if end == -1:
+        end = len(mm)
+    return mm[offset:end].decode("utf-8", errors="replace")
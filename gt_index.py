@@ -0,0 +1,167 @@
+import os
+import mmap
+import threading
+
+from gt_csv import parse_gt_line
+from gt_binary import GTB_MAGIC, GT_Binary
+
+# Sidecar index of GT CSV row byte offsets, so large GT files can be opened without parsing them.
+# Stored next to the GT file as <gt file>.idx:
+#   dlannotator_gt_index,1,<gt file size>,<gt file mtime ns>
+#   <offset>,<length>,<img_filename>      (one line per GT row, length excludes the newline)
+
+INDEX_HEADER = "dlannotator_gt_index"
+INDEX_VERSION = 1
+
+
+def gt_index_path(gt_file_path):
+    return gt_file_path + ".idx"
+
+# returns dict: img_filename -> [(offset, length), ...] in file order
+def build_gt_row_index(mm):
+    row_index = {}
+    size = len(mm)
+    pos = 0
+    while pos < size:
+        end = mm.find(b"\n", pos)
+        if end == -1:
+            end = size
+
+        comma = mm.find(b",", pos, end)
+        if comma != -1:
+            img_filename = mm[pos:comma].decode("utf-8", errors="replace")
+            length = end - pos
+            if length > 0 and mm[end - 1:end] == b"\r":
+                length -= 1
+            row_index.setdefault(img_filename, []).append((pos, length))
+
+        pos = end + 1
+
+    return row_index
+
+def save_gt_row_index(gt_file_path, row_index):
+    stat = os.stat(gt_file_path)
+
+    lines = [INDEX_HEADER + "," + str(INDEX_VERSION) + "," + str(stat.st_size) + "," + str(stat.st_mtime_ns) + "\n"]
+    for img_filename, rows in row_index.items():
+        for offset, length in rows:
+            lines.append(str(offset) + "," + str(length) + "," + img_filename + "\n")
+
+    index_path = gt_index_path(gt_file_path)
+    tmp_path = index_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as index_filestream:
+        index_filestream.write("".join(lines))
+    os.replace(tmp_path, index_path)
+
+# returns the row index, or None if there is no sidecar or it doesn't match the GT file any more
+def load_gt_row_index(gt_file_path):
+    try:
+        stat = os.stat(gt_file_path)
+        index_filestream = open(gt_index_path(gt_file_path), "r", encoding="utf-8")
+    except OSError:
+        return None
+
+    with index_filestream:
+        header = index_filestream.readline().rstrip().split(",")
+        if len(header) != 4 or header[0] != INDEX_HEADER or header[1] != str(INDEX_VERSION):
+            return None
+        if header[2] != str(stat.st_size) or header[3] != str(stat.st_mtime_ns):
+            return None
+
+        row_index = {}
+        for l in index_filestream:
+            offset, length, img_filename = l.rstrip("\n").split(",", 2)
+            row_index.setdefault(img_filename, []).append((int(offset), int(length)))
+
+    return row_index
+
+
+# read access to GT rows by image filename through a row index (shared by all lazily loaded frames)
+# GT files in the binary format (see gt_binary.py) carry their own row index - pass None for row_index
+class GT_Row_Source:
+    def __init__(self, gt_file_path, row_index):
+        self.lock = threading.Lock()
+        self.gt_file_path = gt_file_path
+        self.row_index = row_index
+        self.filestream = None
+        self.mm = None
+        self.binary = None
+        self.open()
+
+    # must be called with lock held (or before sharing)
+    def open(self):
+        self.filestream = open(self.gt_file_path, "rb")
+        if os.fstat(self.filestream.fileno()).st_size > 0:
+            self.mm = mmap.mmap(self.filestream.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if self.mm is not None and self.mm[0:len(GTB_MAGIC)] == GTB_MAGIC:
+            self.binary = GT_Binary(self.mm)
+            self.row_index = self.binary.row_index
+        elif self.row_index is None:
+            self.row_index = {}
+
+    def close(self):
+        with self.lock:
+            self.close_file()
+
+    # must be called with lock held
+    def close_file(self):
+        # the binary arrays are views into the mapping and must go first
+        self.binary = None
+        if self.mm is not None:
+            self.mm.close()
+            self.mm = None
+        if self.filestream is not None:
+            self.filestream.close()
+            self.filestream = None
+
+    def is_binary(self):
+        with self.lock:
+            return self.binary is not None
+
+    # (offset, length) of each row for an image (CSV GT files only)
+    def get_rows(self, img_filename):
+        with self.lock:
+            return self.row_index.get(img_filename, [])
+
+    def read_range(self, start, end):
+        with self.lock:
+            return self.mm[start:end]
+
+    # raw row bytes (without newlines) for an image (CSV GT files only)
+    def read_raw_rows(self, img_filename):
+        with self.lock:
+            rows = self.row_index.get(img_filename, [])
+            if self.mm is None:
+                return []
+            return [self.mm[offset:offset + length] for offset, length in rows]
+
+    def read_rows(self, img_filename):
+        return [row.decode("utf-8", errors="replace") for row in self.read_raw_rows(img_filename)]
+
+    # [(cx, cy, w, h, class_name), ...] from all of an image's rows, either GT file format
+    def read_boxes(self, img_filename):
+        with self.lock:
+            if self.binary is not None:
+                boxes = []
+                for row in self.binary.image_rows(img_filename):
+                    boxes.extend(self.binary.row_boxes(row))
+                return boxes
+
+        boxes = []
+        for line in self.read_rows(img_filename):
+            record = parse_gt_line(line)
+            if record is not None:
+                boxes.extend(record[1])
+        return boxes
+
+    # swap in a new GT file (e.g. just written by a save that copied these rows) and its row index
+    # (None for a binary GT file)
+    def replace_file(self, tmp_path, gt_file_path, row_index):
+        with self.lock:
+            # the old file must not be mapped while it is being replaced (Windows)
+            self.close_file()
+            os.replace(tmp_path, gt_file_path)
+            self.gt_file_path = gt_file_path
+            self.row_index = row_index
+            self.open()
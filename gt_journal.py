@@ -0,0 +1,166 @@
+import os
+import threading
+import zlib
+
+from PyQt6.QtCore import QThread
+
+from gt_csv import format_gt_row, parse_gt_line
+
+# Write-ahead journal of GT edits, kept next to the GT save file as <gt file>.journal
+#   dlannotator_gt_journal,1
+#   <crc32 hex> <GT CSV row>      (one line per edit: the image's complete GT after the change)
+# every record holds the whole image, so replaying the journal in order (last record wins) rebuilds the edits
+# made since the last save.  A save rotates the journal to <gt file>.journal.old and deletes it once the
+# GT file has been replaced, so a crash at any point leaves either the journal or the saved file complete.
+
+JOURNAL_HEADER = "dlannotator_gt_journal,1\n"
+
+
+def gt_journal_path(gt_file_path):
+    return gt_file_path + ".journal"
+
+def gt_journal_old_path(gt_file_path):
+    return gt_file_path + ".journal.old"
+
+def format_journal_record(img_filename, boxes):
+    row = format_gt_row(img_filename, boxes)
+    if row is None:
+        row = img_filename + ",0"
+    return "{:08x}".format(zlib.crc32(row.encode("utf-8"))) + " " + row + "\n"
+
+# returns (img_filename, boxes), None for a damaged record (e.g. torn write at a crash)
+def parse_journal_record(line):
+    line = line.rstrip("\r\n")
+    if len(line) < 10 or line[8] != " ":
+        return None
+
+    row = line[9:]
+    if line[0:8] != "{:08x}".format(zlib.crc32(row.encode("utf-8"))):
+        return None
+    return parse_gt_line(row)
+
+# records of a journal file in write order, stops at the first damaged record
+def read_gt_journal(journal_path):
+    records = []
+    try:
+        journal_filestream = open(journal_path, "r", encoding="utf-8", errors="replace")
+    except OSError:
+        return records
+
+    with journal_filestream:
+        if journal_filestream.readline() != JOURNAL_HEADER:
+            return records
+
+        for l in journal_filestream:
+            record = parse_journal_record(l)
+            if record is None:
+                break
+            records.append(record)
+
+    return records
+
+# journal records to replay for a GT save file: the rotated journal of an unfinished save first, then the current one
+def read_gt_journals(gt_file_path):
+    return read_gt_journal(gt_journal_old_path(gt_file_path)) + read_gt_journal(gt_journal_path(gt_file_path))
+
+
+# appends journal records and fsyncs them in batches, off the GUI thread
+class GT_Journal_Process(QThread):
+    def __init__(self, gt_file_path):
+        QThread.__init__(self)
+
+        self.journal_path = gt_journal_path(gt_file_path)
+        self.old_journal_path = gt_journal_old_path(gt_file_path)
+
+        self.pending_lines = []
+        self.active = False
+        self.lock = threading.Lock()
+        self.journal_filestream = None
+
+        # records since the journal was last rotated by a save
+        self.num_records = 0
+        self.num_syncs = 0
+
+    def __del__(self):
+        self.wait()
+
+    def append(self, lines):
+        with self.lock:
+            self.pending_lines.extend(lines)
+            self.num_records += len(lines)
+            if self.active == True:
+                return
+            self.active = True
+
+        # previous run may still be winding down
+        self.wait()
+        self.start()
+
+    # must only be called while the thread is not running
+    def write_lines(self, lines):
+        if self.journal_filestream is None:
+            self.journal_filestream = open(self.journal_path, "ab")
+            if self.journal_filestream.tell() == 0:
+                self.journal_filestream.write(JOURNAL_HEADER.encode("utf-8"))
+
+        self.journal_filestream.write("".join(lines).encode("utf-8"))
+        self.journal_filestream.flush()
+        os.fsync(self.journal_filestream.fileno())
+        self.num_syncs += 1
+
+    def run(self):
+
+        while True:
+            with self.lock:
+                lines = self.pending_lines
+                self.pending_lines = []
+                if len(lines) == 0:
+                    self.active = False
+                    return
+
+            try:
+                self.write_lines(lines)
+            except OSError as e:
+                print("gt journal thread: cannot write " + self.journal_path + ": " + str(e))
+
+    # write out anything pending and close the journal file
+    def stop(self):
+        with self.lock:
+            lines = self.pending_lines
+            self.pending_lines = []
+        self.wait()
+
+        if len(lines) > 0:
+            self.write_lines(lines)
+        self.close_file()
+
+    def close_file(self):
+        if self.journal_filestream is not None:
+            self.journal_filestream.close()
+            self.journal_filestream = None
+
+    # called when a save snapshot is taken: everything journaled so far is in that save, later edits start a new journal
+    def rotate(self):
+        self.stop()
+
+        if os.path.exists(self.journal_path):
+            if os.path.exists(self.old_journal_path):
+                # an earlier save never completed - keep its records ahead of these
+                with open(self.journal_path, "rb") as journal_filestream:
+                    records = journal_filestream.read()[len(JOURNAL_HEADER):]
+                with open(self.old_journal_path, "ab") as old_filestream:
+                    old_filestream.write(records)
+                    old_filestream.flush()
+                    os.fsync(old_filestream.fileno())
+                os.remove(self.journal_path)
+            else:
+                os.replace(self.journal_path, self.old_journal_path)
+
+        self.num_records = 0
+
+    # called when a save has replaced the GT file
+    def finish_save(self):
+        try:
+            os.remove(self.old_journal_path)
+        except OSError:
+            pass
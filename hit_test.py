@@ -0,0 +1,77 @@
+import numpy as np
+
+# Vectorized hit test of a cursor point against a frame's boxes (display coords), one NumPy pass over all
+# boxes instead of a Python call per box edge.  Pure functions: nothing is written back to the boxes, the
+# caller applies the result (e.g. BBox.start_resize / start_move).
+# Same rules as the BBox/BBox_Line per-object path:
+#   resize  box with the closest edge (first in list on ties), if one of its edges is within the proximity
+#           threshold - the first such edge in top, bottom, left, right order
+#   move    otherwise the box containing the point whose center is closest
+# edges are segments: a point whose perpendicular foot falls outside an edge is EDGE_FAR_DISTANCE from it
+
+EDGE_TOP = 0
+EDGE_BOTTOM = 1
+EDGE_LEFT = 2
+EDGE_RIGHT = 3
+EDGE_NONE = -1
+
+EDGE_FAR_DISTANCE = 100000
+PROXIMITY_THRESH = 5
+
+
+# display rects (ul x, ul y, lr x, lr y) of native cx, cy, w, h arrays, rounded like BBox.update_ul_lr
+def display_rects(cx, cy, w, h, x_scale, y_scale):
+    cx = np.asarray(cx, dtype=np.float64)
+    cy = np.asarray(cy, dtype=np.float64)
+    w = np.asarray(w, dtype=np.float64)
+    h = np.asarray(h, dtype=np.float64)
+
+    # np.round rounds half to even like Python's round()
+    ul_x = np.round((cx - w/2) * x_scale).astype(np.int64)
+    ul_y = np.round((cy - h/2) * y_scale).astype(np.int64)
+    lr_x = np.round((cx + w/2) * x_scale).astype(np.int64)
+    lr_y = np.round((cy + h/2) * y_scale).astype(np.int64)
+    return ul_x, ul_y, lr_x, lr_y
+
+# distance of point (x, y) to every edge of every box, shape (num boxes, 4) in EDGE_* column order
+def edge_distances(x, y, ul_x, ul_y, lr_x, lr_y):
+    # edge end points, columns top (ul-ur), bottom (ll-lr), left (ul-ll), right (ur-lr)
+    p1_x = np.stack([ul_x, ul_x, ul_x, lr_x], axis=1).astype(np.float64)
+    p1_y = np.stack([ul_y, lr_y, ul_y, ul_y], axis=1).astype(np.float64)
+    p2_x = np.stack([lr_x, lr_x, ul_x, lr_x], axis=1).astype(np.float64)
+    p2_y = np.stack([ul_y, lr_y, lr_y, lr_y], axis=1).astype(np.float64)
+
+    x_diff = p2_x - p1_x
+    y_diff = p2_y - p1_y
+    length_sq = x_diff ** 2 + y_diff ** 2
+    zero_length = length_sq == 0
+    safe_length_sq = np.where(zero_length, 1.0, length_sq)
+
+    # position of the perpendicular foot along the edge (0..1 on the segment)
+    t = ((x - p1_x)*x_diff + (y - p1_y)*y_diff) / safe_length_sq
+    perpendicular = np.abs(y_diff*x - x_diff*y + p2_x*p1_y - p1_x*p2_y) / np.sqrt(safe_length_sq)
+
+    distances = np.where((t < 0) | (t > 1), EDGE_FAR_DISTANCE, perpendicular)
+    # zero length edge (box without width or height): distance to the point itself
+    return np.where(zero_length, np.sqrt((x - p1_x) ** 2 + (y - p1_y) ** 2), distances)
+
+# returns (box index, edge) - edge is an EDGE_* for a resize, EDGE_NONE for a move, box index -1 for no hit
+def hit_test(x, y, ul_x, ul_y, lr_x, lr_y, proximity_thresh=PROXIMITY_THRESH):
+    if len(ul_x) == 0:
+        return -1, EDGE_NONE
+
+    distances = edge_distances(x, y, ul_x, ul_y, lr_x, lr_y)
+
+    # closest edge over all boxes, np.argmin keeps the first on ties
+    closest = int(np.argmin(distances.min(axis=1)))
+    near = distances[closest] < proximity_thresh
+    if near.any():
+        return closest, int(np.argmax(near))
+
+    # point in box, edges included
+    inside = (np.minimum(ul_x, lr_x) <= x) & (x <= np.maximum(ul_x, lr_x)) & (np.minimum(ul_y, lr_y) <= y) & (y <= np.maximum(ul_y, lr_y))
+    if inside.any() == False:
+        return -1, EDGE_NONE
+
+    center_dist = np.sqrt((x - (ul_x + lr_x)/2) ** 2 + (y - (ul_y + lr_y)/2) ** 2)
+    return int(np.argmin(np.where(inside, center_dist, np.inf))), EDGE_NONE
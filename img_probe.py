@@ -0,0 +1,93 @@
+import os
+import struct
+from concurrent.futures import ThreadPoolExecutor
+
+# header-only image dimension probing (no decode) for JPG and PNG files
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+# JPEG start-of-frame markers carrying the image dims (C4 = DHT, C8 = JPG extension, CC = DAC are not SOFs)
+JPEG_SOF_MARKERS = set(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+
+# JPEG markers that stand alone (no length field)
+JPEG_STANDALONE_MARKERS = set(range(0xD0, 0xD8)) | {0x01}
+
+
+def probe_jpeg_dims(fp):
+    if fp.read(2) != b"\xff\xd8":
+        return 0, 0
+
+    while True:
+        # markers may be padded with any number of 0xFF fill bytes
+        byte = fp.read(1)
+        while byte == b"\xff":
+            byte = fp.read(1)
+        if len(byte) == 0:
+            return 0, 0
+
+        marker = byte[0]
+        if marker in JPEG_STANDALONE_MARKERS:
+            continue
+
+        # start of scan / end of image reached without a frame header
+        if marker == 0xDA or marker == 0xD9:
+            return 0, 0
+
+        length_bytes = fp.read(2)
+        if len(length_bytes) < 2:
+            return 0, 0
+        length = struct.unpack(">H", length_bytes)[0]
+
+        if marker in JPEG_SOF_MARKERS:
+            frame_header = fp.read(5)
+            if len(frame_header) < 5:
+                return 0, 0
+            _, height, width = struct.unpack(">BHH", frame_header)
+            return width, height
+
+        # skip over this segment (APPn, EXIF thumbnails, quant tables, ...)
+        fp.seek(length - 2, os.SEEK_CUR)
+
+def probe_png_dims(fp):
+    header = fp.read(24)
+    if len(header) < 24 or header[0:8] != PNG_SIGNATURE or header[12:16] != b"IHDR":
+        return 0, 0
+
+    width, height = struct.unpack(">II", header[16:24])
+    return width, height
+
+# returns (width, height) from the file header, (0, 0) if unknown or unreadable
+def probe_image_dims(full_path):
+    try:
+        with open(full_path, "rb") as fp:
+            signature = fp.read(8)
+            fp.seek(0)
+            if signature[0:2] == b"\xff\xd8":
+                return probe_jpeg_dims(fp)
+            elif signature == PNG_SIGNATURE:
+                return probe_png_dims(fp)
+    except (OSError, struct.error):
+        pass
+
+    return 0, 0
+
+def probe_image_dims_chunk(full_paths):
+    return [probe_image_dims(full_path) for full_path in full_paths]
+
+# probe a whole list of files in a thread pool (file reads release the GIL), results in input order
+def probe_image_dims_list(full_paths, num_workers=None, chunk_size=1024):
+    if num_workers is None:
+        num_workers = min(32, (os.cpu_count() or 1) * 4)
+
+    if len(full_paths) <= chunk_size or num_workers <= 1:
+        return probe_image_dims_chunk(full_paths)
+
+    # hand out chunks rather than single files to keep per-task overhead small
+    chunks = [full_paths[i:i + chunk_size] for i in range(0, len(full_paths), chunk_size)]
+
+    dims_list = []
+    with ThreadPoolExecutor(max_workers=num_workers) as executor:
+        for chunk_dims in executor.map(probe_image_dims_chunk, chunks):
+            dims_list.extend(chunk_dims)
+
+    return dims_list
@@ -10,25 +10,50 @@ import pyautogui
 import glob
 import sys, os
 import time
+import mmap
+import threading
+from collections import OrderedDict
 
 from zoom_ctrl import ZoomControl
+from pane_renderer import PaneRenderer, draw_crosshair
 from bbox import BBox
-from gt import GT, GT_Image
+from motion_tracker import MotionTracker, MOTION_MAX_GAP
+from obj_tracker import TrackingContext, TrackingSession, Track_Predict_Process, PARALLEL_MIN_BOXES, default_track_workers
+from hit_test import EDGE_NONE
+from box_store import BoxStore
+from frame_registry import FrameRegistry
 from dnn_tracker import DNNTracker
 from help import HelpDialog
 from setup import SetupDialog
 from logger import Logger
+from img_probe import probe_image_dims_list
+from gt_binary import is_gt_binary_file, write_gt_binary
+from gt_journal import GT_Journal_Process, read_gt_journals, format_journal_record
+from gt_index import GT_Row_Source, build_gt_row_index, save_gt_row_index, load_gt_row_index
+from gt_csv import format_gt_row, parse_gt_line, parse_gt_stream, iter_gt_blocks, find_gt_rows, read_gt_row, default_num_workers, PARALLEL_MIN_BYTES
+from frame_cache import FrameCache, Frame_Prefetch_Process, image_native_size, decode_scale_denom
+from tile_source import TileSource, Tile_Generate_Process
+from nav_scheduler import NavScheduler
 
 class GT_Load_Process(QThread):
     def __init__(self):
         QThread.__init__(self)
 
-        self.num_processed = 0
-        self.lines = []
-        self.gt_image_list = []
-        self.base_filename_list = []
-        self.disp_width = 0
-        self.disp_height = 0
+        self.num_processed = 0   # bytes of the GT file processed so far
+        self.num_rows = 0
+        self.num_unmatched = 0
+        self.gt_file_path = "unknown"
+        self.frame_registry = None
+        self.box_store = None
+        self.num_workers = 1
+        self.chunk_bytes = 1024*1024
+        self.write_index = False
+        self.row_index = None
+
+        # frames the user wants to see before the stream reaches them
+        self.priority_filenames = []
+        self.priority_loaded = set()
+        self.lock = threading.Lock()
 
     def __del__(self):
         self.wait()
@@ -36,54 +61,113 @@ class GT_Load_Process(QThread):
     def check_progress(self):
         return self.num_processed
 
-    def load_params(self, lines, gt_image_list, base_filename_list, disp_width, disp_height):
-        self.lines = lines
-        self.gt_image_list = gt_image_list
-        self.base_filename_list = base_filename_list
-        self.disp_width = disp_width
-        self.disp_height = disp_height
+    def load_params(self, gt_file_path, frame_registry, box_store, num_workers, write_index):
+        self.gt_file_path = gt_file_path
+        self.frame_registry = frame_registry
+        self.box_store = box_store
+        self.num_workers = num_workers
+        self.write_index = write_index
+
+    def prioritize(self, base_filename):
+        with self.lock:
+            self.priority_filenames.append(base_filename)
+
+    # stream_pos: start of the block being merged, rows_merged: rows per frame already merged from that block
+    def load_priority_frames(self, mm, stream_pos, rows_merged):
+        with self.lock:
+            priority_filenames = self.priority_filenames
+            self.priority_filenames = []
+
+        for img_filename in priority_filenames:
+            gt_index = self.frame_registry.index_of(img_filename)
+            if gt_index is None or gt_index in self.priority_loaded:
+                continue
+
+            # load every remaining row for this frame now, the stream skips them later
+            for offset in find_gt_rows(mm, img_filename, stream_pos)[rows_merged.get(gt_index, 0):]:
+                record = parse_gt_line(read_gt_row(mm, offset))
+                if record is not None:
+                    self.box_store.append_frame(gt_index, record[1])
+
+            self.priority_loaded.add(gt_index)
 
     def run(self):
 
         self.num_processed = 0
+        self.num_rows = 0
+        self.num_unmatched = 0
 
-        for l in self.lines:
+        try:
+            gt_filestream = open(self.gt_file_path, "rb")
+        except OSError:
+            print("gt load thread: cannot open " + self.gt_file_path)
+            return
 
-            # strip newline and split line into elements
-            curr_list = l.rstrip().split(',')
-            img_filename = curr_list[0]
-            num_detects = int(curr_list[1])
+        with gt_filestream:
+            if os.fstat(gt_filestream.fileno()).st_size == 0:
+                print("gt load thread complete.")
+                return
 
-            # use the alpha order index of the found image files to place the GT info
-            gt_index = self.base_filename_list.index(img_filename)
+            mm = mmap.mmap(gt_filestream.fileno(), 0, access=mmap.ACCESS_READ)
 
-            if gt_index >= 0 and gt_index < len(self.gt_image_list):
+            num_workers = self.num_workers
+            if len(mm) < PARALLEL_MIN_BYTES:
+                num_workers = 1
 
-                ctr = 2
-                for n in range(0,num_detects):
-                    # create new BBox
-                    new_bbox = BBox()
-                    new_bbox.cx = float(curr_list[ctr])
-                    new_bbox.cy = float(curr_list[ctr+1])
-                    new_bbox.w = float(curr_list[ctr+2])
-                    new_bbox.h = float(curr_list[ctr+3])
+            # stream blocks of whole lines through the parser (in parallel for large files), merge in file order
+            block_start = 0
+            for block_end, records in parse_gt_stream(iter_gt_blocks(mm, self.chunk_bytes), num_workers):
 
-                    new_bbox.class_name = curr_list[ctr+4]
-                    new_bbox.setStyle(Qt.GlobalColor.green,Qt.PenStyle.SolidLine)
-                    # note: we cannot tell the bbox the actual image size yet, image hasn't been loaded yet - so defaults to 800x600
-                    # bbox image dims get updated just prior to image being displayed - see file_slider_changed()
-                    new_bbox.set_disp_dims(self.disp_width, self.disp_height)
-                    new_bbox.update_ul_lr()
+                # use the alpha order index of the found image files to place the GT info (whole block at once)
+                gt_indices = self.frame_registry.lookup([record[0] for record in records]).tolist()
 
-                    # add it to the list for this image
-                    self.gt_image_list[gt_index].gt.bbox_list.append(new_bbox)
-                    ctr += 5
+                rows_merged = {}
+                frame_boxes = []
+                for n, (img_filename, boxes) in enumerate(records):
+                    # boxes go into the box store in batches
+                    if n % 256 == 0:
+                        self.box_store.append_frames(frame_boxes)
+                        frame_boxes = []
 
-            # strobe current img dims to all newly created BBoxes
-            self.gt_image_list[gt_index].refresh_gt_img_dims()
+                        # serve frames the user jumped to without waiting for the block to finish
+                        if len(self.priority_filenames) > 0:
+                            self.load_priority_frames(mm, block_start, rows_merged)
 
-            #time.sleep(0.01)
-            self.num_processed += 1
+                    self.num_rows += 1
+
+                    gt_index = gt_indices[n]
+                    if gt_index < 0:
+                        self.num_unmatched += 1
+                        continue
+
+                    rows_merged[gt_index] = rows_merged.get(gt_index, 0) + 1
+                    if gt_index in self.priority_loaded:
+                        continue
+
+                    frame_boxes.append((gt_index, boxes))
+
+                self.box_store.append_frames(frame_boxes)
+
+                #time.sleep(0.01)
+                self.num_processed = block_end
+                block_start = block_end
+
+                self.load_priority_frames(mm, block_start, {})
+
+            # all boxes into frame-sorted columns
+            self.box_store.compact()
+
+            # row offsets: unchanged rows are copied from this file on save
+            self.row_index = build_gt_row_index(mm)
+
+            # row offsets sidecar, lets the next session open this GT file without parsing it
+            if self.write_index == True:
+                try:
+                    save_gt_row_index(self.gt_file_path, self.row_index)
+                except OSError:
+                    print("gt load thread: cannot write GT index for " + self.gt_file_path)
+
+            mm.close()
 
         print("gt load thread complete.")
 
@@ -95,8 +179,23 @@ class GT_Save_Process(QThread):
         QThread.__init__(self)
 
         self.num_processed = 0
+        self.num_copied = 0
+        self.num_formatted = 0
         self.save_path = "unknown"
-        self.gt_image_list = []
+        self.frame_registry = None
+        self.gt_snapshot = {}
+        self.gt_row_source = None
+        self.write_index = False
+        self.storage_format = "csv"
+
+        # (gt, version) written by this save - applied as saved_version on the GUI thread when done
+        self.saved_versions = []
+        self.save_complete = False
+
+        self.gt_filestream = None
+        self.out_offset = 0
+        self.run_start = -1
+        self.run_end = -1
 
     def __del__(self):
         self.wait()
@@ -104,36 +203,144 @@ class GT_Save_Process(QThread):
     def check_progress(self):
         return self.num_processed
 
-    def load_params(self,save_path, gt_image_list):
+    # gt_snapshot: {frame_id: (gt, version, records)} from GT_Image.save_snapshot() for frames that can't be
+    # copied from the GT file, taken on the GUI thread so this thread never touches the live GT while the user
+    # keeps editing.  Frames not in the snapshot are unchanged since read/saved.
+    def load_params(self,save_path, frame_registry, gt_snapshot, gt_row_source, write_index, storage_format):
         self.save_path = save_path
-        self.gt_image_list = gt_image_list
+        self.frame_registry = frame_registry
+        self.gt_snapshot = gt_snapshot
+        self.gt_row_source = gt_row_source
+        self.write_index = write_index
+        self.storage_format = storage_format
+
+    # boxes of a frame left out of the snapshot (never edited): from the GT file, or the box store if there is none
+    def unchanged_boxes(self, frame_id, img_filename):
+        if self.gt_row_source is not None:
+            return self.gt_row_source.read_boxes(img_filename)
+        return self.frame_registry.box_store.frame_boxes(frame_id)
+
+    # write out the pending run of unchanged rows, copied byte for byte from the previous GT file
+    def flush_copy_run(self):
+        if self.run_start < 0:
+            return
 
-    def run(self):
+        self.gt_filestream.write(self.gt_row_source.read_range(self.run_start, self.run_end))
+        self.gt_filestream.write(b"\n")
+        self.out_offset += self.run_end - self.run_start + 1
+
+        self.run_start = -1
+        self.run_end = -1
+
+    # CSV rows, returns the row index of the new file
+    def write_csv_rows(self):
+        self.out_offset = 0
+        self.run_start = -1
+        self.run_end = -1
+
+        # unchanged rows can only be copied as bytes from a CSV GT file
+        copy_rows = self.gt_row_source is not None and self.gt_row_source.is_binary() == False
+
+        row_index = {}
+        for frame_id in range(0, len(self.frame_registry)):
+            img_filename = self.frame_registry.base_filename(frame_id)
+            gt_snapshot = self.gt_snapshot.get(frame_id)
+
+            if gt_snapshot is None and copy_rows == True:
+                # unchanged since read/saved: extend the copy run while rows are adjacent in the previous file
+                # (\n separated only - rows of a \r\n file are copied one by one, all rows are written with \n)
+                for src_offset, length in self.gt_row_source.get_rows(img_filename):
+                    if self.run_start >= 0 and src_offset == self.run_end + 1:
+                        self.run_end = src_offset + length
+                    else:
+                        self.flush_copy_run()
+                        self.run_start = src_offset
+                        self.run_end = src_offset + length
+                        self.run_out_offset = self.out_offset
 
-        self.num_processed = 0
+                    row_index.setdefault(img_filename, []).append((self.run_out_offset + (src_offset - self.run_start), length))
+                self.num_copied += 1
+            else:
+                self.flush_copy_run()
 
-        gt_filestream = open(self.save_path,"w")
-        for gt_img in self.gt_image_list:
-            gt = gt_img.gt
-            num_bboxes = len(gt.bbox_list)
-            if num_bboxes > 0:
-                new_string = gt_img.base_filename + "," + str(num_bboxes)
-                for bb in gt.bbox_list:
-                    bb_cx_str = "{:.0f}".format(bb.cx)
-                    bb_cy_str = "{:.0f}".format(bb.cy)
-                    bb_w_str = "{:.0f}".format(bb.w)
-                    bb_h_str = "{:.0f}".format(bb.h)
+                if gt_snapshot is None:
+                    records = self.unchanged_boxes(frame_id, img_filename)
+                else:
+                    gt, version, records = gt_snapshot
+                    self.saved_versions.append((gt, version))
+
+                new_string = format_gt_row(img_filename, records)
+                if new_string is not None:
+                    #print(new_string)
+                    row = new_string.encode("utf-8")
+                    self.gt_filestream.write(row + b"\n")
+                    row_index.setdefault(img_filename, []).append((self.out_offset, len(row)))
+                    self.out_offset += len(row) + 1
+                self.num_formatted += 1
 
-                    new_string = new_string + "," + bb_cx_str + "," + bb_cy_str + "," + bb_w_str + "," + bb_h_str + "," + bb.class_name
-                new_string = new_string + "\n"
+             # time.sleep(0.01)
+            self.num_processed += 1
 
-                #print(new_string)
-                gt_filestream.write(new_string)
+        self.flush_copy_run()
+        return row_index
+
+    # binary GT file (gt_binary.py), one row per annotated image
+    def write_binary_rows(self):
+        records = []
+        for frame_id in range(0, len(self.frame_registry)):
+            img_filename = self.frame_registry.base_filename(frame_id)
+            gt_snapshot = self.gt_snapshot.get(frame_id)
+            if gt_snapshot is None:
+                boxes = self.unchanged_boxes(frame_id, img_filename)
+                self.num_copied += 1
+            else:
+                gt, version, boxes = gt_snapshot
+                self.saved_versions.append((gt, version))
+                self.num_formatted += 1
 
-             # time.sleep(0.01)
+            if len(boxes) > 0:
+                records.append((img_filename, boxes))
             self.num_processed += 1
 
-        gt_filestream.close()
+        write_gt_binary(self.gt_filestream, records)
+
+    def run(self):
+
+        self.num_processed = 0
+        self.num_copied = 0
+        self.num_formatted = 0
+        self.saved_versions = []
+        self.save_complete = False
+
+        # write next to the target file and swap it in when complete
+        tmp_path = self.save_path + ".tmp"
+        self.gt_filestream = open(tmp_path,"wb",buffering=1024*1024)
+
+        if self.storage_format == "binary":
+            # binary GT files carry their own row index
+            self.write_binary_rows()
+            row_index = None
+        else:
+            row_index = self.write_csv_rows()
+
+        # make sure the new file is on disk before it replaces the old one
+        self.gt_filestream.flush()
+        os.fsync(self.gt_filestream.fileno())
+        self.gt_filestream.close()
+
+        if self.gt_row_source is not None:
+            # unchanged rows (and lazily loaded images) are now read from the new file
+            self.gt_row_source.replace_file(tmp_path, self.save_path, row_index)
+        else:
+            os.replace(tmp_path, self.save_path)
+            self.gt_row_source = GT_Row_Source(self.save_path, row_index)
+        self.save_complete = True
+
+        if self.write_index == True and row_index is not None:
+            try:
+                save_gt_row_index(self.save_path, row_index)
+            except OSError:
+                print("gt save thread: cannot write GT index for " + self.save_path)
 
         # wait to be killed
         print("gt save thread complete.")
@@ -186,12 +393,26 @@ class Ui(QtWidgets.QMainWindow):
 
         self.gt_load_file_path = "GT Load File Path Unassigned"
         self.gt_save_file_path = "GT Save File Path Unassigned"
-        self.gt_image_list = []
-        self.base_img_file_list = []  # used for quick indexing
+        self.box_store = BoxStore(0)   # boxes of all images, see box_store.py
+        self.frame_registry = FrameRegistry([], self.box_store)   # image files, GT_Image per frame in use
+        self.gt_load_workers = default_num_workers()
         self.num_gt_entries = 0
         self.num_gt_processed = 0
         self.gt_loader = None
         self.gt_saver = None
+        self.gt_save_count = 0
+        self.gt_row_source = None    # GT file rows for lazily loaded images
+        self.gt_index_sidecar = True
+        self.gt_storage_format = "csv"    # format written on save: csv or binary (loading detects the format)
+
+        # write-ahead journal of GT edits next to the GT save file (see gt_journal.py)
+        self.gt_journal = None
+        self.gt_journal_sync_ms = 1000
+        self.gt_journal_compact_records = 5000
+        self.journal_pending = set()    # indexes of images changed since the last journal write
+        self.journal_replay = []        # records from the last session, replayed once GT has loaded
+        self.journal_timer = QTimer()
+        self.journal_timer.timeout.connect(self.sync_gt_journal)
         self.gt_progressbar = self.findChild(QtWidgets.QProgressBar,"gt_progressbar")
         self.gt_progressbar.setValue(0)
 
@@ -227,6 +448,40 @@ class Ui(QtWidgets.QMainWindow):
 
         self.image = None
         self.img_pixmap = None
+        self.pane_renderer = PaneRenderer()
+
+        # "track" prediction keeps its trackers alive while stepping forward frame by frame
+        self.tracking_session = TrackingSession()
+        # frames with many boxes are tracked in the background by a thread pool
+        self.track_workers = default_track_workers()
+        self.track_predictor = Track_Predict_Process()
+        self.track_timer = QTimer()
+        self.track_timer.timeout.connect(self.check_track_progress)
+        # (from, to, context) of the step being tracked, and (steps left, moves) of its navigation
+        self.track_step = None
+        self.track_pending = None
+
+        # decoded image cache and background prefetch for sequence navigation
+        self.frame_cache = FrameCache(512*1024*1024)
+        self.frame_prefetcher = Frame_Prefetch_Process(self.frame_cache)
+        self.prefetch_frames = 4
+        self.nav_direction = 1
+
+        # very large images are shown from a tiled pyramid (tile_source.py) instead of being decoded whole
+        self.tiled_view_min_pixels = 64*1000*1000
+        self.tile_cache_path = "./tile_cache"
+        self.tile_sources = OrderedDict()
+        self.tile_generator = Tile_Generate_Process()
+        self.tile_timer = QTimer()
+        self.tile_timer.timeout.connect(self.check_tile_progress)
+
+        # decode images at reduced resolution when the display doesn't need full native resolution
+        self.reduced_decode = True
+        self.display_scale_denom = 1
+
+        # latest-wins navigation (coalesces key repeats that arrive faster than frames render)
+        self.nav_scheduler = NavScheduler(self.navigate_images)
+        self.predict_skipped_frames = True
         self.img_pane_width = 800
         self.img_pane_height = 600
         self.label_display_dims = self.findChild(QtWidgets.QLabel,"label_display_dims")
@@ -254,8 +509,8 @@ class Ui(QtWidgets.QMainWindow):
         if self.trial_version is True:
             self.prediction_methods = ["none"]
         else:
-            #self.prediction_methods = ["copy", "track", "dnn"]
-            self.prediction_methods = ["copy", "track"]
+            #self.prediction_methods = ["copy", "track", "flow", "motion", "dnn"]
+            self.prediction_methods = ["copy", "track", "flow", "motion"]
         self.predict_index = 0
         self.label_prediction_method = self.findChild(QtWidgets.QLabel,"label_prediction_method")
         self.label_prediction_method.setText(self.prediction_methods[self.predict_index])
@@ -312,11 +567,11 @@ class Ui(QtWidgets.QMainWindow):
         self.label_prediction_method.setText(self.prediction_methods[self.predict_index])
         self.label_display_dims.setText("Display Dims: (" + str(self.img_pane_width) + "," + str(self.img_pane_height) + ")")
 
-        if len(self.gt_image_list) > 0:
-            self.label_img_file_name.setText(self.gt_image_list[self.img_file_num].base_filename)
-            self.num_annotations = len(self.gt_image_list[self.img_file_num].gt.bbox_list)
+        if len(self.frame_registry) > 0:
+            self.label_img_file_name.setText(self.frame_registry[self.img_file_num].base_filename)
+            self.num_annotations = len(self.frame_registry[self.img_file_num].gt.bbox_list)
             self.label_num_annotations.setText(str(self.num_annotations))
-            self.label_native_img_dims.setText("Native Image Dims: (" + str(self.gt_image_list[self.img_file_num].image_width) + "," + str(self.gt_image_list[self.img_file_num].image_height) + ")")
+            self.label_native_img_dims.setText("Native Image Dims: (" + str(self.frame_registry[self.img_file_num].image_width) + "," + str(self.frame_registry[self.img_file_num].image_height) + ")")
 
         disp_x, disp_y = self.zoom_ctrl.getZoomLens(self.cursor_x, self.cursor_y)
         self.label_cursor_pos.setText("(" + str(disp_x) + "," + str(disp_y) + ")")
@@ -329,81 +584,52 @@ class Ui(QtWidgets.QMainWindow):
 
     def update_image(self):
         #print("update_image...")
-        # grab new pixmap from current image
-        self.img_pixmap = QPixmap.fromImage(self.image)
-        self.img_pixmap = self.img_pixmap.scaled(QSize(self.img_pane_width,self.img_pane_height))
-
-        self.mask_overlay = QPixmap(self.img_pane_width, self.img_pane_height)
-        self.mask_overlay.fill(Qt.GlobalColor.transparent)
-
-        self.crosshair_overlay = QPixmap(self.img_pane_width, self.img_pane_height)
-        self.crosshair_overlay.fill(Qt.GlobalColor.transparent)
-
-        # draw bboxes on mask overlay
-        qp = QtGui.QPainter(self.mask_overlay)
-        #qp.begin(self)    # redundant with creating QPainter
-
-        # set font for labeling
-        font = QFont()
-        font.setPointSize(18)
-        font.setBold(True)
-        qp.setFont(font)
-
-        # draw current (adding) bbox
-        if self.current_bbox is not None:
-            self.current_bbox.draw(qp)
-
-        # draw current (modding) bbox
-        if self.mod_bbox is not None:
-            self.mod_bbox.draw(qp)
-
-        # draw current GT from the gt list
-        if len(self.gt_image_list) > 0:
-            self.gt_image_list[self.img_file_num].set_disp_dims(self.img_pane_width,self.img_pane_height)
-            self.gt_image_list[self.img_file_num].gt.draw(qp)
-
-        qp.end()
+        # layers are only rebuilt when their content changed (see PaneRenderer)
+        gt = None
+        native_width = 0
+        native_height = 0
+        if len(self.frame_registry) > 0:
+            self.frame_registry[self.img_file_num].set_disp_dims(self.img_pane_width,self.img_pane_height)
+            gt = self.frame_registry[self.img_file_num].gt
+            native_width = self.frame_registry[self.img_file_num].image_width
+            native_height = self.frame_registry[self.img_file_num].image_height
 
-        qp = QtGui.QPainter(self.crosshair_overlay)
+        # current (adding) and current (modding) bboxes are drawn over the GT
+        live_bboxes = [bb for bb in [self.current_bbox, self.mod_bbox] if bb is not None]
 
-        # draw zoombox - debug only
-        #self.zoom_ctrl.draw(qp)
+        result = self.pane_renderer.render(self.image, native_width, native_height, gt, live_bboxes, self.zoom_ctrl, self.img_pane_width, self.img_pane_height)
 
-        # draw crosshairs on crosshair overlay
-        qp.setPen(QPen(QBrush(Qt.GlobalColor.yellow), 1, Qt.PenStyle.DashLine))
-        qp.drawLine(0,int(self.cursor_y),self.img_pane_width-1,int(self.cursor_y))
-        qp.drawLine(int(self.cursor_x),0,int(self.cursor_x),self.img_pane_height-1)
-        qp.end()
+        # blit pixmap to image pane
+        if result is not None:
+            self.image_pane.setPixmap(result)
 
-        # combine image with mask overlay
-        result = QPixmap(self.img_pane_width, self.img_pane_height)
-        qp = QtGui.QPainter(result)
-        #qp.begin(self)   # redundant with creating QPainter
+        # tiles drawn from a coarser level are made in the background, the pane is refreshed as they come in
+        if isinstance(self.image, TileSource) and len(self.pane_renderer.missing_tile_rows) > 0:
+            self.tile_generator.request(self.image, self.pane_renderer.missing_tile_rows)
+            self.pane_renderer.missing_tile_rows = []
+            self.tile_timer.start(100)
 
-        qp.drawPixmap(0,0,self.img_pixmap)
-        qp.setOpacity(1.0)
-        qp.drawPixmap(0,0,self.mask_overlay)
-        qp.end()
+        # crosshairs are drawn by the pane's paint event
+        self.image_pane.update()
 
-        # apply zoom box
-        rect = self.zoom_ctrl.getCropRect()
-        result = result.copy(rect).scaled(QSize(self.img_pane_width,self.img_pane_height))
+        self.refresh_labels()
 
-        # final step: overlay crosshair overlay
-        result2 = QPixmap(self.img_pane_width, self.img_pane_height)
-        qp = QtGui.QPainter(result2)
-        #qp.begin(self)   # redundant with creating QPainter
+    # pane paint event: the label paints the composed image, crosshairs go on top
+    def paint_image_pane(self, event):
+        QLabel.paintEvent(self.image_pane, event)
 
-        qp.drawPixmap(0,0,result)
-        qp.setOpacity(1.0)
         if self.crosshairs_visible == True:
-            qp.drawPixmap(0,0,self.crosshair_overlay)
-        qp.end()
+            qp = QtGui.QPainter(self.image_pane)
+            draw_crosshair(qp, self.cursor_x, self.cursor_y, self.img_pane_width, self.img_pane_height)
+            qp.end()
 
-        # blit pixmap to image pane
-        self.image_pane.setPixmap(result2)
+    def check_tile_progress(self):
+        if self.tile_generator.is_busy() == False:
+            self.tile_timer.stop()
 
-        self.refresh_labels()
+        # only re-renders if new tiles came in (TileSource.cacheKey)
+        if isinstance(self.image, TileSource):
+            self.update_image()
 
     def load_image_file_util(self, value):
 
@@ -411,32 +637,110 @@ class Ui(QtWidgets.QMainWindow):
         if value < 0 or value > self.img_files_max - 1:
              return None
 
-        # construct file path
-        full_path_img_file_name = self.gt_image_list[value].full_path
-        q_image = QImage(full_path_img_file_name)
-        #q_image = q_image.convertToFormat(QImage.Format_Grayscale8)
-        q_image = q_image.convertToFormat(QImage.Format.Format_RGB888)
+        # very large image: tiled pyramid instead of a full decode
+        if self.is_tiled_image(value):
+            return self.get_tile_source(value)
+
+        # construct file path and pull decoded image from cache (decodes on miss)
+        full_path_img_file_name = self.frame_registry.full_path(value)
+        self.display_scale_denom = self.get_display_scale_denom(value)
+        q_image = self.frame_cache.get((full_path_img_file_name, self.display_scale_denom))
 
         return q_image
 
+    def get_display_scale_denom(self, value):
+        if self.reduced_decode == False:
+            return 1
+
+        img_width, img_height = self.get_native_img_dims(value)
+        if img_width <= 0 or img_height <= 0:
+            return 1
+
+        # when zoomed in, only part of the image fills the pane - need correspondingly more pixels
+        min_width = self.img_pane_width * (self.zoom_ctrl.img_width/max(self.zoom_ctrl.width, 1))
+        min_height = self.img_pane_height * (self.zoom_ctrl.img_height/max(self.zoom_ctrl.height, 1))
+
+        return decode_scale_denom(img_width, img_height, min_width, min_height)
+
+    def is_tiled_image(self, value):
+        if self.tiled_view_min_pixels <= 0:
+            return False
+        img_width, img_height = self.get_native_img_dims(value)
+        return img_width*img_height > self.tiled_view_min_pixels
+
+    def get_tile_source(self, value):
+        full_path = self.frame_registry.full_path(value)
+        tile_source = self.tile_sources.get(full_path)
+        if tile_source is not None:
+            self.tile_sources.move_to_end(full_path)
+            return tile_source
+
+        # opening makes the coarse levels if they are not in the tile cache yet
+        start_time = time.time()
+        img_width, img_height = self.get_native_img_dims(value)
+        tile_source = TileSource(full_path, img_width, img_height, self.tile_cache_path)
+        self.logger.log("Tiled image opened in " + "{:.2f}".format(time.time() - start_time) + " sec: " + tile_source.stats_string())
+
+        # a few recent ones (prediction looks at two frames)
+        self.tile_sources[full_path] = tile_source
+        while len(self.tile_sources) > 3:
+            self.tile_sources.popitem(last=False)
+        return tile_source
+
+    def get_native_img_dims(self, value):
+        gt_img = self.frame_registry[value]
+        if gt_img.dims_known == True:
+            return gt_img.image_width, gt_img.image_height
+
+        # header probe at load time failed - try the image reader
+        return image_native_size(gt_img.full_path)
+
+    def prefetch_image_files(self, value):
+        # tiled images are never decoded whole
+        if isinstance(self.image, TileSource):
+            return
+
+        # decode the next few images in the current navigation direction in the background
+        prefetch_paths = []
+        for n in range(1, self.prefetch_frames + 1):
+            index = value + n*self.nav_direction
+            if index < 0 or index > self.img_files_max - 1:
+                break
+            # assume sequence neighbors share the current image size
+            prefetch_paths.append((self.frame_registry.full_path(index), self.display_scale_denom))
+
+        self.frame_prefetcher.request(prefetch_paths)
+
 
     def load_image_file(self, value):
+        if value < self.img_file_num:
+            self.nav_direction = -1
+        elif value > self.img_file_num:
+            self.nav_direction = 1
+
         self.img_file_num = value
         self.image = self.load_image_file_util(value)
+        self.prefetch_image_files(value)
+
+        # frames left behind go back to the compact box store
+        self.box_store.release_all((value,))
+
+        # GT still streaming in - have the loader jump ahead to this frame
+        if self.gt_loader is not None and self.gt_loader.isRunning():
+            self.gt_loader.prioritize(self.frame_registry.base_filename(value))
 
-        # record actual native image dimensions before rescale
-        img_width = self.image.width()
-        img_height = self.image.height()
+        # record actual native image dimensions (displayed image may be decoded at reduced size)
+        img_width, img_height = self.get_native_img_dims(value)
 
-        if img_width == 0 or img_height == 0:
-            self.logger.log("WARNING: file " + self.gt_image_list[value].base_filename + " has zero dimension, using temp dimension")
-            print("WARNING: file " + self.gt_image_list[value].base_filename + " has zero dimension, using temp dimension")
+        if img_width <= 0 or img_height <= 0 or self.image.isNull():
+            self.logger.log("WARNING: file " + self.frame_registry[value].base_filename + " has zero dimension, using temp dimension")
+            print("WARNING: file " + self.frame_registry[value].base_filename + " has zero dimension, using temp dimension")
             # put stand-in dims for GT
             img_width = 404    # code for no image dim
             img_height = 404   # code for no image dim
 
         # store actual image dims in GT entry for this image
-        self.gt_image_list[value].set_img_dims(img_width,img_height)
+        self.frame_registry[value].set_img_dims(img_width,img_height)
 
         return
 
@@ -447,18 +751,26 @@ class Ui(QtWidgets.QMainWindow):
 
         self.logger.log("Reading JPG filenames from directory: " + self.img_file_path)
 
+        self.cancel_track_prediction()
+
         img_file_list = sorted(glob.glob(self.img_file_path + "/*.jpg"))
         #print(img_file_list)
 
-        for img_fullpath in img_file_list:
-            gt_img = GT_Image()
-            gt_img.full_path = img_fullpath
-            gt_img.base_filename = os.path.basename(img_fullpath)
-            self.gt_image_list.append(gt_img)
-            self.base_img_file_list.append(gt_img.base_filename)     # used only for quick searching/indexing
+        # GT boxes of all images, held as BBox objects only for frames in use
+        self.box_store = BoxStore(len(img_file_list))
+
+        # paths/dims of all images, GT_Image objects only for frames in use
+        self.frame_registry = FrameRegistry(img_file_list, self.box_store)
 
-        self.img_files_max = len(self.gt_image_list)
+        # read native dims of every image from the file headers, so GT boxes scale correctly before any decode
+        start_time = time.time()
+        num_unknown = self.frame_registry.set_dims_list(probe_image_dims_list(img_file_list))
+        del img_file_list
+        self.logger.log("Image dims read from file headers in " + "{:.2f}".format(time.time() - start_time) + " sec, unknown dims: " + str(num_unknown))
+
+        self.img_files_max = len(self.frame_registry)
         self.img_file_num = 0
+        self.nav_scheduler.set_num_frames(self.img_files_max)
         self.logger.log("Number of JPG files identified: " + str(self.img_files_max))
 
         self.file_slider.setMinimum(0)
@@ -530,26 +842,46 @@ class Ui(QtWidgets.QMainWindow):
 
         self.logger.log("loading GT from " + self.gt_load_file_path)
 
+        self.cancel_track_prediction()
+
+        # GT file is streamed by the load thread, progress is tracked in bytes
         try:
-            fp = open(self.gt_load_file_path)
-            lines = fp.readlines()
-            fp.close()
-            #gt_df = pd.read_csv(self.gt_load_file_path)
-        except (FileNotFoundError):
+            self.num_gt_entries = os.path.getsize(self.gt_load_file_path)
+        except (OSError):
             self.logger.log(self.gt_load_file_path + " file not found!")
             return
 
-        self.num_gt_entries = len(lines)
         self.num_gt_processed = 0
         self.gt_progressbar = self.findChild(QtWidgets.QProgressBar,"gt_progressbar")
         self.gt_progressbar.setValue(0)
 
-        self.logger.log("Number of GT entries identified: " + str(len(lines)))
-        print("Number of GT entries identified: " + str(len(lines)))
+        self.logger.log("GT file size (bytes): " + str(self.num_gt_entries))
+
+        # binary GT file: memory mapped, each image's boxes are read only when it is visited or saved
+        if is_gt_binary_file(self.gt_load_file_path):
+            try:
+                self.gt_row_source = GT_Row_Source(self.gt_load_file_path, None)
+            except (OSError, ValueError) as e:
+                self.logger.log("cannot read binary GT file " + self.gt_load_file_path + ": " + str(e))
+                return
+
+            num_lazy = self.use_lazy_gt()
+            self.logger.log("binary GT file mapped, GT for " + str(num_lazy) + " images loads on demand")
+            return
+
+        # unchanged GT file with an index sidecar: read each image's rows only when it is visited or saved
+        if self.gt_index_sidecar == True:
+            row_index = load_gt_row_index(self.gt_load_file_path)
+            if row_index is not None:
+                self.gt_row_source = GT_Row_Source(self.gt_load_file_path, row_index)
+
+                num_lazy = self.use_lazy_gt()
+                self.logger.log("GT index sidecar reused, GT for " + str(num_lazy) + " images loads on demand")
+                return
 
         # start up gt load thread
         self.gt_loader = GT_Load_Process()
-        self.gt_loader.load_params(lines, self.gt_image_list,self.base_img_file_list,self.img_pane_width,self.img_pane_height)
+        self.gt_loader.load_params(self.gt_load_file_path, self.frame_registry,self.box_store,self.gt_load_workers,self.gt_index_sidecar)
         self.gt_loader.start()
 
         # start up status timer
@@ -560,13 +892,29 @@ class Ui(QtWidgets.QMainWindow):
         #self.update_image()
         #self.refresh_labels()
 
+    # point images with rows in self.gt_row_source at it, GT is read on first access
+    def use_lazy_gt(self):
+        num_lazy = self.frame_registry.set_gt_source(self.gt_row_source, list(self.gt_row_source.row_index))
+
+        self.gt_progressbar.setValue(100)
+        self.update_image()
+        self.refresh_labels()
+        return num_lazy
+
     def check_gt_load(self):
         self.num_gt_processed = self.gt_loader.check_progress()
-        percent_done = int((self.num_gt_processed * 100)/self.num_gt_entries)
+        if self.num_gt_entries > 0:
+            percent_done = int((self.num_gt_processed * 100)/self.num_gt_entries)
+        else:
+            percent_done = 100
         self.gt_progressbar = self.findChild(QtWidgets.QProgressBar,"gt_progressbar")
         self.gt_progressbar.setValue(percent_done)
 
-        if self.num_gt_processed < self.num_gt_entries:
+        if self.gt_loader.isFinished() == False:
+            # redraw as soon as boxes for the displayed frame have arrived
+            if len(self.frame_registry) > 0 and len(self.frame_registry[self.img_file_num].gt.bbox_list) != self.num_annotations:
+                self.update_image()
+
             # reset status timer
             self.generateTimer = QTimer()
             self.generateTimer.timeout.connect(self.check_gt_load)
@@ -574,12 +922,91 @@ class Ui(QtWidgets.QMainWindow):
         else:
             # all done - stop timer and force redraw
             self.generateTimer.stop()
+            self.gt_progressbar.setValue(100)
+
+            self.logger.log("Number of GT entries loaded: " + str(self.gt_loader.num_rows))
+            self.logger.log("GT box store: " + str(self.box_store.num_boxes()) + " boxes, " + "{:.1f}".format(self.box_store.nbytes()/(1024*1024)) + " MB")
+
+            if self.gt_loader.row_index is not None:
+                self.gt_row_source = GT_Row_Source(self.gt_load_file_path, self.gt_loader.row_index)
+            print("Number of GT entries loaded: " + str(self.gt_loader.num_rows))
+
+            if self.gt_loader.num_unmatched > 0:
+                self.logger.log("WARNING: " + str(self.gt_loader.num_unmatched) + " GT entries have no matching image file")
+            self.replay_gt_journal()
             self.update_image()
             self.refresh_labels()
 
         return
 
 
+    # image GT changed (add, remove, delete, move/resize, prediction) - journaled on the next sync
+    def journal_gt_change(self, gt_index):
+        if self.gt_journal is not None:
+            self.journal_pending.add(gt_index)
+
+    # hand the current GT of changed images to the journal thread (written and fsynced in the background)
+    def write_gt_journal(self):
+        if self.gt_journal is None or len(self.journal_pending) == 0:
+            return
+
+        pending = self.journal_pending
+        self.journal_pending = set()
+
+        lines = []
+        for gt_index in sorted(pending):
+            # a box being moved/resized is out of the list until the change finishes
+            if self.mod_bbox is not None and gt_index == self.img_file_num:
+                self.journal_pending.add(gt_index)
+                continue
+
+            gt_img = self.frame_registry[gt_index]
+            version, records = gt_img.gt.snapshot()
+            lines.append(format_journal_record(gt_img.base_filename, records))
+
+        if len(lines) > 0:
+            self.gt_journal.append(lines)
+
+    # journal timer: batched journal write, and compaction into the GT file once the journal has grown
+    def sync_gt_journal(self):
+        self.write_gt_journal()
+
+        if self.gt_journal is None or self.gt_journal.num_records < self.gt_journal_compact_records:
+            return
+        if (self.gt_loader is not None and self.gt_loader.isRunning()) or (self.gt_saver is not None and self.gt_saver.isRunning()):
+            return
+
+        self.logger.log("GT journal holds " + str(self.gt_journal.num_records) + " records, compacting into the GT file")
+        self.save_gt_data()
+
+    # re-apply edits journaled but not saved in the last session
+    def replay_gt_journal(self):
+        if len(self.journal_replay) == 0:
+            return
+
+        replayed = set()
+        for img_filename, boxes in self.journal_replay:
+            gt_index = self.frame_registry.index_of(img_filename)
+            if gt_index is None:
+                continue
+
+            # images already edited in this session are newer than anything in the journal
+            gt_img = self.frame_registry[gt_index]
+            if gt_index not in replayed and gt_img.gt.is_dirty():
+                continue
+
+            gt_img.gt.delete_all()
+            gt_img.add_gt_boxes(boxes)
+            gt_img.gt.mark_dirty()
+            replayed.add(gt_index)
+
+        print("GT journal: recovered " + str(len(self.journal_replay)) + " records for " + str(len(replayed)) + " images")
+        self.logger.log("GT journal: recovered " + str(len(self.journal_replay)) + " unsaved edit records for " + str(len(replayed)) + " images")
+        self.journal_replay = []
+
+        self.update_image()
+        self.refresh_labels()
+
     def save_gt_data(self):
 
         # reload gt file path from the setup panel
@@ -589,6 +1016,13 @@ class Ui(QtWidgets.QMainWindow):
         if self.gt_save_file_path == "GT Save File Path Unassigned":
             return
 
+        # the GT in memory is incomplete while loading, and only one save runs at a time
+        if (self.gt_loader is not None and self.gt_loader.isRunning()) or (self.gt_saver is not None and self.gt_saver.isRunning()):
+            print("save_gt_data() called while GT load/save in progress, ignored.")
+            if self.logger is not None:
+                self.logger.log("save_gt_data() called while GT load/save in progress, ignored")
+            return
+
         print("save_gt_data() called.  Saving GT to " + self.gt_save_file_path)
         if self.logger is not None:
             self.logger.log("save_gt_data() called.  Saving GT to " + self.gt_save_file_path)
@@ -598,8 +1032,27 @@ class Ui(QtWidgets.QMainWindow):
         self.gt_progressbar.setValue(0)
 
         # start up gt save thread
+        # journal records so far are covered by this save, edits from here on go to a fresh journal
+        if self.gt_journal is not None:
+            self.write_gt_journal()
+            self.gt_journal.rotate()
+
+        # consistent copy-on-write snapshot: clean images are copied from the GT file, edited ones share
+        # their immutable records tuple, so editing carries on while the save runs
+        # (frames never used have no GT_Image and are unchanged by definition)
+        start_time = time.time()
+        copy_clean = self.gt_row_source is not None
+        gt_snapshot = {}
+        for frame_id, gt_img in self.frame_registry.gt_images.items():
+            frame_snapshot = gt_img.save_snapshot(copy_clean)
+            if frame_snapshot is not None:
+                gt_snapshot[frame_id] = frame_snapshot
+        if self.logger is not None:
+            self.logger.log("GT save snapshot of " + str(len(gt_snapshot)) + " edited images taken in " + "{:.1f}".format((time.time() - start_time)*1000) + " ms")
+
+        self.gt_save_count = len(self.frame_registry)
         self.gt_saver = GT_Save_Process()
-        self.gt_saver.load_params(self.gt_save_file_path,self.gt_image_list)
+        self.gt_saver.load_params(self.gt_save_file_path,self.frame_registry,gt_snapshot,self.gt_row_source,self.gt_index_sidecar,self.gt_storage_format)
         self.gt_saver.start()
 
         # start up status timer
@@ -609,11 +1062,14 @@ class Ui(QtWidgets.QMainWindow):
 
     def check_gt_save(self):
         self.num_gt_processed = self.gt_saver.check_progress()
-        percent_done = int((self.num_gt_processed * 100)/len(self.gt_image_list))
+        if self.gt_save_count > 0:
+            percent_done = int((self.num_gt_processed * 100)/self.gt_save_count)
+        else:
+            percent_done = 100
         self.gt_progressbar = self.findChild(QtWidgets.QProgressBar,"gt_progressbar")
         self.gt_progressbar.setValue(percent_done)
 
-        if self.num_gt_processed < len(self.gt_image_list):
+        if self.gt_saver.isFinished() == False:
             # reset status timer
             self.generateTimer = QTimer()
             self.generateTimer.timeout.connect(self.check_gt_save)
@@ -622,6 +1078,27 @@ class Ui(QtWidgets.QMainWindow):
             # all done, stop timer
             self.generateTimer.stop()
 
+            if self.gt_saver.save_complete == False:
+                # GT file untouched, edits stay dirty and in the journal
+                print("GT save to " + self.gt_save_file_path + " failed.")
+                if self.logger is not None:
+                    self.logger.log("GT save to " + self.gt_save_file_path + " failed")
+                return
+
+            # next save copies unchanged rows from the file just written
+            self.gt_row_source = self.gt_saver.gt_row_source
+
+            # everything written is now clean (edits made during the save keep their newer version)
+            for gt, version in self.gt_saver.saved_versions:
+                gt.saved_version = version
+
+            # journaled edits up to the save snapshot are in the GT file now
+            if self.gt_journal is not None:
+                self.gt_journal.finish_save()
+
+            if self.logger is not None:
+                self.logger.log("GT saved: " + str(self.gt_saver.num_copied) + " images copied unchanged, " + str(self.gt_saver.num_formatted) + " images written from edits")
+
 
         return
 
@@ -629,13 +1106,35 @@ class Ui(QtWidgets.QMainWindow):
 
         # reset all variables
         self.image_file_list = []
-        self.gt_image_list = []
-        self.base_img_file_list = []
+        self.box_store = BoxStore(0)
+        self.frame_registry = FrameRegistry([], self.box_store)
         self.label_list = []
         self.img_file_num = 0
         self.img_files_max = 0
         self.file_slider.setValue(0)
 
+        self.frame_prefetcher.stop()
+        self.frame_cache.clear()
+
+        self.tile_timer.stop()
+        self.tile_generator.stop()
+        self.tile_sources.clear()
+
+        self.journal_timer.stop()
+        if self.gt_journal is not None:
+            self.write_gt_journal()
+            self.gt_journal.stop()
+            self.gt_journal = None
+        self.journal_pending = set()
+        self.journal_replay = []
+
+        if self.gt_row_source is not None:
+            self.gt_row_source.close()
+            self.gt_row_source = None
+        self.nav_direction = 1
+        self.nav_scheduler.reset()
+        self.nav_scheduler.set_num_frames(0)
+
         settings_yaml_file_path = self.setup_dialog.get_settings_yaml_file_path()
         if settings_yaml_file_path == "DL Annotator Settings YAML Path Unassigned":
             return
@@ -650,18 +1149,60 @@ class Ui(QtWidgets.QMainWindow):
         self.dnn_model_file_path = self.setup_dialog.get_dnn_model_file_path()
         self.event_log_file_path = self.setup_dialog.get_event_log_file_path()
 
+        self.frame_cache.set_max_bytes(int(self.setup_dialog.get_frame_cache_mb())*1024*1024)
+        self.prefetch_frames = int(self.setup_dialog.get_prefetch_frames())
+        self.predict_skipped_frames = bool(self.setup_dialog.get_predict_skipped_frames())
+        self.reduced_decode = bool(self.setup_dialog.get_reduced_decode())
+        self.tiled_view_min_pixels = float(self.setup_dialog.get_tiled_view_min_mpixels())*1000*1000
+        self.tile_cache_path = self.setup_dialog.get_tile_cache_path()
+        if self.tile_cache_path is None or str(self.tile_cache_path).lower() == "none":
+            self.tile_cache_path = None
+        self.gt_load_workers = int(self.setup_dialog.get_gt_load_workers())
+        self.gt_index_sidecar = bool(self.setup_dialog.get_gt_index_sidecar())
+        if self.gt_load_workers <= 0:
+            self.gt_load_workers = default_num_workers()
+        self.gt_storage_format = str(self.setup_dialog.get_gt_storage_format()).lower()
+        if self.gt_storage_format != "binary":
+            self.gt_storage_format = "csv"
+        self.gt_journal_sync_ms = int(self.setup_dialog.get_gt_journal_sync_ms())
+        self.gt_journal_compact_records = int(self.setup_dialog.get_gt_journal_compact_records())
+        self.track_workers = int(self.setup_dialog.get_track_workers())
+        if self.track_workers <= 0:
+            self.track_workers = default_track_workers()
+
         self.logger = Logger(self.event_log_file_path)
         self.logger.log("DL Annotator Event Log")
         self.logger.log("Version " + self.tool_version + " Trial = " + str(self.trial_version))
 
         self.logger.log("Loading setup file information...")
 
+        # edits not yet saved in the last session are read now and replayed once GT has loaded
+        if self.gt_journal_sync_ms > 0 and self.gt_save_file_path != "GT Save File Path Unassigned":
+            self.journal_replay = read_gt_journals(self.gt_save_file_path)
+            self.gt_journal = GT_Journal_Process(self.gt_save_file_path)
+            self.journal_timer.start(self.gt_journal_sync_ms)
+
         # load 'em up!
         self.load_image_file_list()
         self.load_label_list()
         self.load_gt_data()
         self.load_dnn()
 
+        if self.gt_loader is None or self.gt_loader.isRunning() == False:
+            self.replay_gt_journal()
+
+    def closeEvent(self, event):
+        self.cancel_track_prediction()
+        self.frame_prefetcher.stop()
+        self.tile_timer.stop()
+        self.tile_generator.stop()
+
+        self.journal_timer.stop()
+        if self.gt_journal is not None:
+            self.write_gt_journal()
+            self.gt_journal.stop()
+        return super(Ui, self).closeEvent(event)
+
     def help_mode(self):
         if self.logger is not None:
             self.logger.log("Help mode, calling up dialog")
@@ -705,38 +1246,34 @@ class Ui(QtWidgets.QMainWindow):
             if self.change_mode is False:
                 self.current_bbox = BBox()
                 self.current_bbox.setStyle(Qt.GlobalColor.cyan, Qt.PenStyle.DashLine)
+
+                # scale for the new bbox: drawn in display coords, kept in native image coords
+                self.current_bbox.set_img_dims(self.frame_registry[self.img_file_num].image_width, self.frame_registry[self.img_file_num].image_height)
+                self.current_bbox.set_disp_dims(self.img_pane_width, self.img_pane_height)
                 self.current_bbox.setTopLeft(QPoint(disp_x, disp_y))
                 self.current_bbox.setBottomRight(QPoint(disp_x, disp_y))
             else:
                 cursor_pt = QPoint(disp_x, disp_y)
-                # proximity calc all boxes and return one that has the closest edge to the point
-                self.mod_bbox = self.gt_image_list[self.img_file_num].gt.bbox_closest_proximity(cursor_pt)
+                # box with the closest edge if it is close *enough* for a resize, else a box that contains the point (moving)
+                self.mod_bbox, edge = self.frame_registry[self.img_file_num].gt.hit_test(cursor_pt)
                 if self.mod_bbox is not None:
+                    # Remove current copy from list and proceed to resize/move
+                    self.frame_registry[self.img_file_num].gt.remove(self.mod_bbox)
+                    self.journal_gt_change(self.img_file_num)
                     self.mod_bbox.setAnchor(QPoint(disp_x, disp_y))
-                    # check if box is close *enough* for a resize
-                    if self.mod_bbox.check_proximity(cursor_pt) is True:
-                        # Remove current copy from list and proceed to resize
-                        self.gt_image_list[self.img_file_num].gt.remove(self.mod_bbox)
-                        self.mod_bbox.resize_mode = True
-                        self.mod_bbox.move_mode = False
+                    if edge != EDGE_NONE:
+                        self.mod_bbox.start_resize(edge)
                     else:
-                        # no edges close enough for a resize, check for any boxes that contain point (moving)
-                        self.mod_bbox = self.gt_image_list[self.img_file_num].gt.bbox_contain(cursor_pt)
-                        if self.mod_bbox is not None:
-                            # Remove current copy from list and proceed to move
-                            self.gt_image_list[self.img_file_num].gt.remove(self.mod_bbox)
-                            self.mod_bbox.setAnchor(QPoint(disp_x, disp_y))
-                            self.mod_bbox.move_mode = True
-                            self.mod_bbox.resize_mode = False
-                            self.mod_bbox.setStyle(Qt.GlobalColor.red, Qt.PenStyle.DashLine)
+                        self.mod_bbox.start_move()
 
         elif event.button() == QtCore.Qt.MouseButton.RightButton:
             #print("Right Mouse Button Press! x =" + str(event.x()) + ", y = " + str(event.y()))
 
-            bbox = self.gt_image_list[self.img_file_num].gt.bbox_contain(QPoint(disp_x, disp_y))
+            bbox = self.frame_registry[self.img_file_num].gt.bbox_contain(QPoint(disp_x, disp_y))
             if bbox is not None:
                 self.logger.log("Deleting BBox")
-                self.gt_image_list[self.img_file_num].gt.remove(bbox)
+                self.frame_registry[self.img_file_num].gt.remove(bbox)
+                self.journal_gt_change(self.img_file_num)
 
         self.draw_processing(event)
         return True
@@ -753,28 +1290,20 @@ class Ui(QtWidgets.QMainWindow):
                 self.current_bbox.setBottomRight(QPoint(disp_x, disp_y))
                 self.current_bbox.class_name = self.class_name
 
-                # update scale on the new bbox
-                self.current_bbox.set_img_dims(self.gt_image_list[self.img_file_num].image_width, self.gt_image_list[self.img_file_num].image_height)
-                self.current_bbox.set_disp_dims(self.img_pane_width, self.img_pane_height)
-                self.current_bbox.update_cx_cy_w_h()
-
                 # add bbox to list and delete the working copy
                 self.logger.log("Add new BBox")
-                self.gt_image_list[self.img_file_num].gt.add(self.current_bbox)
+                self.frame_registry[self.img_file_num].gt.add(self.current_bbox)
+                self.journal_gt_change(self.img_file_num)
                 self.current_bbox = None
             else:
                 if self.mod_bbox != None:
-                    # finish move or resize operation
+                    # finish move or resize operation (the bbox was moved/resized in native coords)
                     self.mod_bbox.finish_change()
 
-                    # update scale on the new bbox
-                    self.mod_bbox.set_img_dims(self.gt_image_list[self.img_file_num].image_width, self.gt_image_list[self.img_file_num].image_height)
-                    self.mod_bbox.set_disp_dims(self.img_pane_width, self.img_pane_height)
-                    self.mod_bbox.update_cx_cy_w_h()
-
                     # add to the list and delete the working copy
                     self.logger.log("Finish move or change of BBox")
-                    self.gt_image_list[self.img_file_num].gt.add(self.mod_bbox)
+                    self.frame_registry[self.img_file_num].gt.add(self.mod_bbox)
+                    self.journal_gt_change(self.img_file_num)
                     self.mod_bbox = None
 
         self.draw_processing(event)
@@ -815,6 +1344,8 @@ class Ui(QtWidgets.QMainWindow):
             self.zoom_ctrl.updateImgDims(self.img_pane_width, self.img_pane_height)
 
         if self.img_files_max > 0:
+            # larger pane may need a finer decode
+            self.image = self.load_image_file_util(self.img_file_num)
             self.draw_processing(event)
 
         self.refresh_labels()
@@ -831,6 +1362,10 @@ class Ui(QtWidgets.QMainWindow):
         if self.img_files_max == 0:
             return super(Ui, self).eventFilter(source, event)
 
+        if event.type() == QtCore.QEvent.Type.Paint and source is self.image_pane:
+            self.paint_image_pane(event)
+            return True
+
         if event.type() == QtCore.QEvent.Type.MouseMove:
             self.mouse_motion_processing(event)
         elif event.type() == QtCore.QEvent.Type.Wheel:
@@ -846,51 +1381,203 @@ class Ui(QtWidgets.QMainWindow):
                 else:
                     self.increment_label()
         elif event.type() == QtCore.QEvent.Type.MouseButtonPress:
-            self.mouse_press_processing(event)
+            # no box edits while the shown frame's boxes are being tracked
+            if self.track_step is None:
+                self.mouse_press_processing(event)
         elif event.type() == QtCore.QEvent.Type.MouseButtonRelease:
-            self.mouse_release_processing(event)
+            if self.track_step is None:
+                self.mouse_release_processing(event)
 
         return super(Ui, self).eventFilter(source, event)
 
     def decrement_image(self, event, prediction):
-        currVal = self.file_slider.value()
-        if (currVal > 0):
-            nextVal = currVal - 1
-            self.img_file_num = nextVal
-            self.file_slider.setValue(nextVal)
+        # navigation is coalesced by the scheduler, see navigate_images()
+        self.nav_scheduler.request(self.file_slider.value(), -1, prediction)
 
-            # look at prev and next images
-            prev_q_image = self.load_image_file_util(currVal)
-            next_q_image = self.load_image_file_util(nextVal)
+    def increment_image(self, event, prediction):
+        # navigation is coalesced by the scheduler, see navigate_images()
+        self.nav_scheduler.request(self.file_slider.value(), 1, prediction)
+
+    def load_prediction_images(self, currVal, nextVal):
+        # look at prev and next images
+        prev_q_image = self.load_image_file_util(currVal)
+        next_q_image = self.load_image_file_util(nextVal)
+
+        # tiled images are predicted on a reduced whole image (predictions are rescaled to native dims)
+        if isinstance(prev_q_image, TileSource):
+            prev_q_image = prev_q_image.overview_image()
+        if isinstance(next_q_image, TileSource):
+            next_q_image = next_q_image.overview_image()
+
+        return prev_q_image, next_q_image
+
+    # "motion" prediction, from the GT of currVal and of an older annotated frame behind it - no images needed
+    def predict_motion(self, currVal, nextVal):
+        direction = 1 if nextVal > currVal else -1
+
+        older_val = None
+        for gap in range(1, MOTION_MAX_GAP + 1):
+            value = currVal - gap*direction
+            if value < 0 or value > self.img_files_max - 1:
+                break
+            if len(self.frame_registry[value].gt.bbox_list) > 0:
+                older_val = value
+                break
+
+        motion_tracker = MotionTracker()
+        older_gt = self.frame_registry[older_val].gt if older_val is not None else None
+        older_gap = currVal - older_val if older_val is not None else 0
+        self.frame_registry[nextVal].gt.predict_motion_annotation(self.frame_registry[currVal].gt, older_gt, older_gap, nextVal - currVal, motion_tracker)
+        self.logger.log("Motion frame " + str(currVal) + " -> " + str(nextVal) + " (from frame " + str(older_val) + "): " + motion_tracker.stats_string())
+
+        self.journal_gt_change(nextVal)
+
+    def predict_image(self, currVal, nextVal):
+        if self.prediction_methods[self.predict_index] == "motion":
+            self.predict_motion(currVal, nextVal)
+            return
 
-            if prediction == True:
-                if self.prediction_methods[self.predict_index] != "dnn":
-                    self.gt_image_list[nextVal].gt.predict_annotation(self.gt_image_list[currVal].gt, prev_q_image, next_q_image, self.prediction_methods[self.predict_index])
-                elif self.dnnTracker != None:
-                    self.gt_image_list[nextVal].set_disp_dims(self.img_pane_width,self.img_pane_height)
-                    self.gt_image_list[nextVal].gt.predict_dnn_annotation(next_q_image, self.dnnTracker, self.confThresh, self.label_list)
+        prev_q_image, next_q_image = self.load_prediction_images(currVal, nextVal)
 
-            self.draw_processing(event)
+        if self.prediction_methods[self.predict_index] == "track":
+            src_gt = self.frame_registry[currVal].gt
+            if len(src_gt.bbox_list) > 0:
+                # continues the tracking session on a step to the next frame, restarts it otherwise
+                tracking_context = self.tracking_session.make_context(currVal, prev_q_image, nextVal, next_q_image)
+                self.frame_registry[nextVal].gt.predict_annotation(src_gt, prev_q_image, next_q_image, "track", tracking_context, self.tracking_session)
+                self.logger.log("Tracked frame " + str(currVal) + " -> " + str(nextVal) + ": " + tracking_context.stats_string())
+            else:
+                self.tracking_session.reset()
+                self.frame_registry[nextVal].gt.predict_annotation(src_gt, prev_q_image, next_q_image, "track")
+        elif self.prediction_methods[self.predict_index] == "flow":
+            src_gt = self.frame_registry[currVal].gt
+            if len(src_gt.bbox_list) > 0:
+                tracking_context = TrackingContext(prev_q_image, next_q_image)
+                self.frame_registry[nextVal].gt.predict_annotation(src_gt, prev_q_image, next_q_image, "flow", tracking_context)
+                self.logger.log("Flow frame " + str(currVal) + " -> " + str(nextVal) + ": " + tracking_context.stats_string())
+            else:
+                self.frame_registry[nextVal].gt.predict_annotation(src_gt, prev_q_image, next_q_image, "flow")
+        elif self.prediction_methods[self.predict_index] != "dnn":
+            self.frame_registry[nextVal].gt.predict_annotation(self.frame_registry[currVal].gt, prev_q_image, next_q_image, self.prediction_methods[self.predict_index])
+        elif self.dnnTracker != None:
+            self.frame_registry[nextVal].set_disp_dims(self.img_pane_width,self.img_pane_height)
+            self.frame_registry[nextVal].gt.predict_dnn_annotation(next_q_image, self.dnnTracker, self.confThresh, self.label_list)
 
-    def increment_image(self, event, prediction):
-        currVal = self.file_slider.value()
-        if (currVal < self.img_files_max - 1):
-            nextVal = currVal + 1
-            self.img_file_num = nextVal
-            self.file_slider.setValue(nextVal)
+        self.journal_gt_change(nextVal)
 
-            # look at prev and next images
-            prev_q_image = self.load_image_file_util(currVal)
-            next_q_image = self.load_image_file_util(nextVal)
+    # "track" step on a frame with many boxes: tracked in the background, returns False if not started
+    def start_track_prediction(self, currVal, nextVal):
+        if self.prediction_methods[self.predict_index] != "track":
+            return False
 
-            if prediction == True:
-                if self.prediction_methods[self.predict_index] != "dnn":
-                    self.gt_image_list[nextVal].gt.predict_annotation(self.gt_image_list[currVal].gt, prev_q_image, next_q_image, self.prediction_methods[self.predict_index])
-                elif self.dnnTracker != None:
-                    self.gt_image_list[nextVal].set_disp_dims(self.img_pane_width,self.img_pane_height)
-                    self.gt_image_list[nextVal].gt.predict_dnn_annotation(next_q_image, self.dnnTracker, self.confThresh, self.label_list)
+        # a box still being drawn or moved goes into the list now, box edits are blocked until the step is done
+        self.finish_box_change()
 
-            self.draw_processing(event)
+        src_gt = self.frame_registry[currVal].gt
+        if len(src_gt.bbox_list) < PARALLEL_MIN_BOXES:
+            return False
+
+        prev_q_image, next_q_image = self.load_prediction_images(currVal, nextVal)
+        tracking_context = self.tracking_session.make_context(currVal, prev_q_image, nextVal, next_q_image)
+        self.track_predictor.request(self.tracking_session, tracking_context, src_gt.bbox_list, self.track_workers)
+        self.track_step = (currVal, nextVal, tracking_context)
+
+        self.gt_progressbar.setValue(0)
+        self.track_timer.start(20)
+        return True
+
+    # adds a box being drawn, moved or resized to the shown frame's list as it is
+    def finish_box_change(self):
+        if self.current_bbox != None:
+            self.current_bbox.setStyle(Qt.GlobalColor.green, Qt.PenStyle.SolidLine)
+            self.current_bbox.class_name = self.class_name
+            self.frame_registry[self.img_file_num].gt.add(self.current_bbox)
+            self.journal_gt_change(self.img_file_num)
+            self.current_bbox = None
+        elif self.mod_bbox != None:
+            self.mod_bbox.finish_change()
+            self.frame_registry[self.img_file_num].gt.add(self.mod_bbox)
+            self.journal_gt_change(self.img_file_num)
+            self.mod_bbox = None
+
+    def check_track_progress(self):
+        currVal, nextVal, tracking_context = self.track_step
+
+        if self.track_predictor.is_busy() == True:
+            self.gt_progressbar.setValue(int(100 * tracking_context.num_tracked / max(1, tracking_context.num_boxes)))
+            return
+
+        self.track_timer.stop()
+        self.gt_progressbar.setValue(100)
+        self.track_step = None
+
+        self.frame_registry[nextVal].gt.set_predicted_bboxes(self.track_predictor.result)
+        self.logger.log("Tracked frame " + str(currVal) + " -> " + str(nextVal) + ": " + tracking_context.stats_string())
+        self.journal_gt_change(nextVal)
+
+        steps, moves = self.track_pending
+        self.track_pending = None
+        self.predict_steps(steps, moves)
+
+    # drops background tracking (and its navigation) and the tracking session
+    def cancel_track_prediction(self):
+        if self.track_step is not None:
+            self.track_timer.stop()
+            self.track_predictor.stop()
+            self.track_step = None
+            self.track_pending = None
+            self.gt_progressbar.setValue(0)
+            self.nav_scheduler.release()
+        self.tracking_session.reset()
+
+    def navigate_images(self, moves):
+        # moves: (from, to, prediction) steps requested since the last navigation, oldest first
+        currVal = moves[0][0]
+        nextVal = moves[-1][1]
+
+        steps = []
+        if self.predict_skipped_frames == True:
+            # prediction still walks through every frame the user passed
+            for from_val, to_val, prediction in moves:
+                if prediction == True:
+                    steps.append((from_val, to_val))
+        elif moves[-1][2] == True and currVal != nextVal:
+            # predict straight from the starting frame to the newest requested frame
+            steps.append((currVal, nextVal))
+
+        self.predict_steps(steps, moves)
+
+    # prediction steps in order, then the moves' newest frame is shown - a step tracked in the background holds
+    # navigation and carries on from check_track_progress
+    def predict_steps(self, steps, moves):
+        while len(steps) > 0:
+            from_val, to_val = steps.pop(0)
+            if self.start_track_prediction(from_val, to_val) == True:
+                self.track_pending = (steps, moves)
+                self.nav_scheduler.hold(moves[-1][1])
+                return
+            self.predict_image(from_val, to_val)
+
+        self.nav_scheduler.release()
+        self.finish_navigation(moves)
+
+    def finish_navigation(self, moves):
+        currVal = moves[0][0]
+        nextVal = moves[-1][1]
+
+        if len(moves) > 1 and self.logger is not None:
+            self.logger.log("Navigation coalesced " + str(len(moves)) + " requests (" + str(currVal) + " -> " + str(nextVal) + "), " + self.nav_scheduler.stats_string())
+
+        if nextVal < currVal:
+            self.nav_direction = -1
+        elif nextVal > currVal:
+            self.nav_direction = 1
+
+        # only the newest frame is loaded and rendered
+        if nextVal != self.file_slider.value():
+            self.file_slider.setValue(nextVal)
+        else:
+            self.draw_processing(None)
 
     def decrement_label(self):
         currVal = self.label_num
@@ -913,6 +1600,9 @@ class Ui(QtWidgets.QMainWindow):
         disp_x, disp_y = self.zoom_ctrl.getZoomLens(self.cursor_x,self.cursor_y)
         self.zoom_ctrl.setZoom(disp_x, disp_y, value)
 
+        # zooming in may need a finer decode (full resolution when zoomed in far enough)
+        self.image = self.load_image_file_util(self.img_file_num)
+
         self.update_image()
         self.refresh_labels()
 
@@ -972,16 +1662,21 @@ class Ui(QtWidgets.QMainWindow):
                 pyautogui.PAUSE = 0.0
                 pyautogui.keyDown("Q")
 
+        # no box edits while the shown frame's boxes are being tracked
+        edit_allowed = self.track_step is None
+
         # delete last added annotation (regardless of mouse location)
-        if key == Qt.Key.Key_R:
+        if key == Qt.Key.Key_R and edit_allowed == True:
             if self.img_files_max > 0:
-                self.gt_image_list[self.img_file_num].gt.delete_last()
+                self.frame_registry[self.img_file_num].gt.delete_last()
+                self.journal_gt_change(self.img_file_num)
                 self.draw_processing(event)
 
         # delete all annotations for current image
-        if key == Qt.Key.Key_F:
-            self.logger.log("Delete all annotations for image " + self.gt_image_list[self.img_file_num].base_filename)
-            self.gt_image_list[self.img_file_num].gt.delete_all()
+        if key == Qt.Key.Key_F and edit_allowed == True:
+            self.logger.log("Delete all annotations for image " + self.frame_registry[self.img_file_num].base_filename)
+            self.frame_registry[self.img_file_num].gt.delete_all()
+            self.journal_gt_change(self.img_file_num)
             self.draw_processing(event)
 
         if key == Qt.Key.Key_X:
@@ -999,11 +1694,18 @@ class Ui(QtWidgets.QMainWindow):
                 self.label_prediction_method.setStyleSheet('color: green')
             elif self.prediction_methods[self.predict_index] == "track":
                 self.label_prediction_method.setStyleSheet('color: blue')
+            elif self.prediction_methods[self.predict_index] == "flow":
+                self.label_prediction_method.setStyleSheet('color: magenta')
+            elif self.prediction_methods[self.predict_index] == "motion":
+                self.label_prediction_method.setStyleSheet('color: darkcyan')
             elif self.prediction_methods[self.predict_index] == "dnn":
                 self.label_prediction_method.setStyleSheet('color: red')
 
             self.logger.log("GT prediction method set: " + self.prediction_methods[self.predict_index])
 
+            # tracks only carry on through uninterrupted "track" steps
+            self.cancel_track_prediction()
+
             self.refresh_labels()
             self.draw_processing(event)
 
@@ -1017,20 +1719,23 @@ class Ui(QtWidgets.QMainWindow):
 
         if key == Qt.Key.Key_Control:
 
-            # clean up any move or resize in process
-            if self.current_bbox != None:
-                self.current_bbox.setStyle(Qt.GlobalColor.green, Qt.PenStyle.SolidLine)
-                self.current_bbox.setBottomRight(QPoint(self.cursor_x, self.cursor_y))
-                self.current_bbox.class_name = self.class_name
-
-                # add current bbox to list and create a new one
-                self.gt_image_list[self.img_file_num].gt.add(self.current_bbox)
-                self.current_bbox = None
-            elif self.mod_bbox != None:
-                # finish move or resize, add to the list and delete the working copy
-                self.mod_bbox.finish_change()
-                self.gt_image_list[self.img_file_num].gt.add(self.mod_bbox)
-                self.mod_bbox = None
+            # clean up any move or resize in process (no box edits while the shown frame's boxes are being tracked)
+            if self.track_step is None:
+                if self.current_bbox != None:
+                    self.current_bbox.setStyle(Qt.GlobalColor.green, Qt.PenStyle.SolidLine)
+                    self.current_bbox.setBottomRight(QPoint(self.cursor_x, self.cursor_y))
+                    self.current_bbox.class_name = self.class_name
+
+                    # add current bbox to list and create a new one
+                    self.frame_registry[self.img_file_num].gt.add(self.current_bbox)
+                    self.journal_gt_change(self.img_file_num)
+                    self.current_bbox = None
+                elif self.mod_bbox != None:
+                    # finish move or resize, add to the list and delete the working copy
+                    self.mod_bbox.finish_change()
+                    self.frame_registry[self.img_file_num].gt.add(self.mod_bbox)
+                    self.journal_gt_change(self.img_file_num)
+                    self.mod_bbox = None
 
             self.change_mode = False
             self.zoom_mode = False
@@ -0,0 +1,90 @@
+import time
+
+import numpy as np
+
+# "motion" prediction: no images at all - each box of the current frame is matched (IoU, same class) with a box of an
+# older annotated frame and extrapolated at the constant velocity between the two; boxes without a match stay put.
+# For fixed cameras with smoothly moving objects.
+
+MOTION_MIN_IOU = 0.3        # weaker overlaps are not taken to be the same object
+MOTION_MAX_GAP = 5          # frames searched back for an older annotated frame
+MOTION_MIN_SIZE = 1.0       # extrapolated width/height never shrinks below this
+
+
+# cx, cy, w, h arrays of boxes, in (img_width, img_height) native coords
+def box_arrays(bboxes, img_width, img_height):
+    x_scale = np.array([img_width/bb.img_width for bb in bboxes], dtype=np.float64)
+    y_scale = np.array([img_height/bb.img_height for bb in bboxes], dtype=np.float64)
+    cx = np.array([bb.cx for bb in bboxes], dtype=np.float64) * x_scale
+    cy = np.array([bb.cy for bb in bboxes], dtype=np.float64) * y_scale
+    w = np.abs(np.array([bb.w for bb in bboxes], dtype=np.float64)) * x_scale
+    h = np.abs(np.array([bb.h for bb in bboxes], dtype=np.float64)) * y_scale
+    return cx, cy, w, h
+
+# IoU of every box a with every box b, shape (len a, len b)
+def iou_matrix(a, b):
+    a_cx, a_cy, a_w, a_h = a
+    b_cx, b_cy, b_w, b_h = b
+
+    inter_w = np.minimum(a_cx[:, None] + a_w[:, None]/2, b_cx[None, :] + b_w[None, :]/2) - np.maximum(a_cx[:, None] - a_w[:, None]/2, b_cx[None, :] - b_w[None, :]/2)
+    inter_h = np.minimum(a_cy[:, None] + a_h[:, None]/2, b_cy[None, :] + b_h[None, :]/2) - np.maximum(a_cy[:, None] - a_h[:, None]/2, b_cy[None, :] - b_h[None, :]/2)
+    inter = np.maximum(inter_w, 0) * np.maximum(inter_h, 0)
+    union = (a_w * a_h)[:, None] + (b_w * b_h)[None, :] - inter
+    return np.where(union > 0, inter/np.where(union > 0, union, 1.0), 0.0)
+
+# greedy one-to-one matching, best IoU first - returns the matched b index per a (-1 for none)
+def match_boxes(ious, min_iou=MOTION_MIN_IOU):
+    matches = np.full(ious.shape[0], -1, dtype=np.int64)
+    if ious.size == 0:
+        return matches
+
+    a_index, b_index = np.nonzero(ious >= min_iou)
+    order = np.argsort(-ious[a_index, b_index], kind="stable")
+    b_taken = np.zeros(ious.shape[1], dtype=bool)
+    for n in order:
+        if matches[a_index[n]] == -1 and b_taken[b_index[n]] == False:
+            matches[a_index[n]] = b_index[n]
+            b_taken[b_index[n]] = True
+    return matches
+
+
+class MotionTracker:
+    def __init__(self):
+        # stats of the last prediction, for the event log
+        self.num_boxes = 0
+        self.num_matched = 0
+        self.predict_time = 0.0
+
+    # bboxes: boxes of the current frame, older_bboxes: boxes of an older frame (older_gap frames before it, negative
+    # when navigating backwards) - returns the boxes extrapolated next_gap frames on, as (cx, cy, w, h, class name)
+    # in (img_width, img_height) native coords, one per box in box order
+    def predict_boxes(self, bboxes, older_bboxes, older_gap, next_gap, img_width, img_height):
+        start_time = time.time()
+        self.num_boxes = len(bboxes)
+        self.num_matched = 0
+
+        class_names = [bb.class_name for bb in bboxes]
+        cx, cy, w, h = box_arrays(bboxes, img_width, img_height)
+
+        if len(bboxes) > 0 and len(older_bboxes) > 0 and older_gap != 0:
+            older = box_arrays(older_bboxes, img_width, img_height)
+            same_class = np.array(class_names)[:, None] == np.array([bb.class_name for bb in older_bboxes])[None, :]
+            matches = match_boxes(np.where(same_class, iou_matrix((cx, cy, w, h), older), 0.0))
+            matched = matches >= 0
+            self.num_matched = int(matched.sum())
+
+            # constant velocity (per frame) of position and size, zero for unmatched boxes
+            older_cx, older_cy, older_w, older_h = [values[np.where(matched, matches, 0)] for values in older]
+            steps = next_gap/older_gap
+            cx = np.where(matched, cx + (cx - older_cx) * steps, cx)
+            cy = np.where(matched, cy + (cy - older_cy) * steps, cy)
+            w = np.where(matched, np.maximum(w + (w - older_w) * steps, MOTION_MIN_SIZE), w)
+            h = np.where(matched, np.maximum(h + (h - older_h) * steps, MOTION_MIN_SIZE), h)
+
+        # (float, rounded only when written to the GT file)
+        boxes = list(zip(cx.tolist(), cy.tolist(), w.tolist(), h.tolist(), class_names))
+        self.predict_time = time.time() - start_time
+        return boxes
+
+    def stats_string(self):
+        return str(self.num_boxes) + " boxes (" + str(self.num_matched) + " matched) in " + "{:.0f}".format(self.predict_time * 1000000) + " us"
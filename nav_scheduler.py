@@ -0,0 +1,88 @@
+from PyQt6.QtCore import QTimer
+
+
+class NavScheduler:
+    def __init__(self, navigate_func):
+
+        # called with the list of (from_index, to_index, prediction) moves to carry out
+        self.navigate_func = navigate_func
+
+        self.num_frames = 0
+
+        self.pending_moves = []
+        self.pending_target = 0
+
+        # while held (a navigation is still being carried out in the background), requests queue up and
+        # move on from the held navigation's target frame
+        self.held = False
+        self.held_target = 0
+
+        # zero-interval single shot timer: fires once the queued input events have been handled,
+        # so key repeats that piled up during a slow frame collapse into a single navigation
+        self.timer = QTimer()
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(self.process_pending)
+
+        self.num_requests = 0
+        self.num_navigations = 0
+        self.num_dropped_frames = 0
+
+    def set_num_frames(self, num_frames):
+        self.num_frames = num_frames
+
+    def reset(self):
+        self.timer.stop()
+        self.pending_moves = []
+        self.held = False
+        self.num_requests = 0
+        self.num_navigations = 0
+        self.num_dropped_frames = 0
+
+    def request(self, curr_index, step, prediction):
+        # newest request always moves on from the last requested index
+        if len(self.pending_moves) == 0:
+            if self.held == True:
+                self.pending_target = self.held_target
+            else:
+                self.pending_target = curr_index
+
+        next_index = self.pending_target + step
+        if next_index < 0 or next_index > self.num_frames - 1:
+            return False
+
+        self.pending_moves.append((self.pending_target, next_index, prediction))
+        self.pending_target = next_index
+        self.num_requests += 1
+
+        if self.timer.isActive() == False and self.held == False:
+            self.timer.start(0)
+
+        return True
+
+    def hold(self, target):
+        self.held = True
+        self.held_target = target
+
+    def release(self):
+        if self.held == False:
+            return
+        self.held = False
+        if len(self.pending_moves) > 0 and self.timer.isActive() == False:
+            self.timer.start(0)
+
+    def process_pending(self):
+        if len(self.pending_moves) == 0 or self.held == True:
+            return
+
+        moves = self.pending_moves
+        self.pending_moves = []
+
+        # every move but the last is a frame the user already passed - never rendered
+        self.num_navigations += 1
+        self.num_dropped_frames += len(moves) - 1
+
+        self.navigate_func(moves)
+
+    def stats_string(self):
+        return "requests = " + str(self.num_requests) + ", rendered = " + str(self.num_navigations) + \
+               ", dropped/coalesced = " + str(self.num_dropped_frames)
@@ -2,19 +2,83 @@
 import cv2
 
 import numpy as np
-from PyQt6.QtCore import Qt, QRect, QLine, QPoint, QSize
+from PyQt6.QtCore import QSize, QThread
 from PyQt6.QtGui import QImage
 import copy
-from bbox import BBox
+import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# dims used for object tracking (completely separate from display dims)
+PREDICT_IMG_WIDTH = 800
+PREDICT_IMG_HEIGHT = 600
+
+# frames with fewer boxes are tracked right away on the calling thread (thread hand-off would cost more than it saves)
+PARALLEL_MIN_BOXES = 8
+
+def default_track_workers():
+    return os.cpu_count() or 1
+
+# QImage -> single channel cv Mat at the tracking dims (the trackers only look at intensity)
+def QImage2grayMat(image, width=PREDICT_IMG_WIDTH, height=PREDICT_IMG_HEIGHT):
+    image = image.scaled(QSize(width, height)).convertToFormat(QImage.Format.Format_Grayscale8)
+
+    ptr = image.constBits()
+    ptr.setsize(image.sizeInBytes())
+    # rows are padded to 4 bytes
+    return np.frombuffer(ptr, np.uint8).reshape(height, image.bytesPerLine())[:, 0:width].copy()
+
+
+# Frames of one prediction step (previous -> next image), converted once and shared by every box
+# tracked between them, plus the step's timing for the event log
+class TrackingContext:
+    # prev_mat: previous frame already converted (by the step before), None to convert prev_q_image
+    def __init__(self, prev_q_image, next_q_image, predict_img_width=PREDICT_IMG_WIDTH, predict_img_height=PREDICT_IMG_HEIGHT, prev_mat=None):
+        self.predict_img_width = predict_img_width
+        self.predict_img_height = predict_img_height
+
+        start_time = time.time()
+        if prev_mat is not None:
+            self.prev_mat = prev_mat
+        else:
+            self.prev_mat = QImage2grayMat(prev_q_image, predict_img_width, predict_img_height)
+        self.next_mat = QImage2grayMat(next_q_image, predict_img_width, predict_img_height)
+        self.convert_time = time.time() - start_time
+
+        # counters are updated by the tracking threads
+        self.lock = threading.Lock()
+        # set to have the remaining boxes skipped (result is dropped)
+        self.cancelled = False
+
+        # track_time adds up the time of all boxes (over all threads), wall_time is the step's elapsed time
+        self.track_time = 0.0
+        self.wall_time = 0.0
+        self.num_workers = 1
+        self.num_boxes = 0
+        self.num_tracked = 0
+        self.num_lost = 0
+        # tracks started on the previous frame / carried over from the step before (TrackingSession)
+        self.num_seeded = 0
+        self.num_continued = 0
+
+    def stats_string(self):
+        # (no trackers to seed or continue for the "flow" method)
+        tracks_text = ""
+        if self.num_continued + self.num_seeded > 0:
+            tracks_text = str(self.num_continued) + " continued, " + str(self.num_seeded) + " seeded, "
+        return str(self.num_tracked) + " boxes tracked (" + tracks_text + str(self.num_lost) + " lost) on " + str(self.num_workers) + " thread(s) in " + "{:.1f}".format(self.wall_time * 1000) + " ms, frame conversion " + \
+            "{:.1f}".format(self.convert_time * 1000) + " ms, tracking " + "{:.1f}".format(self.track_time * 1000) + " ms"
 
 class ObjectTracker:
     def __init__(self):
 
-        # these are the dims used for object detection
-        # (completely separate from display dims)
-        self.predict_img_width = 800
-        self.predict_img_height = 600
+        # (tracking dims are those of the TrackingContext)
+        self.tracker = self.create_tracker()
 
+    # a used legacy tracker can't be re-initialized (init() fails and keeps the old track),
+    # so every box tracked gets a new instance - cheap, the frames are what is expensive
+    def create_tracker(self):
         #only choose one type of tracker
 
         #self.tracker = cv2.TrackerKCF_create()  # bad
@@ -24,45 +88,36 @@ class ObjectTracker:
         #self.tracker = cv2.TrackerTLD_create()  # fast, but hops around a lot
 
         #self.tracker = cv2.TrackerMOSSE_create()   # reasonable accuracy, fast
-        self.tracker = cv2.legacy.TrackerMedianFlow_create()  # good, and fast - Best for this app
+        return cv2.legacy.TrackerMedianFlow_create()  # good, and fast - Best for this app
         #self.tracker = cv2.TrackerCSRT_create()    # very good accuracy, not fast
 
-    def QImage2cvMat(self, image):  # (QImage image)
-        mat = None  # cv2.Mat
-
-        #image = image.scaled(QSize(800,600))
-        image = image.scaled(QSize(self.predict_img_width,self.predict_img_height))
+    # track bbox between the frames of a TrackingContext (shared by all boxes of the frame pair)
+    def predict_bbox_in_context(self, context, bbox):
+        tracker = self.tracker
+        if tracker is None:
+            tracker = self.create_tracker()
+        # instance is used up by this box
+        self.tracker = None
 
-        img_frm = image.format()
+        self.seed_tracker(context, tracker, bbox)
+        predict_bbox = self.update_tracker(context, tracker, bbox)
 
-        height = image.height()
-        width = image.width()
-        channels = 3
-        #bytecount = image.byteCount()
-        bytecount = width*height*channels
-
-        ptr = image.bits()
-        ptr.setsize(bytecount)
-        mat = np.array(ptr).reshape(height, width, channels)
-        mat = cv2.cvtColor(mat, cv2.COLOR_BGR2RGB)
-
-        return mat
-
-
-    def predict_bbox(self, prevQImg, newQImg, bbox):
+        if predict_bbox is None:
+            # if tracking not successful, create deep copy of original bbox
+            predict_bbox = copy.deepcopy(bbox)
+        return predict_bbox
 
-        # create opencv Mat imgs from PyQt QImages
-        prevMatImg = self.QImage2cvMat(prevQImg)
-        newMatImg = self.QImage2cvMat(newQImg)
+    # start tracker on bbox in the context's previous frame
+    def seed_tracker(self, context, tracker, bbox):
+        start_time = time.time()
+        prevMatImg = context.prev_mat
 
         # debug - show mat images
         #cv2.imshow("objdetector: prev", prevMatImg)
-        #cv2.imshow("objdetector: new", newMatImg)
 
         # first, make a detect copy of the bbox, and adjust to detect dims
         predict_bbox = copy.deepcopy(bbox)
-        predict_bbox.set_img_dims(self.predict_img_width,self.predict_img_height)
-        predict_bbox.update_cx_cy_w_h()
+        predict_bbox.rescale_img_dims(context.predict_img_width,context.predict_img_height)
 
         # debug - show prev mat image with bounding box on it
         # pt1 = (int(predict_bbox.cx - (predict_bbox.w/2)), int(predict_bbox.cy - (predict_bbox.h/2)))
@@ -71,50 +126,182 @@ class ObjectTracker:
         # cv2.rectangle(prevMatImg,pt1,pt2,color,2)
         # cv2.imshow("rect_on_image", prevMatImg)
 
-        # create opencv rectangle from bbox
-        predict_bbox.align_corners()   # for inverted rectangles, make sure bbox corners are aligned
-
         # form coordinates of prediction rectangle (IMPORTANT: use float coords for tracker input)
-        x = float(predict_bbox.cx) - float(predict_bbox.w)/2
-        y = float(predict_bbox.cy) - float(predict_bbox.h)/2
-        w = float(predict_bbox.w)
-        h = float(predict_bbox.h)
+        w = abs(float(predict_bbox.w))   # for inverted rectangles
+        h = abs(float(predict_bbox.h))
+        x = float(predict_bbox.cx) - w/2
+        y = float(predict_bbox.cy) - h/2
+
+        tracker.init(prevMatImg,(x, y, w, h))
+        with context.lock:
+            context.num_seeded += 1
+            context.track_time += time.time() - start_time
 
-        # initialize tracker with rectangle and predict new bbox
-        self.tracker.init(prevMatImg,(x, y, w, h))
-        ok, new_box = self.tracker.update(newMatImg)
+    # move a seeded tracker on to the context's next frame, returns the new bbox (bbox's class and image dims)
+    # or None if the track was lost
+    def update_tracker(self, context, tracker, bbox):
+        start_time = time.time()
+        newMatImg = context.next_mat
 
+        ok, new_box = tracker.update(newMatImg)
+
+        predict_bbox = None
         if ok == True:
             new_x1 = new_box[0]
             new_y1 = new_box[1]
             new_w = new_box[2]
             new_h = new_box[3]
-            new_x2 = new_x1 + new_w
-            new_y2 = new_y1 + new_h
 
             # debug - show new mat image with bounding box on it
-            # new_pt1 = (new_x1, new_y1)
-            # new_pt2 = (new_x2, new_y2)
+            # new_pt1 = (int(new_x1), int(new_y1))
+            # new_pt2 = (int(new_x1 + new_w), int(new_y1 + new_h))
             # new_color = (255, 0, 0)
-            # cv2.rectangle(newMatImg,pt1,pt2,color,2)
             # cv2.rectangle(newMatImg, new_pt1, new_pt2, new_color, 2)
             # cv2.imshow("rects_on_New_image", newMatImg)
 
-            # round output dims to nearest int and store in new bbox
-            predict_bbox.cx = int(round(new_x1 + (new_w/2)))
-            predict_bbox.cy = int(round(new_y1 + (new_h/2)))
-            predict_bbox.w = int(round(new_w))
-            predict_bbox.h = int(round(new_h))
-            predict_bbox.update_ul_lr()
+            # store output dims in new bbox (float, rounded only when written to the GT file)
+            predict_bbox = copy.deepcopy(bbox)
+            predict_bbox.rescale_img_dims(context.predict_img_width,context.predict_img_height)
+            predict_bbox.cx = new_x1 + (new_w/2)
+            predict_bbox.cy = new_y1 + (new_h/2)
+            predict_bbox.w = new_w
+            predict_bbox.h = new_h
 
             # reset image dims to that of original bbox
-            predict_bbox.set_img_dims(bbox.img_width,bbox.img_height)
-            predict_bbox.update_cx_cy_w_h()
+            predict_bbox.rescale_img_dims(bbox.img_width,bbox.img_height)
 
             #print("bbox: (" + str(bbox.cx) + "," + str(bbox.cy) + ") predict_bbox: (" + str(predict_bbox.cx) + "," + str(predict_bbox.cy) + ")")
+        with context.lock:
+            if predict_bbox is None:
+                context.num_lost += 1
+            context.num_tracked += 1
+            context.track_time += time.time() - start_time
+        return predict_bbox
 
+
+# Tracking through a sequence of forward steps (E in "track" mode): each object's tracker is kept from step to
+# step and only updated with the next frame, keeping its model instead of starting over on every frame.
+# A track is (re)seeded from the box when the box is new or the annotator moved/resized it since it was
+# predicted.  Only consecutive frames continue the session - a backward jump or a skipped frame starts a new one.
+class TrackingSession:
+    def __init__(self, predict_img_width=PREDICT_IMG_WIDTH, predict_img_height=PREDICT_IMG_HEIGHT):
+        self.predict_img_width = predict_img_width
+        self.predict_img_height = predict_img_height
+        self.object_tracker = ObjectTracker()
+        self.reset()
+
+    def reset(self):
+        # frame the tracks are at, and its tracking mat (previous frame of the next step)
+        self.frame_index = None
+        self.frame_mat = None
+        # id(bbox) -> (bbox, (cx, cy, w, h) when predicted, tracker), for the boxes predicted into frame_index
+        self.tracks = {}
+
+    # context for the step prev_index -> next_index, the session is restarted if the step doesn't continue it
+    def make_context(self, prev_index, prev_q_image, next_index, next_q_image):
+        if prev_index != self.frame_index or next_index != prev_index + 1:
+            self.reset()
+
+        context = TrackingContext(prev_q_image, next_q_image, self.predict_img_width, self.predict_img_height, self.frame_mat)
+        context.prev_index = prev_index
+        context.next_index = next_index
+        return context
+
+    # boxes of the context's previous frame tracked into its next frame (one new bbox per box, in box order,
+    # a copy if lost) - spread over num_workers threads, OpenCV releases the GIL while tracking
+    def track_bboxes(self, context, bboxes, num_workers=1):
+        start_time = time.time()
+        context.num_boxes = len(bboxes)
+
+        if num_workers > 1 and len(bboxes) >= PARALLEL_MIN_BOXES:
+            context.num_workers = min(num_workers, len(bboxes))
+            with ThreadPoolExecutor(max_workers=context.num_workers) as executor:
+                # map() keeps box order
+                results = list(executor.map(lambda bb: self.track_bbox(context, bb), bboxes))
         else:
-            # if tracking not successful, create deep copy of original bbox
-            predict_bbox = copy.deepcopy(bbox)
+            results = [self.track_bbox(context, bb) for bb in bboxes]
 
-        return predict_bbox
+        new_tracks = {}
+        new_bboxes = []
+        for new_bb, tracker in results:
+            if tracker is not None:
+                new_tracks[id(new_bb)] = (new_bb, (new_bb.cx, new_bb.cy, new_bb.w, new_bb.h), tracker)
+            new_bboxes.append(new_bb)
+
+        context.wall_time = time.time() - start_time
+        self.frame_index = context.next_index
+        self.frame_mat = context.next_mat
+        self.tracks = new_tracks
+        return new_bboxes
+
+    # returns (new bbox, its tracker) - tracker None if the track was lost (the box stays where it was, its track is
+    # seeded again on the next step)
+    def track_bbox(self, context, bb):
+        if context.cancelled == True:
+            return copy.deepcopy(bb), None
+
+        # (tracks are only read here, they are replaced once all boxes are done)
+        track = self.tracks.get(id(bb))
+        if track is not None and track[0] is bb and track[1] == (bb.cx, bb.cy, bb.w, bb.h):
+            tracker = track[2]
+            with context.lock:
+                context.num_continued += 1
+        else:
+            # new box, or edited since it was predicted
+            tracker = self.object_tracker.create_tracker()
+            self.object_tracker.seed_tracker(context, tracker, bb)
+
+        new_bb = self.object_tracker.update_tracker(context, tracker, bb)
+        if new_bb is None:
+            return copy.deepcopy(bb), None
+        return new_bb, tracker
+
+
+# Tracks the boxes of one frame pair with a TrackingSession in the background, so the GUI stays responsive on
+# frames with many boxes (progress: context.num_tracked of context.num_boxes)
+class Track_Predict_Process(QThread):
+    def __init__(self):
+        QThread.__init__(self)
+
+        self.tracking_session = None
+        self.context = None
+        self.bboxes = []
+        self.num_workers = 1
+        # new bboxes of the last request
+        self.result = None
+        self.active = False
+        self.lock = threading.Lock()
+
+    def __del__(self):
+        self.wait()
+
+    def request(self, tracking_session, context, bboxes, num_workers):
+        # previous run may still be winding down
+        self.wait()
+
+        with self.lock:
+            self.tracking_session = tracking_session
+            self.context = context
+            self.bboxes = list(bboxes)
+            self.num_workers = num_workers
+            self.result = None
+            self.active = True
+        self.start()
+
+    def stop(self):
+        with self.lock:
+            if self.context is not None:
+                self.context.cancelled = True
+        self.wait()
+
+    def is_busy(self):
+        with self.lock:
+            return self.active
+
+    def run(self):
+        result = self.tracking_session.track_bboxes(self.context, self.bboxes, self.num_workers)
+
+        with self.lock:
+            self.result = result
+            self.bboxes = []
+            self.active = False
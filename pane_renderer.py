@@ -0,0 +1,156 @@
+from PyQt6.QtCore import Qt, QRectF, QSize
+from PyQt6.QtGui import QBrush, QFont, QPainter, QPen, QPixmap
+
+from tile_source import TileSource
+
+# Layered rendering of the image pane, each layer cached until its inputs change:
+#   image layer   frame image scaled to the pane - rebuilt when the image, the zoom box or the pane size changes
+#   box layer     the frame's GT boxes on a transparent pixmap - rebuilt when the GT (GT.draw_version) or zoom box changes
+#   composed      image + box layers + boxes being drawn/changed - shown by the pane label
+# when zoomed, the image layer samples just the zoom box region (native coords, see ZoomControl) of the source
+# image and the boxes are drawn through the zoom transform, nothing is upscaled from a pane resolution composite
+# very large images come as a TileSource: the image layer is drawn from the tiles of the pyramid level matching the
+# zoom, tiles not made yet are listed in missing_tile_rows for the caller to have generated
+# the crosshair is in no layer: the pane's paint event draws it on top of the label, so a plain mouse
+# move only repaints the pane with a new crosshair
+
+
+def label_font():
+    font = QFont()
+    font.setPointSize(18)
+    font.setBold(True)
+    return font
+
+def draw_crosshair(qpainter, x, y, pane_width, pane_height):
+    qpainter.setPen(QPen(QBrush(Qt.GlobalColor.yellow), 1, Qt.PenStyle.DashLine))
+    qpainter.drawLine(0, int(y), pane_width-1, int(y))
+    qpainter.drawLine(int(x), 0, int(x), pane_height-1)
+
+
+class PaneRenderer:
+    def __init__(self):
+        self.image_layer = None
+        self.image_key = None
+
+        self.box_layer = None
+        self.box_key = None
+
+        self.composed = None
+        self.composed_key = None
+        # True if the last composed pixmap had boxes being drawn/changed on it
+        self.composed_live = False
+
+        # layer rebuilds, for stats/benchmarks
+        self.num_image_renders = 0
+        self.num_box_renders = 0
+        self.num_composes = 0
+
+        # tile rows the last tiled image layer had to draw from a coarser level, [(level, tile y), ...]
+        self.missing_tile_rows = []
+
+    def invalidate(self):
+        self.image_key = None
+        self.box_key = None
+        self.composed_key = None
+
+    # returns the composed pixmap if it changed since the last call, None if the pane already shows it
+    # native_width/native_height: native dims of the frame (image may be a reduced decode of it)
+    # live_bboxes: boxes being drawn/changed (not in the GT)
+    def render(self, image, native_width, native_height, gt, live_bboxes, zoom_ctrl, pane_width, pane_height):
+        if native_width <= 0 or native_height <= 0:
+            native_width = image.width()
+            native_height = image.height()
+
+        zoomed = zoom_ctrl.isZoomed()
+        if zoomed == True:
+            crop_rect = zoom_ctrl.getNativeCropRect(native_width, native_height)
+            crop = (crop_rect.x(), crop_rect.y(), crop_rect.width(), crop_rect.height())
+        else:
+            crop_rect = QRectF(0, 0, native_width, native_height)
+            crop = None
+
+        image_key = (image.cacheKey(), crop, pane_width, pane_height)
+        if image_key != self.image_key:
+            self.missing_tile_rows = []
+            if isinstance(image, TileSource):
+                self.image_layer = self.render_tiles(image, crop_rect, pane_width, pane_height)
+            elif zoomed == True:
+                self.image_layer = self.render_image_crop(image, native_width, native_height, crop_rect, pane_width, pane_height)
+            else:
+                self.image_layer = QPixmap.fromImage(image).scaled(QSize(pane_width, pane_height))
+            self.image_key = image_key
+            self.num_image_renders += 1
+
+        box_key = (gt, None if gt is None else gt.draw_version, crop, pane_width, pane_height)
+        if box_key != self.box_key:
+            self.box_layer = QPixmap(pane_width, pane_height)
+            self.box_layer.fill(Qt.GlobalColor.transparent)
+            if gt is not None:
+                qp = QPainter(self.box_layer)
+                qp.setFont(label_font())
+                if zoomed == True:
+                    qp.setTransform(zoom_ctrl.getZoomTransform())
+                gt.draw(qp)
+                qp.end()
+            self.box_key = box_key
+            self.num_box_renders += 1
+
+        composed_key = (image_key, box_key)
+        live = len(live_bboxes) > 0
+        if composed_key == self.composed_key and live == False and self.composed_live == False:
+            return None
+
+        composed = QPixmap(pane_width, pane_height)
+        qp = QPainter(composed)
+        qp.drawPixmap(0, 0, self.image_layer)
+        qp.drawPixmap(0, 0, self.box_layer)
+        if live == True:
+            qp.setFont(label_font())
+            if zoomed == True:
+                qp.setTransform(zoom_ctrl.getZoomTransform())
+            for bb in live_bboxes:
+                bb.draw(qp)
+        qp.end()
+
+        self.composed = composed
+        self.composed_key = composed_key
+        self.composed_live = live
+        self.num_composes += 1
+        return composed
+
+    # zoom box region (native coords) of the image, sampled straight from the source pixels into the pane
+    def render_image_crop(self, image, native_width, native_height, crop_rect, pane_width, pane_height):
+        x_scale = image.width()/native_width
+        y_scale = image.height()/native_height
+        source_rect = QRectF(crop_rect.x() * x_scale, crop_rect.y() * y_scale, crop_rect.width() * x_scale, crop_rect.height() * y_scale)
+
+        image_layer = QPixmap(pane_width, pane_height)
+        image_layer.fill(Qt.GlobalColor.black)
+        qp = QPainter(image_layer)
+        qp.drawImage(QRectF(0, 0, pane_width, pane_height), image, source_rect)
+        qp.end()
+        return image_layer
+
+    # zoom box region (native coords) of a tiled image from the tiles of the matching pyramid level
+    def render_tiles(self, tile_source, crop_rect, pane_width, pane_height):
+        x_scale = pane_width/crop_rect.width()
+        y_scale = pane_height/crop_rect.height()
+        level = tile_source.level_for_density(min(crop_rect.width()/pane_width, crop_rect.height()/pane_height))
+
+        image_layer = QPixmap(pane_width, pane_height)
+        image_layer.fill(Qt.GlobalColor.black)
+        qp = QPainter(image_layer)
+
+        tiles = tile_source.tiles_in_rect(level, crop_rect)
+        for tile_x, tile_y in tiles:
+            # tile not made yet: the part of a coarser tile covering it
+            found = tile_source.best_tile(level, tile_x, tile_y)
+            if found is not None:
+                tile, source_rect, found_level = found
+                rect = tile_source.tile_rect(level, tile_x, tile_y)
+                target_rect = QRectF((rect.x() - crop_rect.x()) * x_scale, (rect.y() - crop_rect.y()) * y_scale, rect.width() * x_scale, rect.height() * y_scale)
+                qp.drawImage(target_rect, tile, source_rect)
+        qp.end()
+
+        self.missing_tile_rows = tile_source.missing_rows(level, tiles)
+        return image_layer
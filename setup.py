@@ -63,6 +63,20 @@ class SetupDialog(QtWidgets.QDialog):
         self.label_event_log_file_path.setText(self.event_log_file_path)
         self.label_event_log_file_path.setReadOnly(True)
 
+        # optional performance settings (not shown in dialog)
+        self.frame_cache_mb = 512
+        self.prefetch_frames = 4
+        self.predict_skipped_frames = True
+        self.reduced_decode = True
+        self.tiled_view_min_mpixels = 64
+        self.tile_cache_path = "./tile_cache"
+        self.gt_load_workers = 0
+        self.gt_index_sidecar = True
+        self.gt_storage_format = "csv"
+        self.gt_journal_sync_ms = 1000
+        self.gt_journal_compact_records = 5000
+        self.track_workers = 0
+
         self.load_a5000_yaml_button = self.findChild(QtWidgets.QPushButton,"a5000_yaml_load")
         self.load_a5000_yaml_button.clicked.connect(self.load_a5000_yaml)
 
@@ -96,6 +110,42 @@ class SetupDialog(QtWidgets.QDialog):
     def get_event_log_file_path(self):
         return self.event_log_file_path
 
+    def get_frame_cache_mb(self):
+        return self.frame_cache_mb
+
+    def get_prefetch_frames(self):
+        return self.prefetch_frames
+
+    def get_predict_skipped_frames(self):
+        return self.predict_skipped_frames
+
+    def get_reduced_decode(self):
+        return self.reduced_decode
+
+    def get_tiled_view_min_mpixels(self):
+        return self.tiled_view_min_mpixels
+
+    def get_tile_cache_path(self):
+        return self.tile_cache_path
+
+    def get_gt_load_workers(self):
+        return self.gt_load_workers
+
+    def get_gt_index_sidecar(self):
+        return self.gt_index_sidecar
+
+    def get_gt_storage_format(self):
+        return self.gt_storage_format
+
+    def get_gt_journal_sync_ms(self):
+        return self.gt_journal_sync_ms
+
+    def get_gt_journal_compact_records(self):
+        return self.gt_journal_compact_records
+
+    def get_track_workers(self):
+        return self.track_workers
+
     def refresh_labels(self):
         self.label_a5000_yaml_path.setText(self.a5000_yaml_path)
         self.label_img_file_path.setText(self.img_file_path)
@@ -133,6 +183,18 @@ class SetupDialog(QtWidgets.QDialog):
         self.dnn_cfg_file_path = self.dictionary.get("dnn_cfg_file_path")
         self.dnn_model_file_path = self.dictionary.get("dnn_model_file_path")
         self.event_log_file_path = self.dictionary.get("event_log_file_path")
+        self.frame_cache_mb = self.dictionary.get("frame_cache_mb", 512)
+        self.prefetch_frames = self.dictionary.get("prefetch_frames", 4)
+        self.predict_skipped_frames = self.dictionary.get("predict_skipped_frames", True)
+        self.reduced_decode = self.dictionary.get("reduced_decode", True)
+        self.tiled_view_min_mpixels = self.dictionary.get("tiled_view_min_mpixels", 64)
+        self.tile_cache_path = self.dictionary.get("tile_cache_path", "./tile_cache")
+        self.gt_load_workers = self.dictionary.get("gt_load_workers", 0)
+        self.gt_index_sidecar = self.dictionary.get("gt_index_sidecar", True)
+        self.gt_storage_format = self.dictionary.get("gt_storage_format", "csv")
+        self.gt_journal_sync_ms = self.dictionary.get("gt_journal_sync_ms", 1000)
+        self.gt_journal_compact_records = self.dictionary.get("gt_journal_compact_records", 5000)
+        self.track_workers = self.dictionary.get("track_workers", 0)
 
         for key,value in self.dictionary.items():
             print(key + " : " + str(value))
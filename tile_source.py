@@ -0,0 +1,348 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+from PyQt6.QtCore import Qt, QThread, QRect, QRectF, QSize
+from PyQt6.QtGui import QImage, QImageReader, QPainter
+
+# Tiled image pyramid for very large images (aerial / orthophotos), shown instead of a full decode when the
+# native size exceeds the tiled_view_min_mpixels setting:
+#   level L   the image at 1/2^L size (level 0 = native), cut into TILE_SIZE x TILE_SIZE tiles - the top level is one tile
+#   tiles     made the first time they are needed and kept on disk per image, as
+#             <tile cache path>/<image key>/<level>_<tile y>_<tile x>.jpg, plus an LRU of decoded tiles in memory
+# a level of at most TILE_WHOLE_LEVEL_PIXELS is decoded in one go (JPEG DCT scaling) and every coarser level is
+# made from it, finer levels are decoded one row of tiles at a time through a clip rect, so memory stays bounded.
+# The coarse levels are made when the image is opened, other tiles in the background by Tile_Generate_Process -
+# until they are ready the viewer draws the covering part of a coarser tile.
+
+TILE_SIZE = 512
+TILE_WHOLE_LEVEL_PIXELS = 4096*4096
+TILE_MEMORY_BYTES = 256*1024*1024
+TILE_JPG_QUALITY = 90
+
+
+# tile cache directory name of an image file, changes when the file does
+def image_cache_key(full_path):
+    stat = os.stat(full_path)
+    key = os.path.abspath(full_path) + "|" + str(stat.st_size) + "|" + str(stat.st_mtime_ns) + "|" + str(TILE_SIZE)
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()[0:20]
+
+
+class TileSource:
+    # cache_path None: tiles are only kept in memory
+    def __init__(self, full_path, native_width, native_height, cache_path):
+        self.full_path = full_path
+        self.native_width = native_width
+        self.native_height = native_height
+
+        # (width, height) per level
+        self.level_dims = [(native_width, native_height)]
+        while self.level_dims[-1][0] > TILE_SIZE or self.level_dims[-1][1] > TILE_SIZE:
+            level_width, level_height = self.level_dims[-1]
+            self.level_dims.append(((level_width + 1)//2, (level_height + 1)//2))
+        self.top_level = len(self.level_dims) - 1
+
+        self.lock = threading.Lock()
+        # serializes decoding, the GUI thread and the tile generator may both need tiles made
+        self.generate_lock = threading.Lock()
+
+        # (level, tile x, tile y) -> QImage, least recently used at the front
+        self.tiles = OrderedDict()
+        self.tile_bytes = 0
+
+        # tiles on disk, and (level, tile y) rows that could not be decoded
+        self.on_disk = set()
+        self.failed_rows = set()
+
+        # bumped whenever tiles become available, part of cacheKey() so the pane re-renders
+        self.version = 0
+
+        self.cache_dir = None
+        if cache_path is not None and native_width > 0 and native_height > 0:
+            try:
+                self.cache_dir = os.path.join(cache_path, image_cache_key(full_path))
+                os.makedirs(self.cache_dir, exist_ok=True)
+                for tile_filename in os.listdir(self.cache_dir):
+                    fields = tile_filename[0:-4].split("_")
+                    if tile_filename.endswith(".jpg") and len(fields) == 3:
+                        level, tile_y, tile_x = int(fields[0]), int(fields[1]), int(fields[2])
+                        self.on_disk.add((level, tile_x, tile_y))
+            except (OSError, ValueError) as e:
+                print("tile source: no tile cache for " + full_path + ": " + str(e))
+                self.cache_dir = None
+
+        # coarse levels right away, so there is always something to draw
+        if self.isNull() == False and self.is_tile_available(self.top_level, 0, 0) == False:
+            self.generate_level(self.whole_level())
+
+    # QImage-like interface used by the viewer
+    def isNull(self):
+        return self.native_width <= 0 or self.native_height <= 0
+
+    def width(self):
+        return self.native_width
+
+    def height(self):
+        return self.native_height
+
+    def cacheKey(self):
+        return (id(self), self.version)
+
+    # finest level that is decoded in one go
+    def whole_level(self):
+        level = 0
+        while level < self.top_level and self.level_dims[level][0]*self.level_dims[level][1] > TILE_WHOLE_LEVEL_PIXELS:
+            level += 1
+        return level
+
+    # coarsest level that still has at least one level pixel per display pixel
+    def level_for_density(self, native_per_display):
+        level = 0
+        while level < self.top_level and 2 ** (level + 1) <= native_per_display:
+            level += 1
+        return level
+
+    def num_tiles(self, level):
+        level_width, level_height = self.level_dims[level]
+        return (level_width + TILE_SIZE - 1)//TILE_SIZE, (level_height + TILE_SIZE - 1)//TILE_SIZE
+
+    # tiles of a level overlapping a rect in native coords, [(tile x, tile y), ...]
+    def tiles_in_rect(self, level, native_rect):
+        level_width, level_height = self.level_dims[level]
+        x_scale = level_width/self.native_width
+        y_scale = level_height/self.native_height
+        num_tiles_x, num_tiles_y = self.num_tiles(level)
+
+        tile_x1 = min(max(int(native_rect.left() * x_scale)//TILE_SIZE, 0), num_tiles_x - 1)
+        tile_y1 = min(max(int(native_rect.top() * y_scale)//TILE_SIZE, 0), num_tiles_y - 1)
+        tile_x2 = min(max(int((native_rect.left() + native_rect.width()) * x_scale)//TILE_SIZE, 0), num_tiles_x - 1)
+        tile_y2 = min(max(int((native_rect.top() + native_rect.height()) * y_scale)//TILE_SIZE, 0), num_tiles_y - 1)
+        return [(tile_x, tile_y) for tile_y in range(tile_y1, tile_y2 + 1) for tile_x in range(tile_x1, tile_x2 + 1)]
+
+    # level pixel rect of a tile
+    def tile_level_rect(self, level, tile_x, tile_y):
+        level_width, level_height = self.level_dims[level]
+        x = tile_x*TILE_SIZE
+        y = tile_y*TILE_SIZE
+        return QRect(x, y, min(TILE_SIZE, level_width - x), min(TILE_SIZE, level_height - y))
+
+    # native coords rect of a tile
+    def tile_rect(self, level, tile_x, tile_y):
+        level_width, level_height = self.level_dims[level]
+        x_scale = self.native_width/level_width
+        y_scale = self.native_height/level_height
+        rect = self.tile_level_rect(level, tile_x, tile_y)
+        return QRectF(rect.x() * x_scale, rect.y() * y_scale, rect.width() * x_scale, rect.height() * y_scale)
+
+    def tile_path(self, level, tile_x, tile_y):
+        return os.path.join(self.cache_dir, str(level) + "_" + str(tile_y) + "_" + str(tile_x) + ".jpg")
+
+    def is_tile_available(self, level, tile_x, tile_y):
+        with self.lock:
+            return (level, tile_x, tile_y) in self.tiles or (level, tile_x, tile_y) in self.on_disk
+
+    # tile from memory or disk, None if it has not been made
+    def get_tile(self, level, tile_x, tile_y):
+        key = (level, tile_x, tile_y)
+        with self.lock:
+            tile = self.tiles.get(key)
+            if tile is not None:
+                self.tiles.move_to_end(key)
+                return tile
+            if key not in self.on_disk:
+                return None
+
+        tile = QImage(self.tile_path(level, tile_x, tile_y))
+        with self.lock:
+            if tile.isNull():
+                # damaged/removed cache file - make it again
+                self.on_disk.discard(key)
+                return None
+            self.insert(key, tile)
+        return tile
+
+    # tile to draw for (level, tile x, tile y): (image, source rect in image, level found) - the tile itself,
+    # else the part of the nearest coarser tile that covers it, None if nothing covering is available
+    def best_tile(self, level, tile_x, tile_y):
+        rect = self.tile_level_rect(level, tile_x, tile_y)
+        for found_level in range(level, self.top_level + 1):
+            shift = found_level - level
+            tile = self.get_tile(found_level, tile_x >> shift, tile_y >> shift)
+            if tile is not None:
+                scale = 1/(2 ** shift)
+                source_rect = QRectF(rect.x()*scale - (tile_x >> shift)*TILE_SIZE, rect.y()*scale - (tile_y >> shift)*TILE_SIZE,
+                                     rect.width()*scale, rect.height()*scale)
+                return tile, source_rect, found_level
+        return None
+
+    # must be called with lock held
+    def insert(self, key, tile):
+        old_tile = self.tiles.pop(key, None)
+        if old_tile is not None:
+            self.tile_bytes -= old_tile.sizeInBytes()
+        self.tiles[key] = tile
+        self.tile_bytes += tile.sizeInBytes()
+
+        # without a disk cache evicted tiles are made again when needed
+        while self.tile_bytes > TILE_MEMORY_BYTES and len(self.tiles) > 1:
+            _, old_tile = self.tiles.popitem(last=False)
+            self.tile_bytes -= old_tile.sizeInBytes()
+
+    def store_tile(self, level, tile_x, tile_y, tile):
+        key = (level, tile_x, tile_y)
+        on_disk = False
+        if self.cache_dir is not None:
+            tile_path = self.tile_path(level, tile_x, tile_y)
+            # written under a temp name, a crash never leaves a partial tile behind
+            if tile.save(tile_path + ".tmp", "JPG", TILE_JPG_QUALITY) == True:
+                os.replace(tile_path + ".tmp", tile_path)
+                on_disk = True
+
+        with self.lock:
+            if on_disk == True:
+                self.on_disk.add(key)
+            self.insert(key, tile)
+            self.version += 1
+
+    def store_tiles(self, level, level_image, tile_y1, tile_y2):
+        num_tiles_x, num_tiles_y = self.num_tiles(level)
+        for tile_y in range(tile_y1, tile_y2 + 1):
+            for tile_x in range(0, num_tiles_x):
+                if self.is_tile_available(level, tile_x, tile_y) == False:
+                    rect = self.tile_level_rect(level, tile_x, tile_y)
+                    self.store_tile(level, tile_x, tile_y, level_image.copy(rect.translated(0, -tile_y1*TILE_SIZE)))
+
+    def read_level(self, level, clip_rect=None):
+        reader = QImageReader(self.full_path)
+        level_width, level_height = self.level_dims[level]
+        if level > 0:
+            reader.setScaledSize(QSize(level_width, level_height))
+        if clip_rect is not None:
+            reader.setScaledClipRect(clip_rect)
+        return reader.read()
+
+    # decode a whole level, and make every coarser level from it
+    def generate_level(self, level):
+        with self.generate_lock:
+            level_image = self.read_level(level)
+            if level_image.isNull():
+                print("tile source: cannot decode " + self.full_path)
+                self.failed_rows.update((failed_level, tile_y) for failed_level in range(level, self.top_level + 1) for tile_y in range(0, self.num_tiles(failed_level)[1]))
+                return
+
+            for next_level in range(level, self.top_level + 1):
+                if next_level > level:
+                    level_width, level_height = self.level_dims[next_level]
+                    level_image = level_image.scaled(QSize(level_width, level_height), Qt.AspectRatioMode.IgnoreAspectRatio, Qt.TransformationMode.SmoothTransformation)
+                self.store_tiles(next_level, level_image, 0, self.num_tiles(next_level)[1] - 1)
+
+    # make the tiles of one row of a level
+    def generate_row(self, level, tile_y):
+        if level >= self.whole_level():
+            self.generate_level(level)
+            return
+
+        with self.generate_lock:
+            num_tiles_x, num_tiles_y = self.num_tiles(level)
+            if all(self.is_tile_available(level, tile_x, tile_y) for tile_x in range(0, num_tiles_x)):
+                return
+
+            level_width, level_height = self.level_dims[level]
+            row_rect = QRect(0, tile_y*TILE_SIZE, level_width, min(TILE_SIZE, level_height - tile_y*TILE_SIZE))
+            row_image = self.read_level(level, row_rect)
+            if row_image.isNull():
+                print("tile source: cannot decode tile row " + str(tile_y) + " of level " + str(level) + " of " + self.full_path)
+                self.failed_rows.add((level, tile_y))
+                return
+
+            self.store_tiles(level, row_image, tile_y, tile_y)
+
+    # rows of tiles to generate so all tiles given are available, [(level, tile y), ...]
+    def missing_rows(self, level, tiles):
+        rows = []
+        for tile_x, tile_y in tiles:
+            row = (level, tile_y)
+            if row not in rows and row not in self.failed_rows and self.is_tile_available(level, tile_x, tile_y) == False:
+                rows.append(row)
+        return rows
+
+    # whole image at no more than max_dim pixels per side (e.g. for prediction/tracking of a tiled image)
+    def overview_image(self, max_dim=2048):
+        level = 0
+        while level < self.top_level and max(self.level_dims[level]) > max_dim:
+            level += 1
+
+        level_width, level_height = self.level_dims[level]
+        num_tiles_x, num_tiles_y = self.num_tiles(level)
+        overview = QImage(level_width, level_height, QImage.Format.Format_RGB888)
+        overview.fill(Qt.GlobalColor.black)
+
+        qp = QPainter(overview)
+        for tile_y in range(0, num_tiles_y):
+            for tile_x in range(0, num_tiles_x):
+                tile = self.get_tile(level, tile_x, tile_y)
+                if tile is None:
+                    self.generate_row(level, tile_y)
+                    tile = self.get_tile(level, tile_x, tile_y)
+                if tile is not None:
+                    qp.drawImage(tile_x*TILE_SIZE, tile_y*TILE_SIZE, tile)
+        qp.end()
+        return overview
+
+    def stats_string(self):
+        with self.lock:
+            return "levels = " + str(self.top_level + 1) + ", tiles in memory = " + str(len(self.tiles)) + \
+                   ", MB = " + "{:.1f}".format(self.tile_bytes/(1024*1024)) + ", tiles on disk = " + str(len(self.on_disk))
+
+
+# makes requested tile rows of a tile source in the background
+class Tile_Generate_Process(QThread):
+    def __init__(self):
+        QThread.__init__(self)
+
+        self.tile_source = None
+        self.requested_rows = []
+        self.active = False
+        self.lock = threading.Lock()
+
+    def __del__(self):
+        self.wait()
+
+    def request(self, tile_source, rows):
+        # latest request replaces anything not yet generated
+        with self.lock:
+            self.tile_source = tile_source
+            self.requested_rows = list(rows)
+            if self.active == True:
+                return
+            self.active = True
+
+        # previous run may still be winding down
+        self.wait()
+        self.start()
+
+    def stop(self):
+        with self.lock:
+            self.requested_rows = []
+        self.wait()
+
+    def is_busy(self):
+        with self.lock:
+            return self.active
+
+    def run(self):
+
+        while True:
+            with self.lock:
+                if len(self.requested_rows) == 0:
+                    self.active = False
+                    return
+                tile_source = self.tile_source
+                level, tile_y = self.requested_rows.pop(0)
+
+            try:
+                tile_source.generate_row(level, tile_y)
+            except OSError as e:
+                print("tile generate thread: cannot write tiles of " + tile_source.full_path + ": " + str(e))
+                tile_source.failed_rows.add((level, tile_y))
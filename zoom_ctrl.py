@@ -1,5 +1,5 @@
-from PyQt6.QtCore import Qt, QRect, QLine, QPoint
-from PyQt6.QtGui import QBrush, QPen
+from PyQt6.QtCore import Qt, QRect, QRectF, QLine, QPoint
+from PyQt6.QtGui import QBrush, QPen, QTransform
 
 class ZoomControl:
     def __init__(self,ul_x,ul_y,w,h):
@@ -81,6 +81,20 @@ class ZoomControl:
         rect = QRect(self.ul_x,self.ul_y,self.width,self.height)
         return rect
 
+    def isZoomed(self):
+        return self.ul_x != 0 or self.ul_y != 0 or self.width != self.img_width or self.height != self.img_height
+
+    # zoom box in native image coords (the unzoomed pane shows the whole native image)
+    def getNativeCropRect(self, native_width, native_height):
+        x_scale = native_width/self.img_width
+        y_scale = native_height/self.img_height
+        return QRectF(self.ul_x * x_scale, self.ul_y * y_scale, self.width * x_scale, self.height * y_scale)
+
+    # maps full img-context coords to zoom-context coords (same mapping as getFullLens)
+    def getZoomTransform(self):
+        transform = QTransform.fromScale(self.img_width/max(self.width, 1), self.img_height/max(self.height, 1))
+        return transform.translate(-self.ul_x, -self.ul_y)
+
     # returns full img-context coordinates (zoom -> full img)
     def getZoomLens(self, x, y):
 